@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Offline bulk ingestion of a directory of images through the OpenAI Batch API.
+
+Batch requests cost half as much as /add-image's synchronous calls and have
+their own, much higher rate limits, at the price of results arriving within
+the batch window (up to 24h) instead of seconds. Good for nightly catalogue
+refreshes.
+
+Stages, all resumable from the work directory (state.json records the batch
+ids, so re-running the same command picks up where it stopped):
+  1. describe: one chat-completions request per image and variation, written
+     to JSONL in the batch format, uploaded and run as batches
+  2. embed: one embeddings request per image with its descriptions as the
+     input list, run the same way
+  3. fold: all embeddings are added to the index in one vectorized add, and
+     the index and metadata are saved
+
+Images already in the index (by image index, else by path) are skipped. Stop
+the API while this runs: it writes the faiss_* files directly, and a running
+API would overwrite them with its in-memory index on shutdown.
+
+Usage:
+  python batch_ingest.py samples/
+  python batch_ingest.py samples/ --work-dir batches/nightly --poll-seconds 300
+  # against the local stand-in (uvicorn mock_providers:app --port 8100)
+  OPENAI_BASE_URL=http://127.0.0.1:8100/v1 python batch_ingest.py samples/
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+import main
+from phash_index import dhash
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+# Batch API limits per input file
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+FINISHED = ("completed", "failed", "expired", "cancelled")
+
+
+def load_state(work_dir: str) -> dict:
+    path = os.path.join(work_dir, "state.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(work_dir: str, state: dict):
+    path = os.path.join(work_dir, "state.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def find_images(directory: str, indexed_indices: set, indexed_paths: set) -> List[Dict]:
+    """Images in a directory that aren't in the index yet."""
+    images = []
+    for path in sorted(Path(directory).iterdir()):
+        if path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        image_index = main.parse_index_from_filename(path.name)
+        if image_index in indexed_indices or str(path) in indexed_paths:
+            continue
+        images.append({"path": str(path), "image_index": image_index})
+    return images
+
+
+def write_batch_files(work_dir: str, stage: str, requests: List[dict]) -> List[str]:
+    """Write requests as JSONL input files, split at the Batch API limits."""
+    paths, lines, size = [], [], 0
+
+    def flush():
+        path = os.path.join(work_dir, f"{stage}_{len(paths)}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        paths.append(path)
+
+    for request in requests:
+        line = json.dumps(request) + "\n"
+        if lines and (len(lines) == MAX_BATCH_REQUESTS or size + len(line) > MAX_BATCH_BYTES):
+            flush()
+            lines, size = [], 0
+        lines.append(line)
+        size += len(line)
+    if lines:
+        flush()
+    return paths
+
+
+def submit(client, paths: List[str], endpoint: str) -> List[str]:
+    """Upload input files and create one batch per file. Returns the batch ids."""
+    batch_ids = []
+    for path in paths:
+        with open(path, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=endpoint,
+            completion_window="24h",
+            metadata={"source": "batch_ingest"},
+        )
+        print(f"✓ Submitted {os.path.basename(path)} as {batch.id}")
+        batch_ids.append(batch.id)
+    return batch_ids
+
+
+def wait_for(client, batch_ids: List[str], poll_seconds: float) -> List:
+    """Poll batches until all have finished."""
+    while True:
+        batches = [client.batches.retrieve(batch_id) for batch_id in batch_ids]
+        done = sum(b.request_counts.completed + b.request_counts.failed for b in batches if b.request_counts)
+        total = sum(b.request_counts.total for b in batches if b.request_counts)
+        statuses = ", ".join(sorted({b.status for b in batches}))
+        print(f"  {statuses}: {done}/{total} requests")
+        if all(b.status in FINISHED for b in batches):
+            return batches
+        time.sleep(poll_seconds)
+
+
+def download_results(client, batches: List) -> Dict[str, dict]:
+    """Result lines of finished batches by custom_id (failed requests carry an error)."""
+    results = {}
+    for batch in batches:
+        if batch.status != "completed":
+            print(f"❌ Batch {batch.id} {batch.status}: {batch.errors}")
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    result = json.loads(line)
+                    results[result["custom_id"]] = result
+    return results
+
+
+def response_body(result: dict):
+    """Body of a successful result line, else None."""
+    response = result.get("response") if result else None
+    if result is None or result.get("error") or not response or response.get("status_code") != 200:
+        return None
+    return response["body"]
+
+
+def run_stage(client, args, state: dict, stage: str, endpoint: str, build_requests) -> Dict[str, dict]:
+    """Submit a stage's batches once, then wait for them and return their results."""
+    if stage not in state:
+        requests = build_requests()
+        paths = write_batch_files(args.work_dir, stage, requests)
+        print(f"{stage}: {len(requests)} requests in {len(paths)} batch file(s)")
+        state[stage] = {"batch_ids": submit(client, paths, endpoint)}
+        save_state(args.work_dir, state)
+
+    batches = wait_for(client, state[stage]["batch_ids"], args.poll_seconds)
+    return download_results(client, batches)
+
+
+def describe_requests(images: List[Dict]) -> List[dict]:
+    requests = []
+    for n, image in enumerate(images):
+        with open(image["path"], "rb") as f:
+            image_bytes = f.read()
+        for variation in range(main.DESCRIPTION_VARIATIONS):
+            requests.append(
+                {
+                    "custom_id": f"{n}-{variation}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": main.description_request(image_bytes, variation),
+                }
+            )
+    return requests
+
+
+def collect_descriptions(images: List[Dict], results: Dict[str, dict]) -> Dict[str, List[str]]:
+    """Descriptions per image number; images with any failed variation are left out."""
+    descriptions = {}
+    for n in range(len(images)):
+        texts = []
+        for variation in range(main.DESCRIPTION_VARIATIONS):
+            body = response_body(results.get(f"{n}-{variation}"))
+            if body is None:
+                break
+            texts.append(body["choices"][0]["message"]["content"].strip())
+        if len(texts) == main.DESCRIPTION_VARIATIONS:
+            descriptions[str(n)] = texts
+        else:
+            print(f"❌ No descriptions for {images[n]['path']}; it will be retried next run")
+    return descriptions
+
+
+def embed_requests(descriptions: Dict[str, List[str]]) -> List[dict]:
+    return [
+        {
+            "custom_id": n,
+            "method": "POST",
+            "url": "/v1/embeddings",
+            "body": {
+                # The model the index was built with, until it is re-indexed
+                "model": main.index_info["embedding_model"],
+                "input": texts,
+                "dimensions": main.index_info["embedding_dim"],
+            },
+        }
+        for n, texts in descriptions.items()
+    ]
+
+
+def fold_into_index(images: List[Dict], descriptions: Dict[str, List[str]], results: Dict[str, dict]) -> int:
+    """Add every embedded image to the index in one add and save. Returns vectors added."""
+    # Re-checked in case an earlier run folded these and stopped before clearing its state
+    indexed_indices = main.get_indexed_image_indices()
+    indexed_paths = set(main.get_indexed_image_paths())
+    entries, vectors = [], []
+    for n, texts in descriptions.items():
+        image = images[int(n)]
+        if image["image_index"] in indexed_indices or image["path"] in indexed_paths:
+            continue
+        body = response_body(results.get(n))
+        if body is None:
+            print(f"❌ No embeddings for {image['path']}; it will be retried next run")
+            continue
+        embeddings = np.array(
+            [item["embedding"] for item in sorted(body["data"], key=lambda d: d["index"])],
+            dtype=np.float32,
+        )
+        texts, embeddings, entry_attributes = main.merge_variations(texts, embeddings)
+        attributes = {"dhash": image.get("dhash")}
+        entries.extend(
+            main.make_entries(texts, image["path"], image["image_index"], attributes, entry_attributes)
+        )
+        vectors.append(embeddings)
+
+    if not entries:
+        return 0
+    added = main.insert_entries(entries, np.vstack(vectors))
+    main.save_index()
+    return added
+
+
+def run(args):
+    os.makedirs(args.work_dir, exist_ok=True)
+    state = load_state(args.work_dir)
+
+    (
+        main.faiss_metadata,
+        main.vector_store,
+        main.metadata_index,
+        main.duplicate_index,
+        main.index_info,
+    ) = main.load_index_from_disk()
+    client = main.get_client()
+
+    # An empty image list has nothing to resume (older runs saved one); look again
+    if not state.get("images"):
+        state["images"] = find_images(
+            args.directory,
+            main.get_indexed_image_indices(),
+            set(main.get_indexed_image_paths()),
+        )
+        if main.DUPLICATE_POLICY != "off":
+            # Stored so later /add-image uploads can find these as duplicates
+            for image in state["images"]:
+                with open(image["path"], "rb") as f:
+                    image["dhash"] = dhash(f.read())
+    images = state["images"]
+    if not images:
+        # Saving this state would make every later run skip the directory scan
+        state_path = os.path.join(args.work_dir, "state.json")
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        print("✓ Nothing to ingest: every image is already indexed")
+        return
+    save_state(args.work_dir, state)
+    print(f"Ingesting {len(images)} images from {args.directory}")
+
+    start_time = time.time()
+    results = run_stage(
+        client, args, state, "describe", "/v1/chat/completions",
+        lambda: describe_requests(images),
+    )
+    descriptions = collect_descriptions(images, results)
+
+    results = run_stage(
+        client, args, state, "embed", "/v1/embeddings",
+        lambda: embed_requests(descriptions),
+    )
+    added = fold_into_index(images, descriptions, results)
+
+    # Start the next run from scratch
+    os.replace(
+        os.path.join(args.work_dir, "state.json"),
+        os.path.join(args.work_dir, f"state.done.{int(start_time)}.json"),
+    )
+    print(
+        f"✅ Added {added} vectors for {len(descriptions)} images in "
+        f"{time.time() - start_time:.1f}s (index size {main.vector_store.ntotal})"
+    )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(
+        description="Describe and embed a directory of images through the Batch API and add them to the index",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("directory", help="Directory of .jpg/.jpeg/.png images")
+    parser.add_argument(
+        "--work-dir",
+        default="batches",
+        help="Where batch files and state.json are kept (default: batches)",
+    )
+    parser.add_argument(
+        "--poll-seconds",
+        type=float,
+        default=60,
+        help="Seconds between batch status checks (default: 60)",
+    )
+    args = parser.parse_args()
+    if not os.path.isdir(args.directory):
+        print(f"❌ Error: Directory not found: {args.directory}")
+        sys.exit(1)
+    run(args)
+
+
+if __name__ == "__main__":
+    main_cli()
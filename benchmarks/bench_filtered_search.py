@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark metadata-filtered search: FAISS ID selectors against post-filtering.
+
+For each filter selectivity (fraction of rows that match), compares
+  * selector: VectorStore.search with a row bitmap, which FAISS applies while
+    scanning (IDSelectorBitmap), and
+  * post-filter: search unfiltered, drop non-matching results in Python and
+    retry with twice as many results until k matches are found,
+and reports latency, how many results post-filtering had to fetch, and recall@k
+against exact filtered search. No API calls are made.
+
+Usage:
+  python benchmarks/bench_filtered_search.py --images 20000
+  python benchmarks/bench_filtered_search.py --storage sq8 --selectivity 0.5 0.01
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_vector_storage import (  # noqa: E402
+    make_queries,
+    recall_at_k,
+    synthetic_embeddings,
+)
+from vector_store import STORAGE_TYPES, VectorStore  # noqa: E402
+
+
+def post_filter_search(store: VectorStore, query: np.ndarray, k: int, allowed: np.ndarray):
+    """Over-fetch and discard, doubling the fetch until k allowed results are found."""
+    fetch = k
+    while True:
+        _, ids = store.search(query, fetch)
+        ids = ids[0][ids[0] >= 0]
+        hits = ids[allowed[ids]][:k]
+        if len(hits) == k or fetch >= store.ntotal:
+            return hits, fetch
+        fetch = min(fetch * 2, store.ntotal)
+
+
+def exact_filtered_top_k(vectors, queries, allowed, k):
+    ids = np.flatnonzero(allowed)
+    scores = queries @ vectors[ids].T
+    k = min(k, len(ids))
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return ids[top]
+
+
+def run(args):
+    images, vectors = synthetic_embeddings(args.images, args.dim)
+    queries = make_queries(images, args.queries)
+    rng = np.random.default_rng(2)
+    print(
+        f"{len(vectors)} vectors, dim {args.dim}, {args.storage} storage, "
+        f"{args.queries} queries, k={args.k}"
+    )
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(
+            args.dim,
+            os.path.join(tmp, "vectors.f32"),
+            args.storage,
+            train_size=min(20_000, len(vectors)),
+        )
+        for i in range(0, len(vectors), 10_000):
+            store.add(vectors[i : i + 10_000])
+
+        for selectivity in args.selectivity:
+            # Filters match whole images, like a restaurant or cuisine filter
+            matching = rng.random(args.images) < selectivity
+            allowed = np.repeat(matching, len(vectors) // args.images)
+            truth = exact_filtered_top_k(vectors, queries, allowed, args.k)
+
+            start = time.perf_counter()
+            found = [store.search(q, args.k, allowed)[1][0] for q in queries]
+            selector_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+            start = time.perf_counter()
+            post = [post_filter_search(store, q, args.k, allowed) for q in queries]
+            post_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+            rows.append(
+                (
+                    selectivity,
+                    int(allowed.sum()),
+                    selector_ms,
+                    recall_at_k(found, truth),
+                    post_ms,
+                    np.mean([fetch for _, fetch in post]),
+                    recall_at_k([hits for hits, _ in post], truth),
+                )
+            )
+
+    print()
+    print(
+        f"{'match':>7} {'rows':>8} {'selector ms':>12} {'recall':>7} "
+        f"{'post-filter ms':>15} {'fetched':>9} {'recall':>7}"
+    )
+    for selectivity, n, sel_ms, sel_recall, post_ms, fetched, post_recall in rows:
+        print(
+            f"{selectivity:>7.3f} {n:>8} {sel_ms:>12.3f} {sel_recall:>7.4f} "
+            f"{post_ms:>15.3f} {fetched:>9.0f} {post_recall:>7.4f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare filtered search through FAISS ID selectors with post-filtering",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--images", type=int, default=20000, help="Number of images (default: 20000)")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension (default: 1536)")
+    parser.add_argument("--queries", type=int, default=100, help="Number of queries (default: 100)")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument(
+        "--storage",
+        default="flat",
+        choices=STORAGE_TYPES,
+        help="Storage type of the index (default: flat)",
+    )
+    parser.add_argument(
+        "--selectivity",
+        type=float,
+        nargs="+",
+        default=[0.5, 0.1, 0.01, 0.001],
+        help="Fractions of images matching the filter (default: 0.5 0.1 0.01 0.001)",
+    )
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Benchmark keyframe detection (--every, --motion-threshold and --fill in
+to_gif.py and yolo/yolo_detection_script.py) against detecting every frame.
+
+Detecting every frame is the reference. For each setting, "detected" is the
+share of frames the model ran on, "fps" the frames per second of detection
+plus filling in (decoding excluded) and "speedup" its ratio to the reference.
+Accuracy compares each frame's boxes with the reference boxes of that frame:
+a box matches a reference box of the same class with IoU >= --iou; "F1" is
+over all boxes of all frames (1.0 means identical to per-frame detection) and
+"IoU" the mean IoU of the matches.
+
+With --detections DIR the model is not needed: the per-frame detections saved
+in DIR/detections.npz or DIR/detections/frame_NNNNN.json (e.g. yolo/frames_all)
+are replayed as the detector, with DIR/images/frame_NNNNN.jpg as the frames, so only the accuracy
+columns mean anything.
+
+Needs ultralytics (pip install ultralytics) unless --detections is given.
+
+Usage:
+  python benchmarks/bench_keyframes.py
+  python benchmarks/bench_keyframes.py --videos yolo/burger.mp4 --every 2 4 8 --fill track interpolate
+  python benchmarks/bench_keyframes.py --detections yolo/frames_all
+"""
+
+import argparse
+import glob
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from detection_store import DetectionStore  # noqa: E402
+from keyframes import FILL_MODES, Detections, KeyframeDetector, box_iou, match_boxes, no_detections  # noqa: E402
+from yolo_inference import batched, load_model, read_frames, result_detections  # noqa: E402
+
+
+def video_frames(video: str, max_frames: int):
+    cap = cv2.VideoCapture(video)
+    try:
+        for index, frame in enumerate(read_frames(cap)):
+            if index >= max_frames:
+                return
+            yield frame
+    finally:
+        cap.release()
+
+
+def load_replay(directory: Path, max_frames: int):
+    """Saved per-frame detections and their frame images, as (image paths, Detections).
+
+    Reads DIR/detections.npz (detection_store.py) if there is one, else the JSON files.
+    """
+    if (directory / "detections.npz").exists():
+        store = DetectionStore(directory / "detections.npz")
+        frames = list(store.iter_frames())[:max_frames]
+        images = [directory / "images" / name for name in store.frame_filenames[: len(frames)]]
+        return images, [detections for _, detections in frames]
+
+    images, found = [], []
+    for path in sorted((directory / "detections").glob("frame_*.json"))[:max_frames]:
+        with open(path, encoding="utf-8") as f:
+            frame = json.load(f)
+        boxes = frame["detections"]
+        images.append(directory / "images" / frame["frame_filename"])
+        if not boxes:
+            found.append(no_detections())
+            continue
+        found.append(
+            Detections(
+                np.array([[b["bbox"][k] for k in ("x1", "y1", "x2", "y2")] for b in boxes], dtype=np.float32),
+                np.array([b["confidence"] for b in boxes], dtype=np.float32),
+                np.array([b["class_id"] for b in boxes], dtype=np.float32),
+            )
+        )
+    return images, found
+
+
+def accuracy(found: list, reference: list, min_iou: float) -> dict:
+    """Box-level precision, recall and F1 against the reference, and mean IoU of the matches."""
+    matched = predicted = expected = 0
+    ious = []
+    for detections, truth in zip(found, reference):
+        rows, cols = match_boxes(detections, truth, min_iou)
+        matched += len(rows)
+        predicted += len(detections.xyxy)
+        expected += len(truth.xyxy)
+        ious.extend(box_iou(detections.xyxy, truth.xyxy)[rows, cols])
+    precision = matched / predicted if predicted else 1.0
+    recall = matched / expected if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1, "iou": float(np.mean(ious)) if ious else 1.0}
+
+
+def run_keyframes(frames, detect, every, motion_threshold, fill, batch_size):
+    """Run KeyframeDetector over frames; returns (Detections per frame, seconds, detector)."""
+    detector = KeyframeDetector(detect, every, motion_threshold, fill)
+    found = []
+    seconds = 0.0
+    for batch in batched(frames, batch_size):
+        start = time.perf_counter()
+        ready = detector.push(batch)
+        seconds += time.perf_counter() - start
+        found.extend(detections for _, detections, _ in ready)
+    start = time.perf_counter()
+    ready = detector.flush()
+    seconds += time.perf_counter() - start
+    found.extend(detections for _, detections, _ in ready)
+    return found, seconds, detector
+
+
+def settings(args):
+    for every in args.every:
+        for fill in args.fill:
+            for motion_threshold in args.motion_thresholds:
+                yield every, (None if motion_threshold <= 0 else motion_threshold), fill
+
+
+def print_header():
+    print()
+    print(
+        f"{'video':<18} {'every':>5} {'motion':>6} {'fill':<11} {'detected':>8} {'fps':>7} "
+        f"{'speedup':>7} {'P':>6} {'R':>6} {'F1':>6} {'IoU':>6}"
+    )
+
+
+def print_row(name, every, motion_threshold, fill, detector, frames, fps, speedup, scores):
+    motion = "-" if motion_threshold is None else f"{motion_threshold:g}"
+    print(
+        f"{name:<18} {every:>5} {motion:>6} {fill:<11} {detector.keyframes / frames:>8.1%} "
+        f"{fps:>7.1f} {speedup:>6.2f}x {scores['precision']:>6.3f} {scores['recall']:>6.3f} "
+        f"{scores['f1']:>6.3f} {scores['iou']:>6.3f}"
+    )
+
+
+def run_replay(args):
+    directory = Path(args.detections)
+    images, reference = load_replay(directory, args.frames)
+    if not images:
+        print(f"❌ Error: No detections found in {directory / 'detections'}")
+        sys.exit(1)
+
+    index_of = {}
+
+    def frames():
+        for index, path in enumerate(images):
+            frame = cv2.imread(str(path))
+            if frame is None:
+                raise Exception(f"Error reading frame image: {path}")
+            index_of[id(frame)] = index
+            yield frame
+
+    def detect(batch):
+        return [reference[index_of.pop(id(frame))] for frame in batch]
+
+    print(f"Replaying {len(images)} frames of saved detections from {directory}")
+    print_header()
+    for every, motion_threshold, fill in settings(args):
+        found, seconds, detector = run_keyframes(frames(), detect, every, motion_threshold, fill, args.batch_size)
+        index_of.clear()
+        fps = len(found) / seconds if seconds > 0 else 0.0
+        print_row(
+            directory.name, every, motion_threshold, fill, detector, len(found), fps,
+            detector.frames / detector.keyframes, accuracy(found, reference, args.iou),
+        )
+    print("\n(replay: fps is filling-in only; speedup is frames per detector call)")
+
+
+def run_videos(args):
+    videos = [path for pattern in args.videos for path in sorted(glob.glob(pattern))]
+    if not videos:
+        print(f"❌ Error: No videos match {' '.join(args.videos)}")
+        sys.exit(1)
+
+    print(f"Loading YOLO model: {args.model}...")
+    model = load_model(args.model)
+
+    def detect(batch):
+        return [result_detections(result) for result in model(batch, verbose=False, conf=args.conf)]
+
+    print_header()
+    for video in videos:
+        name = Path(video).name
+        # Warm-up, then the per-frame reference
+        detect(list(video_frames(video, args.batch_size)))
+        reference, seconds = [], 0.0
+        for batch in batched(video_frames(video, args.frames), args.batch_size):
+            start = time.perf_counter()
+            reference.extend(detect(batch))
+            seconds += time.perf_counter() - start
+        if not reference:
+            print(f"⚠ Could not decode {video}")
+            continue
+        baseline_fps = len(reference) / seconds
+        print(f"{name:<18} {1:>5} {'-':>6} {'(every)':<11} {1:>8.1%} {baseline_fps:>7.1f} {1:>6.2f}x")
+
+        for every, motion_threshold, fill in settings(args):
+            found, seconds, detector = run_keyframes(
+                video_frames(video, args.frames), detect, every, motion_threshold, fill, args.batch_size
+            )
+            fps = len(found) / seconds
+            print_row(
+                name, every, motion_threshold, fill, detector, len(found), fps,
+                fps / baseline_fps, accuracy(found, reference, args.iou),
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure speed and accuracy of keyframe detection against detecting every frame",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--videos",
+        nargs="+",
+        default=[str(REPO / "yolo" / "burger.mp4"), str(REPO / "videos" / "*.mp4")],
+        help="Videos or globs (default: yolo/burger.mp4 videos/*.mp4)",
+    )
+    parser.add_argument(
+        "--detections",
+        help="Replay saved per-frame detections from this directory instead of running the model",
+    )
+    parser.add_argument(
+        "--every", type=int, nargs="+", default=[2, 4, 8], help="Keyframe intervals (default: 2 4 8)"
+    )
+    parser.add_argument(
+        "--fill",
+        nargs="+",
+        choices=FILL_MODES,
+        default=list(FILL_MODES),
+        help="Ways to fill in frames between keyframes (default: all)",
+    )
+    parser.add_argument(
+        "--motion-thresholds",
+        type=float,
+        nargs="+",
+        default=[0, 12],
+        help="Motion thresholds to try; 0 turns the motion trigger off (default: 0 12)",
+    )
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU for a box to match (default: 0.5)")
+    parser.add_argument("--frames", type=int, default=600, help="Frames per video (default: 600)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames per push (default: 8)")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold (default: 0.25)")
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLO model (default: yolov8n.pt)")
+    args = parser.parse_args()
+
+    if args.detections:
+        run_replay(args)
+    else:
+        run_videos(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Load test /add-image, /search-images and /analyze-video and report throughput
+and p50/p95/p99 latency per endpoint.
+
+With --spawn (no real API calls, no cost), starts mock_providers.py and
+`uvicorn main:app` in a temporary directory with OPENAI_BASE_URL and
+ELEVENLABS_BASE_URL pointing at the mock, DUPLICATE_POLICY=off and
+QUERY_CACHE_SIZE=0, so every request takes the full path. Mock latency, error
+rate and 429s are set with --mock-latency-ms, --mock-error-rate and
+--mock-429-rate. Without --spawn, requests go to --url as it is configured.
+
+Requests run on --concurrency threads for --requests per endpoint. --fail-p95-ms
+and --max-error-rate make the exit status non-zero, for CI.
+
+Usage:
+  python benchmarks/bench_load.py --spawn
+  python benchmarks/bench_load.py --spawn --endpoints search-images --concurrency 16 \\
+      --mock-latency-ms chat=800 embeddings=60 --fail-p95-ms 2500
+  python benchmarks/bench_load.py --url http://localhost:8000 --endpoints search-images
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+import numpy as np
+import requests
+
+REPO = Path(__file__).resolve().parent.parent
+ENDPOINTS = ("add-image", "search-images", "analyze-video")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until(url: str, timeout: float = 120):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.exceptions.ConnectionError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+
+
+@contextmanager
+def server(module: str, port: int, cwd: str, env: dict, ready_path: str):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--log-level", "warning"],
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until(f"http://127.0.0.1:{port}{ready_path}")
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def parse_latencies(values) -> dict:
+    """'chat=800 embeddings=60' (or a single number for every endpoint) -> MOCK_* variables."""
+    env = {}
+    for value in values or []:
+        if "=" in value:
+            endpoint, ms = value.split("=", 1)
+            env[f"MOCK_{endpoint.upper()}_LATENCY_MS"] = ms
+        else:
+            env["MOCK_LATENCY_MS"] = value
+    return env
+
+
+@contextmanager
+def spawned_app(args):
+    """Start the mock providers and the app against them; yields the app URL."""
+    with ExitStack() as stack:
+        tmp = stack.enter_context(tempfile.TemporaryDirectory())
+        shutil.copy(REPO / "prompt.txt", tmp)
+        env = dict(os.environ, PYTHONPATH=str(REPO))
+        env.update(
+            MOCK_JITTER_MS=str(args.mock_jitter_ms),
+            MOCK_ERROR_RATE=str(args.mock_error_rate),
+            MOCK_429_RATE=str(args.mock_429_rate),
+            **parse_latencies(args.mock_latency_ms),
+        )
+        mock_url = stack.enter_context(server("mock_providers", free_port(), tmp, env, "/mock/config"))
+
+        env.update(
+            OPENAI_API_KEY="sk-mock",
+            ELEVENLABS_API_KEY="mock",
+            OPENAI_BASE_URL=f"{mock_url}/v1",
+            ELEVENLABS_BASE_URL=mock_url,
+            DUPLICATE_POLICY="off",
+            QUERY_CACHE_SIZE="0",
+        )
+        yield stack.enter_context(server("main", free_port(), tmp, env, "/readyz"))
+
+
+class Workload:
+    """Builds one request per call for an endpoint, cycling through the inputs."""
+
+    def __init__(self, endpoint: str, images, video: str):
+        self.endpoint = endpoint
+        self.images = images
+        self.video = video
+        self.counter = 0
+        self.lock = threading.Lock()
+        # Unique image indices so repeated uploads aren't "already in index"
+        self.first_index = int(time.time()) % 1_000_000 * 1000
+
+    def next(self):
+        with self.lock:
+            n = self.counter
+            self.counter += 1
+        if self.endpoint == "analyze-video":
+            return {"file": ("video.mp4", self.video, "video/mp4")}, {}
+        name, data = self.images[n % len(self.images)]
+        if self.endpoint == "add-image":
+            return {"file": (name, data, "image/jpeg")}, {"image_path": f"{self.first_index + n}_{name}"}
+        return {"file": (name, data, "image/jpeg")}, {}
+
+
+def run_endpoint(url: str, workload: Workload, n_requests: int, concurrency: int) -> dict:
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        files, data = workload.next()
+        start = time.perf_counter()
+        try:
+            status = session.post(f"{url}/{workload.endpoint}", files=files, data=data, timeout=600).status_code
+        except requests.exceptions.RequestException:
+            status = "error"
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    ok = statuses.get(200, 0)
+    return {
+        "endpoint": workload.endpoint,
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(n_requests / wall, 2),
+        "error_rate": round(1 - ok / n_requests, 4),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "max_ms": round(float(ms.max()), 1),
+    }
+
+
+def run(args) -> int:
+    images = [(os.path.basename(p), open(p, "rb").read()) for p in sorted(glob.glob(args.images))]
+    if not images and {"add-image", "search-images"} & set(args.endpoints):
+        print(f"❌ Error: No images match {args.images}")
+        return 1
+    video = open(args.video, "rb").read() if "analyze-video" in args.endpoints else b""
+
+    with ExitStack() as stack:
+        url = stack.enter_context(spawned_app(args)) if args.spawn else args.url.rstrip("/")
+        if "search-images" in args.endpoints and "add-image" not in args.endpoints:
+            # Give searches something to find
+            for name, data in images:
+                requests.post(f"{url}/add-image", files={"file": (name, data)}, timeout=600)
+
+        reports = []
+        for endpoint in args.endpoints:
+            workload = Workload(endpoint, images, video)
+            n_requests = args.video_requests if endpoint == "analyze-video" else args.requests
+            reports.append(run_endpoint(url, workload, n_requests, args.concurrency))
+
+    print()
+    print(
+        f"{'endpoint':<14} {'reqs':>5} {'req/s':>7} {'errors':>7} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    )
+    for r in reports:
+        print(
+            f"{r['endpoint']:<14} {r['requests']:>5} {r['throughput_rps']:>7.2f} {r['error_rate']:>7.1%} "
+            f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n✓ Report written to {args.json}")
+
+    failed = False
+    for r in reports:
+        if args.fail_p95_ms and r["p95_ms"] > args.fail_p95_ms:
+            print(f"❌ {r['endpoint']}: p95 {r['p95_ms']:.0f} ms > {args.fail_p95_ms:.0f} ms")
+            failed = True
+        if r["error_rate"] > args.max_error_rate:
+            print(f"❌ {r['endpoint']}: error rate {r['error_rate']:.1%} > {args.max_error_rate:.1%}")
+            failed = True
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the API and report throughput and latency percentiles",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="API URL without --spawn")
+    parser.add_argument("--spawn", action="store_true", help="Start the app against mock_providers.py")
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        default=list(ENDPOINTS),
+        choices=ENDPOINTS,
+        help="Endpoints to load, one after another (default: all)",
+    )
+    parser.add_argument("--requests", type=int, default=100, help="Requests per image endpoint (default: 100)")
+    parser.add_argument("--video-requests", type=int, default=10, help="Requests to /analyze-video (default: 10)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (default: 8)")
+    parser.add_argument("--images", default=str(REPO / "samples" / "*.jpg"), help="Glob of images to send")
+    parser.add_argument("--video", default=str(REPO / "videos" / "pizza.mp4"), help="Video for /analyze-video")
+    parser.add_argument(
+        "--mock-latency-ms",
+        nargs="+",
+        metavar="[ENDPOINT=]MS",
+        help="Mock latency, for all endpoints or per chat/embeddings/stt (with --spawn)",
+    )
+    parser.add_argument("--mock-jitter-ms", type=float, default=0, help="Mock latency std dev (with --spawn)")
+    parser.add_argument("--mock-error-rate", type=float, default=0, help="Mock 500 rate (with --spawn)")
+    parser.add_argument("--mock-429-rate", type=float, default=0, help="Mock 429 rate (with --spawn)")
+    parser.add_argument("--json", help="Also write the report as JSON to this file")
+    parser.add_argument("--fail-p95-ms", type=float, default=0, help="Exit 1 if any p95 exceeds this")
+    parser.add_argument(
+        "--max-error-rate", type=float, default=1.0, help="Exit 1 if any error rate exceeds this (default: 1.0)"
+    )
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
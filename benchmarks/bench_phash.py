@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark the perceptual-hash duplicate index.
+
+Part 1 fills a HashIndex with random 64-bit hashes (1M by default) and times
+lookups of perturbed copies at several Hamming radii, against a vectorized
+linear scan over all hashes.
+
+Part 2 measures how far common edits move the dHash of real images (resize,
+JPEG re-compression, crops), to pick DUPLICATE_MAX_DISTANCE.
+
+Usage:
+  python benchmarks/bench_phash.py
+  python benchmarks/bench_phash.py --hashes 100000 --radii 3 6 9
+"""
+
+import argparse
+import glob
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from phash_index import POPCOUNT, HashIndex, dhash, hamming  # noqa: E402
+
+
+def perturb(h: int, bits: int, rng) -> int:
+    for bit in rng.choice(64, bits, replace=False):
+        h ^= 1 << int(bit)
+    return h
+
+
+def bench_lookup(args):
+    rng = np.random.default_rng(0)
+    hashes = rng.integers(0, 2**64, args.hashes, dtype=np.uint64)
+
+    index = HashIndex()
+    start = time.perf_counter()
+    for key, h in enumerate(hashes.tolist()):
+        index.add(h, key)
+    build_s = time.perf_counter() - start
+    print(f"{args.hashes} hashes indexed in {build_s:.1f}s")
+
+    print()
+    print(f"{'radius':>6} {'index ms':>9} {'scan ms':>8} {'found':>7}")
+    for radius in args.radii:
+        targets = rng.integers(0, args.hashes, args.queries)
+        queries = [perturb(int(hashes[t]), radius, rng) for t in targets]
+
+        start = time.perf_counter()
+        found = [index.nearest(q, radius) for q in queries]
+        index_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+        start = time.perf_counter()
+        for q in queries[: max(1, args.queries // 10)]:
+            xor = hashes ^ np.uint64(q)
+            distances = POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+            np.flatnonzero(distances <= radius)
+        scan_ms = (time.perf_counter() - start) / max(1, args.queries // 10) * 1000
+
+        hits = sum(m is not None and m[0] == t for m, t in zip(found, targets))
+        print(f"{radius:>6} {index_ms:>9.3f} {scan_ms:>8.2f} {hits / len(queries):>7.1%}")
+
+
+def bench_edits(args):
+    from PIL import Image
+
+    files = sorted(glob.glob(args.images))[: args.max_images]
+    if not files:
+        print(f"\nNo images match {args.images}; skipping edit robustness")
+        return
+
+    def encode(image, quality=85):
+        out = BytesIO()
+        image.save(out, "JPEG", quality=quality)
+        return out.getvalue()
+
+    edits = {
+        "resize 50%": lambda im: im.resize((im.width // 2, im.height // 2)),
+        "jpeg q30": None,
+        "crop 2%": lambda im: im.crop(
+            (int(im.width * 0.02), int(im.height * 0.02), int(im.width * 0.98), int(im.height * 0.98))
+        ),
+        "crop 5%": lambda im: im.crop(
+            (int(im.width * 0.05), int(im.height * 0.05), int(im.width * 0.95), int(im.height * 0.95))
+        ),
+    }
+    distances = {name: [] for name in edits}
+    originals = []
+    for path in files:
+        data = open(path, "rb").read()
+        image = Image.open(BytesIO(data)).convert("RGB")
+        h = dhash(data)
+        originals.append(h)
+        for name, edit in edits.items():
+            edited = encode(image, 30) if edit is None else encode(edit(image))
+            distances[name].append(hamming(h, dhash(edited)))
+
+    print(f"\ndHash distance after edits ({len(files)} images from {args.images})")
+    print(f"{'edit':<12} {'median':>6} {'max':>4}")
+    for name, values in distances.items():
+        print(f"{name:<12} {np.median(values):>6.1f} {max(values):>4}")
+    unrelated = [
+        hamming(a, b) for i, a in enumerate(originals) for b in originals[i + 1 :: 7]
+    ]
+    if unrelated:
+        print(f"{'other image':<12} {np.median(unrelated):>6.1f} {min(unrelated):>4} (min)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time perceptual-hash lookups and measure dHash robustness",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--hashes", type=int, default=1_000_000, help="Hashes in the index (default: 1000000)")
+    parser.add_argument("--queries", type=int, default=1000, help="Lookups per radius (default: 1000)")
+    parser.add_argument(
+        "--radii", type=int, nargs="+", default=[3, 6, 9], help="Hamming radii (default: 3 6 9)"
+    )
+    parser.add_argument(
+        "--images",
+        default="samples/*.jpg",
+        help="Glob of images for the edit test (default: samples/*.jpg)",
+    )
+    parser.add_argument("--max-images", type=int, default=50, help="Images used for the edit test (default: 50)")
+    args = parser.parse_args()
+    bench_lookup(args)
+    bench_edits(args)
+
+
+if __name__ == "__main__":
+    main()
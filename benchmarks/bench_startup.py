@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark service startup: cold import of main, time to live and time to ready.
+
+For each index size, writes a synthetic index (metadata pickle plus vector side
+file) into a temporary directory, starts `uvicorn main:app` there and polls
+/healthz and /readyz. Cold import is timed in a fresh interpreter. No API calls
+are made; OPENAI_API_KEY only has to be set, not valid.
+
+Usage:
+  python benchmarks/bench_startup.py
+  python benchmarks/bench_startup.py --images 0 2000 20000 --storage sq8
+"""
+
+import argparse
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from bench_vector_storage import VARIATIONS, synthetic_embeddings  # noqa: E402
+from vector_store import STORAGE_TYPES, VectorStore  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def write_index(directory: str, n_images: int, dim: int, storage: str):
+    """Write faiss_metadata.pkl, faiss_vectors.f32 and the coarse index like main.py does."""
+    metadata = []
+    store = VectorStore(
+        dim, os.path.join(directory, "faiss_vectors.f32"), storage, train_size=1000
+    )
+    if n_images:
+        _, vectors = synthetic_embeddings(n_images, dim)
+        for i in range(0, len(vectors), 10_000):
+            store.add(vectors[i : i + 10_000])
+        metadata = [
+            {
+                "image_path": f"{i // VARIATIONS}_dish.jpg",
+                "description": "A synthetic dish description. " * 20,
+                "description_variation": i % VARIATIONS + 1,
+                "image_index": i // VARIATIONS,
+            }
+            for i in range(len(vectors))
+        ]
+    store.save(os.path.join(directory, "faiss_index.bin"))
+    with open(os.path.join(directory, "faiss_metadata.pkl"), "wb") as f:
+        pickle.dump(metadata, f)
+
+
+def cold_import_seconds(env: dict) -> float:
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_to_live_and_ready(directory: str, env: dict, timeout: float = 300):
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=directory,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    live = ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if live is None:
+                    requests.get(f"http://127.0.0.1:{port}/healthz", timeout=1)
+                    live = time.perf_counter() - start
+                if requests.get(f"http://127.0.0.1:{port}/readyz", timeout=1).status_code == 200:
+                    ready = time.perf_counter() - start
+                    break
+            except requests.exceptions.ConnectionError:
+                pass
+            time.sleep(0.02)
+    finally:
+        server.terminate()
+        server.wait()
+    return live, ready
+
+
+def run(args):
+    env = dict(os.environ, PYTHONPATH=str(REPO), OPENAI_API_KEY="sk-benchmark")
+    env["FAISS_STORAGE"] = args.storage
+    env["EMBEDDING_DIM"] = str(args.dim)
+    env.pop("SEARCH_DIM", None)
+
+    imports = [cold_import_seconds(env) for _ in range(args.repeat)]
+    print(f"Cold import of main: {min(imports) * 1000:.0f} ms (best of {args.repeat})")
+
+    print()
+    print(f"{'images':>8} {'vectors':>9} {'live s':>7} {'ready s':>8}")
+    for n_images in args.images:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_index(tmp, n_images, args.dim, args.storage)
+            live, ready = time_to_live_and_ready(tmp, env)
+        ready_text = f"{ready:>8.2f}" if ready is not None else f"{'timeout':>8}"
+        print(f"{n_images:>8} {n_images * VARIATIONS:>9} {live:>7.2f} {ready_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure cold import, time to live and time to ready of the API",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--images",
+        type=int,
+        nargs="+",
+        default=[0, 2000, 20000],
+        help="Index sizes in images, 5 vectors each (default: 0 2000 20000)",
+    )
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension (default: 1536)")
+    parser.add_argument(
+        "--storage",
+        default="flat",
+        choices=STORAGE_TYPES,
+        help="Storage type of the index (default: flat)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Cold import runs (default: 3)")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark tracker.py: frames per second of Tracker.update() and how well ids
+hold up, on synthetic scenes and on the saved burger clip detections.
+
+Synthetic scenes are 576x1024 frames at 60 fps with --objects objects moving
+at up to 3 px per frame and bouncing off the edges. Each detection is
+jittered by about 1.5 px, and a share of them (--miss-rate) is dropped. Each
+object is also hidden once for --occlusion frames. Because the true identity
+of every box is known:
+
+- "switches": times an object's track id changed between frames where it had one
+- "ids/obj": distinct track ids per object (1.0: one id for its whole life)
+- "tracked": share of detections that were given a track id
+
+"fps" counts tracker time only (no detection), and "x60" is the multiple of
+real time at 60 fps. The burger row replays yolo/frames_all/detections.npz;
+it has no identities, so only its speed is shown.
+
+Usage:
+  python benchmarks/bench_tracker.py
+  python benchmarks/bench_tracker.py --objects 5 20 100 --occlusion 40 --matching greedy
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from detection_store import DetectionStore  # noqa: E402
+from keyframes import Detections, box_iou  # noqa: E402
+from tracker import MATCHING, Tracker  # noqa: E402
+
+WIDTH, HEIGHT, FPS = 576, 1024, 60
+
+
+def synthetic_scene(objects: int, frames: int, miss_rate: float, occlusion: int, seed: int = 0):
+    """Detections per frame of moving boxes, and the object each detection belongs to."""
+    rng = np.random.default_rng(seed)
+    size = rng.uniform(40, 160, (objects, 2))
+    position = rng.uniform(0, 1, (objects, 2)) * ([WIDTH, HEIGHT] - size)
+    velocity = rng.uniform(-3, 3, (objects, 2))
+    cls = (np.arange(objects) % 5).astype(np.float32)
+    hidden_from = rng.integers(0, max(1, frames - occlusion), objects)
+
+    scene = []
+    for frame in range(frames):
+        position += velocity
+        # Bounce off the edges
+        low, high = position < 0, position + size > [WIDTH, HEIGHT]
+        velocity[low | high] *= -1
+        position = np.clip(position, 0, [WIDTH, HEIGHT] - size)
+
+        visible = rng.random(objects) >= miss_rate
+        visible &= ~((hidden_from <= frame) & (frame < hidden_from + occlusion))
+        rows = np.flatnonzero(visible)
+        xyxy = np.column_stack([position[rows], position[rows] + size[rows]])
+        xyxy += rng.normal(0, 1.5, xyxy.shape)
+        conf = rng.uniform(0.4, 0.95, len(rows)).astype(np.float32)
+        scene.append((Detections(xyxy.astype(np.float32), conf, cls[rows]), rows))
+    return scene
+
+
+def run_tracker(tracker: Tracker, detections: list):
+    """Tracked output per frame and the seconds spent in update()."""
+    tracked = []
+    start = time.perf_counter()
+    for frame, frame_detections in enumerate(detections, 1):
+        tracked.append(tracker.update(frame_detections, frame))
+    seconds = time.perf_counter() - start
+    tracker.finish()
+    return tracked, seconds
+
+
+def id_scores(scene: list, tracked: list, objects: int) -> dict:
+    """Id switches, distinct ids per object and share of detections with an id."""
+    last_id = np.full(objects, -1)
+    ids_seen = [set() for _ in range(objects)]
+    switches = with_id = total = 0
+    for (detections, truth), frame_tracked in zip(scene, tracked):
+        total += len(truth)
+        if not len(frame_tracked.ids):
+            continue
+        # Tracked boxes are the detections they matched
+        iou = box_iou(frame_tracked.xyxy, detections.xyxy)
+        for track_id, row in zip(frame_tracked.ids, np.argmax(iou, axis=1)):
+            obj = truth[row]
+            with_id += 1
+            if last_id[obj] >= 0 and last_id[obj] != track_id:
+                switches += 1
+            last_id[obj] = track_id
+            ids_seen[obj].add(int(track_id))
+    ids_per_object = np.mean([len(ids) for ids in ids_seen if ids]) if any(ids_seen) else 0.0
+    return {"switches": switches, "ids_per_object": ids_per_object, "tracked": with_id / max(total, 1)}
+
+
+def tracker_args(args) -> dict:
+    return {"min_iou": args.min_iou, "max_age": args.max_age, "min_hits": args.min_hits, "matching": args.matching}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure tracker speed and id stability",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--objects", type=int, nargs="+", default=[5, 20, 50, 100], help="Objects per scene")
+    parser.add_argument("--frames", type=int, default=1200, help="Frames per scene (default: 1200, 20 s)")
+    parser.add_argument("--miss-rate", type=float, default=0.1, help="Detections dropped at random (default: 0.1)")
+    parser.add_argument("--occlusion", type=int, default=20, help="Frames each object is hidden once (default: 20)")
+    parser.add_argument("--min-iou", type=float, default=0.3, help="Tracker min_iou (default: 0.3)")
+    parser.add_argument("--max-age", type=int, default=30, help="Tracker max_age (default: 30)")
+    parser.add_argument("--min-hits", type=int, default=3, help="Tracker min_hits (default: 3)")
+    parser.add_argument("--matching", choices=MATCHING, default="auto", help="Association (default: auto)")
+    parser.add_argument(
+        "--detections",
+        default=str(REPO / "yolo" / "frames_all" / "detections.npz"),
+        help="Detection store to replay (default: yolo/frames_all/detections.npz)",
+    )
+    args = parser.parse_args()
+
+    print(f"Matching: {Tracker(**tracker_args(args)).matching}")
+    print()
+    print(f"{'scene':<14} {'frames':>6} {'boxes/f':>7} {'fps':>8} {'x60':>6} {'switches':>8} {'ids/obj':>7} {'tracked':>7}")
+
+    if Path(args.detections).exists():
+        store = DetectionStore(args.detections)
+        detections = [frame_detections for _, frame_detections in store.iter_frames()]
+        _, seconds = run_tracker(Tracker(**tracker_args(args)), detections)
+        fps = len(detections) / seconds
+        print(
+            f"{'burger (saved)':<14} {len(detections):>6} {len(store) / len(detections):>7.1f} "
+            f"{fps:>8.0f} {fps / FPS:>5.0f}x {'-':>8} {'-':>7} {'-':>7}"
+        )
+
+    for objects in args.objects:
+        scene = synthetic_scene(objects, args.frames, args.miss_rate, args.occlusion)
+        tracked, seconds = run_tracker(Tracker(**tracker_args(args)), [detections for detections, _ in scene])
+        scores = id_scores(scene, tracked, objects)
+        fps = len(scene) / seconds
+        boxes = np.mean([len(truth) for _, truth in scene])
+        print(
+            f"{f'{objects} objects':<14} {len(scene):>6} {boxes:>7.1f} {fps:>8.0f} {fps / FPS:>5.0f}x "
+            f"{scores['switches']:>8} {scores['ids_per_object']:>7.2f} {scores['tracked']:>7.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
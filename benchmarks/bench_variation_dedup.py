@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark variation dedup at ingest (VARIATION_DEDUP) on synthetic embeddings.
+
+Each image gets 5 variation embeddings whose spread differs per image: some
+images get five near-identical descriptions, others five distinct ones. Every
+image is ingested with merge_similar at each threshold (and "distinct" or
+"centroid" mode), and the resulting index is compared to the undeduplicated
+one on vectors stored, index size and the existing search path: top-k rows
+mapped to their images, as /search-images returns them. Queries are a fresh
+description of a random image (one more variation drawn the same way).
+
+  * hit@1 / hit@k: the queried image is the first / among the top-k results
+  * overlap: share of the images in the top-k that the full index also returns
+
+No API calls are made.
+
+Usage:
+  python benchmarks/bench_variation_dedup.py
+  python benchmarks/bench_variation_dedup.py --images 20000 --thresholds 0.98 0.95 0.9
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_vector_storage import VARIATIONS  # noqa: E402
+from vector_store import STORAGE_TYPES, VectorStore, merge_similar, normalize  # noqa: E402
+
+
+def variation_embeddings(n_images: int, dim: int, n_queries: int, seed: int = 0):
+    """Images clustered by cuisine, with VARIATIONS embeddings each plus query embeddings.
+
+    The variation noise of each image is drawn between 0.05 and 0.5, so the
+    cosine similarity between its variations ranges from ~0.998 to ~0.85.
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, n_images // 50)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    images = centers[rng.integers(0, n_clusters, n_images)]
+    images += 0.6 * rng.standard_normal((n_images, dim)).astype(np.float32)
+    spread = rng.uniform(0.05, 0.5, n_images).astype(np.float32)
+
+    variations = np.repeat(images, VARIATIONS, axis=0)
+    variations += np.repeat(spread, VARIATIONS)[:, None] * rng.standard_normal(
+        variations.shape
+    ).astype(np.float32)
+
+    targets = rng.integers(0, n_images, n_queries)
+    queries = images[targets] + spread[targets, None] * rng.standard_normal(
+        (n_queries, dim)
+    ).astype(np.float32)
+    return normalize(variations), normalize(queries), targets
+
+
+def build(tmp: str, name: str, vectors: np.ndarray, dim: int, storage: str) -> VectorStore:
+    store = VectorStore(dim, os.path.join(tmp, f"{name}.f32"), storage, train_size=1000)
+    for i in range(0, len(vectors), 10_000):
+        store.add(vectors[i : i + 10_000])
+    return store
+
+
+def top_images(store: VectorStore, images: np.ndarray, queries: np.ndarray, k: int):
+    """Image of each of the top-k rows per query, like /search-images returns them,
+    and the mean search time in ms."""
+    start = time.perf_counter()
+    ids = [store.search(query.reshape(1, -1), k)[1][0] for query in queries]
+    search_ms = (time.perf_counter() - start) / len(queries) * 1000
+    return [images[row[row >= 0]] for row in ids], search_ms
+
+
+def run(args):
+    vectors, queries, targets = variation_embeddings(args.images, args.dim, args.queries)
+    image_of_row = np.repeat(np.arange(args.images), VARIATIONS)
+    print(
+        f"{args.images} images x {VARIATIONS} variations = {len(vectors)} vectors, "
+        f"dim {args.dim}, {args.storage} storage, {args.queries} queries, k={args.k}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full = build(tmp, "full", vectors, args.dim, args.storage)
+        baseline, full_ms = top_images(full, image_of_row, queries, args.k)
+        full_bytes = os.path.getsize(os.path.join(tmp, "full.f32")) + full.index_bytes()
+        full.vectors.close()
+
+        rows = [("off", "-", len(vectors), full_bytes, full_ms, baseline)]
+        for threshold, mode in product(args.thresholds, args.modes):
+            kept, images = [], []
+            for image in range(args.images):
+                rows_of_image = vectors[image * VARIATIONS : (image + 1) * VARIATIONS]
+                merged, groups = merge_similar(rows_of_image, threshold, mode == "centroid")
+                kept.append(merged)
+                images.extend([image] * len(groups))
+            kept = np.vstack(kept)
+            name = f"{mode}-{threshold}"
+            store = build(tmp, name, kept, args.dim, args.storage)
+            found, search_ms = top_images(store, np.array(images), queries, args.k)
+            size = os.path.getsize(os.path.join(tmp, f"{name}.f32")) + store.index_bytes()
+            store.vectors.close()
+            rows.append((mode, threshold, len(kept), size, search_ms, found))
+
+    print()
+    print(
+        f"{'mode':<9} {'thresh':>6} {'vectors':>8} {'per img':>7} {'size MB':>8} "
+        f"{'saved':>6} {'ms/q':>6} {'hit@1':>6} {'hit@k':>6} {'overlap':>7}"
+    )
+    for mode, threshold, n_vectors, size, search_ms, found in rows:
+        first = np.mean([len(f) > 0 and f[0] == t for f, t in zip(found, targets)])
+        hits = np.mean([t in f for f, t in zip(found, targets)])
+        overlap = np.mean(
+            [len(set(f) & set(b)) / max(1, len(set(b))) for f, b in zip(found, baseline)]
+        )
+        print(
+            f"{mode:<9} {threshold:>6} {n_vectors:>8} {n_vectors / args.images:>7.2f} "
+            f"{size / 1e6:>8.1f} {1 - size / full_bytes:>6.1%} {search_ms:>6.2f} {first:>6.1%} {hits:>6.1%} {overlap:>7.1%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure index size and recall of variation dedup at ingest",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--images", type=int, default=10000, help="Images to index (default: 10000)")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension (default: 1536)")
+    parser.add_argument("--queries", type=int, default=500, help="Search queries (default: 500)")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument(
+        "--thresholds",
+        type=float,
+        nargs="+",
+        default=[0.98, 0.95, 0.9],
+        help="Cosine similarity thresholds (default: 0.98 0.95 0.9)",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=["distinct", "centroid"],
+        choices=["distinct", "centroid"],
+        help="Dedup modes (default: distinct centroid)",
+    )
+    parser.add_argument(
+        "--storage",
+        default="flat",
+        choices=STORAGE_TYPES,
+        help="Storage type of the index (default: flat)",
+    )
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark compressed, reduced-dimension and sharded vector storage against the flat index.
+
+Builds each storage type (and optionally each first-pass search dimension and
+shard count) over
+the same synthetic embeddings (5 variations per image, like /add-image) and
+reports memory per image, build time, search latency and recall@10 against
+exact search on the full vectors. No API calls are made.
+
+Usage:
+  python benchmarks/bench_vector_storage.py --images 20000
+  python benchmarks/bench_vector_storage.py --storage flat sq8 --search-dims 1536 512 256
+  python benchmarks/bench_vector_storage.py --storage flat --shards 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vector_store import STORAGE_TYPES, VectorStore, normalize  # noqa: E402
+
+VARIATIONS = 5
+
+
+def synthetic_embeddings(n_images: int, dim: int, seed: int = 0):
+    """Clustered unit vectors: dishes group by cuisine, variations sit close to their image.
+
+    Like text-embedding-3 output, the leading dimensions carry more of the signal
+    (variance decays with position), so truncated first-pass search is meaningful.
+    """
+    rng = np.random.default_rng(seed)
+    scale = (1.0 / np.sqrt(1 + np.arange(dim) / 64)).astype(np.float32)
+    n_clusters = max(1, n_images // 50)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    images = centers[rng.integers(0, n_clusters, n_images)]
+    images += 0.6 * rng.standard_normal((n_images, dim)).astype(np.float32)
+    variations = np.repeat(images, VARIATIONS, axis=0)
+    variations += 0.3 * rng.standard_normal(variations.shape).astype(np.float32)
+    return normalize(images * scale), normalize(variations * scale)
+
+
+def make_queries(images: np.ndarray, n_queries: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = images[rng.integers(0, len(images), n_queries)]
+    noise = 0.3 * rng.standard_normal(picks.shape).astype(np.float32)
+    return normalize(picks + noise * np.abs(picks).mean())
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return top
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run(args):
+    images, vectors = synthetic_embeddings(args.images, args.dim)
+    queries = make_queries(images, args.queries)
+    truth = exact_top_k(vectors, queries, args.k)
+    print(
+        f"{args.images} images x {VARIATIONS} variations = {len(vectors)} vectors, "
+        f"dim {args.dim}, {args.queries} queries, k={args.k}"
+    )
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_shards, search_dim, storage in product(
+            args.shards, args.search_dims or [args.dim], args.storage
+        ):
+            path = os.path.join(tmp, f"{storage}_{search_dim}_{n_shards}.f32")
+            store = VectorStore(
+                args.dim,
+                path,
+                storage,
+                rerank_factor=args.rerank_factor,
+                train_size=min(args.train_size, len(vectors)),
+                search_dim=search_dim,
+                n_shards=n_shards,
+            )
+
+            start = time.perf_counter()
+            for i in range(0, len(vectors), 10_000):
+                store.add(vectors[i : i + 10_000])
+            build_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            found = np.vstack([store.search(q, args.k)[1] for q in queries])
+            search_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+            rows.append(
+                (
+                    storage,
+                    search_dim,
+                    n_shards,
+                    store.index_bytes() / args.images / 1024,
+                    build_s,
+                    search_ms,
+                    recall_at_k(found, truth),
+                )
+            )
+            del store
+            os.remove(path)
+
+    print()
+    print(
+        f"{'storage':<8} {'dim':>5} {'shards':>6} {'KB/image':>9} {'build s':>8} "
+        f"{'search ms':>10} {'recall@' + str(args.k):>10}"
+    )
+    for storage, search_dim, n_shards, kb, build_s, search_ms, recall in rows:
+        print(
+            f"{storage:<8} {search_dim:>5} {n_shards:>6} {kb:>9.2f} {build_s:>8.2f} "
+            f"{search_ms:>10.3f} {recall:>10.4f}"
+        )
+    print(
+        f"\nRe-rank side file (all rows): "
+        f"{VARIATIONS * args.dim * 4 / 1024:.2f} KB/image on disk, memory-mapped"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare flat, fp16, sq8 and pq storage and first-pass search dimensions",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--images", type=int, default=20000, help="Number of images (default: 20000)")
+    parser.add_argument("--dim", type=int, default=1536, help="Full embedding dimension (default: 1536)")
+    parser.add_argument(
+        "--search-dims",
+        type=int,
+        nargs="+",
+        help="First-pass dimensions to compare, e.g. 1536 512 256 (default: full only)",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="Shard counts to compare, e.g. 1 2 4 8 (default: 1)",
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries (default: 200)")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument("--rerank-factor", type=int, default=4, help="Candidates per result before re-ranking (default: 4)")
+    parser.add_argument("--train-size", type=int, default=20000, help="Vectors used to train sq8/pq (default: 20000)")
+    parser.add_argument(
+        "--storage",
+        nargs="+",
+        default=list(STORAGE_TYPES),
+        choices=STORAGE_TYPES,
+        help="Storage types to compare (default: all)",
+    )
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
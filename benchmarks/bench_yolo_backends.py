@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Benchmark YOLO on CPU through PyTorch, ONNX Runtime and OpenVINO, in float
+and INT8 (--backend / --int8 in to_gif.py, object_permanence.py and
+yolo/yolo_detection_script.py).
+
+Frames are sampled evenly from the videos and decoded first. Each backend
+runs them one frame per call after a few warm-up calls; "ms" is the median
+latency per frame and "p90" its 90th percentile. The exports are made (and
+cached in YOLO_EXPORT_DIR) before timing.
+
+Accuracy drift is measured against the PyTorch model, since the bundled
+videos have no labels: PyTorch's detections at --ref-conf are the reference
+boxes, and every backend's detections at --conf 0.001 are scored against
+them as COCO-style mAP@0.5 and mAP@0.5:0.95. PyTorch's own row is the
+ceiling (close to 1.0). "drift" is each backend's mAP@0.5:0.95 minus that of
+the first backend listed, and "speedup" is relative to it too.
+INT8 is calibrated on yolo/frames_all/images (the burger clip), so the
+default videos/*.mp4 are frames it has not seen.
+
+Needs ultralytics plus onnx and onnxruntime, and openvino and nncf;
+backends whose packages are missing are skipped.
+
+Usage:
+  python benchmarks/bench_yolo_backends.py
+  python benchmarks/bench_yolo_backends.py --backends pytorch onnx onnx-int8 --frames 30
+"""
+
+import argparse
+import glob
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from keyframes import box_iou  # noqa: E402
+from yolo_inference import load_model, result_detections  # noqa: E402
+
+CONFIGS = {
+    "pytorch": ("pytorch", False),
+    "onnx": ("onnx", False),
+    "onnx-int8": ("onnx", True),
+    "openvino": ("openvino", False),
+    "openvino-int8": ("openvino", True),
+}
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def sample_frames(video: str, count: int) -> list:
+    """`count` frames spread evenly over a video."""
+    cap = cv2.VideoCapture(video)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for index in np.linspace(0, max(total - 1, 0), count).round().astype(int):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+
+def average_precision(found: list, reference: list, iou_threshold: float) -> float:
+    """Mean over reference classes of 101-point interpolated AP (COCO-style).
+
+    Args:
+        found: Detections per frame, with confidences
+        reference: Reference Detections per frame
+        iou_threshold: IoU for a detection to match a reference box
+
+    Returns:
+        mAP at iou_threshold
+    """
+    classes = np.unique(np.concatenate([truth.cls for truth in reference])) if reference else []
+    aps = []
+    for cls in classes:
+        scores, hits, expected = [], [], 0
+        for detections, truth in zip(found, reference):
+            truth_boxes = truth.xyxy[truth.cls == cls]
+            expected += len(truth_boxes)
+            mask = detections.cls == cls
+            conf = detections.conf[mask]
+            order = np.argsort(-conf, kind="stable")
+            iou = box_iou(detections.xyxy[mask][order], truth_boxes)
+            taken = np.zeros(len(truth_boxes), dtype=bool)
+            for row in range(len(order)):
+                hit = False
+                if len(truth_boxes):
+                    candidates = np.where(taken, -1.0, iou[row])
+                    best = int(np.argmax(candidates))
+                    if candidates[best] >= iou_threshold:
+                        taken[best] = hit = True
+                scores.append(conf[order[row]])
+                hits.append(hit)
+        if expected == 0:
+            continue
+        if not scores:
+            aps.append(0.0)
+            continue
+        hits = np.array(hits)[np.argsort(-np.array(scores), kind="stable")]
+        true_positives = np.cumsum(hits)
+        recall = true_positives / expected
+        precision = true_positives / np.arange(1, len(hits) + 1)
+        # Precision envelope: best precision at this recall or higher
+        precision = np.maximum.accumulate(precision[::-1])[::-1]
+        points = np.searchsorted(recall, np.linspace(0, 1, 101), side="left")
+        aps.append(float(np.mean([precision[i] if i < len(precision) else 0.0 for i in points])))
+    return float(np.mean(aps)) if aps else 0.0
+
+
+def time_backend(model, frames: list, warmup: int, conf: float):
+    """Per-frame latencies (seconds) and detections of one model over the frames."""
+    for frame in frames[:warmup]:
+        model(frame, verbose=False, conf=conf)
+    latencies, found = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        result = model(frame, verbose=False, conf=conf)[0]
+        latencies.append(time.perf_counter() - start)
+        found.append(result_detections(result))
+    return np.array(latencies), found
+
+
+def run(args):
+    videos = [path for pattern in args.videos for path in sorted(glob.glob(pattern))]
+    if not videos:
+        print(f"❌ Error: No videos match {' '.join(args.videos)}")
+        sys.exit(1)
+    frames = [frame for video in videos for frame in sample_frames(video, args.frames)]
+    print(f"Sampled {len(frames)} frames from {len(videos)} video(s)")
+
+    reference = None
+    baseline_ms = baseline_map = None
+    rows = []
+    for name in args.backends:
+        backend, int8 = CONFIGS[name]
+        try:
+            model = load_model(args.model, backend, int8)
+            if reference is None:
+                # PyTorch detections are the reference boxes for every backend
+                reference_model = model if name == "pytorch" else load_model(args.model)
+                reference = [
+                    result_detections(reference_model(frame, verbose=False, conf=args.ref_conf)[0])
+                    for frame in frames
+                ]
+            latencies, found = time_backend(model, frames, args.warmup, args.conf)
+        except Exception as e:
+            print(f"⚠ Skipping {name}: {e}")
+            continue
+        ms = float(np.median(latencies)) * 1000
+        map50 = average_precision(found, reference, 0.5)
+        map50_95 = float(np.mean([average_precision(found, reference, t) for t in IOU_THRESHOLDS]))
+        if baseline_ms is None:
+            baseline_ms, baseline_map = ms, map50_95
+        rows.append((name, ms, float(np.percentile(latencies, 90)) * 1000, baseline_ms / ms, map50, map50_95,
+                     map50_95 - baseline_map))
+
+    print()
+    print(f"{'backend':<14} {'ms':>7} {'p90':>7} {'speedup':>7} {'mAP50':>6} {'mAP50-95':>8} {'drift':>7}")
+    for name, ms, p90, speedup, map50, map50_95, drift in rows:
+        print(f"{name:<14} {ms:>7.1f} {p90:>7.1f} {speedup:>6.2f}x {map50:>6.3f} {map50_95:>8.3f} {drift:>+7.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare YOLO latency and mAP drift across PyTorch, ONNX Runtime and OpenVINO",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--videos",
+        nargs="+",
+        default=[str(REPO / "videos" / "*.mp4")],
+        help="Videos or globs to sample frames from (default: videos/*.mp4)",
+    )
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=list(CONFIGS),
+        default=list(CONFIGS),
+        help="Backends to compare; the first is the speedup and drift baseline (default: all)",
+    )
+    parser.add_argument("--frames", type=int, default=50, help="Frames sampled per video (default: 50)")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed calls first (default: 5)")
+    parser.add_argument("--conf", type=float, default=0.001, help="Confidence threshold scored (default: 0.001)")
+    parser.add_argument(
+        "--ref-conf", type=float, default=0.25, help="Confidence of the PyTorch reference boxes (default: 0.25)"
+    )
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLO model (default: yolov8n.pt)")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
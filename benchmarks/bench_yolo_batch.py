@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark batched YOLO inference (--batch-size in to_gif.py and
+yolo/yolo_detection_script.py) in frames per second.
+
+Up to --frames frames of each video are decoded into memory first, so the
+timings cover inference only, then run through detect_batches() at each batch
+size after one warm-up batch. "boxes" is the share of frames whose detections
+(class and box, to a pixel) match batch size 1: batching letterboxes every
+frame of a video to the same shape, so they should all match.
+
+Needs ultralytics (pip install ultralytics); the model is downloaded on first use.
+
+Usage:
+  python benchmarks/bench_yolo_batch.py
+  python benchmarks/bench_yolo_batch.py --videos yolo/burger.mp4 --batch-sizes 1 4 16 --frames 300
+"""
+
+import argparse
+import glob
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from yolo_inference import detect_batches, load_model  # noqa: E402
+
+
+def decode(video: str, max_frames: int) -> list:
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def detections(result) -> tuple:
+    """Classes and pixel-rounded boxes of a result, sorted, for comparing runs."""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return ()
+    rows = np.column_stack([boxes.cls.cpu().numpy(), np.round(boxes.xyxy.cpu().numpy())])
+    return tuple(sorted(map(tuple, rows.tolist())))
+
+
+def run_batch(model, frames: list, batch_size: int):
+    """Frames per second and per-frame detections at one batch size."""
+    # Warm-up: the first call of a shape builds the letterbox and allocates buffers
+    list(detect_batches(model, frames[:batch_size], batch_size))
+    start = time.perf_counter()
+    found = [detections(result) for _, result in detect_batches(model, frames, batch_size)]
+    return len(frames) / (time.perf_counter() - start), found
+
+
+def run(args):
+    videos = [path for pattern in args.videos for path in sorted(glob.glob(pattern))]
+    if not videos:
+        print(f"❌ Error: No videos match {' '.join(args.videos)}")
+        sys.exit(1)
+
+    print(f"Loading YOLO model: {args.model}...")
+    model = load_model(args.model)
+
+    print()
+    print(f"{'video':<18} {'frames':>6} {'batch':>5} {'fps':>7} {'ms/frame':>8} {'speedup':>7} {'boxes':>6}")
+    for video in videos:
+        frames = decode(video, args.frames)
+        if not frames:
+            print(f"⚠ Could not decode {video}")
+            continue
+        baseline_fps, baseline = None, None
+        for batch_size in args.batch_sizes:
+            fps, found = run_batch(model, frames, batch_size)
+            if baseline is None:
+                baseline_fps, baseline = fps, found
+            same = np.mean([a == b for a, b in zip(found, baseline)])
+            print(
+                f"{Path(video).name:<18} {len(frames):>6} {batch_size:>5} {fps:>7.1f} "
+                f"{1000 / fps:>8.1f} {fps / baseline_fps:>6.2f}x {same:>6.1%}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure YOLO frames per second at several batch sizes",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--videos",
+        nargs="+",
+        default=[str(REPO / "yolo" / "burger.mp4"), str(REPO / "videos" / "*.mp4")],
+        help="Videos or globs (default: yolo/burger.mp4 videos/*.mp4)",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16],
+        help="Batch sizes; the first is the baseline (default: 1 2 4 8 16)",
+    )
+    parser.add_argument("--frames", type=int, default=240, help="Frames per video (default: 240)")
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLO model (default: yolov8n.pt)")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
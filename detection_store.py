@@ -0,0 +1,368 @@
+"""
+Columnar storage for per-frame YOLO detections.
+
+yolo/frames_all keeps one pretty-printed JSON file per frame (and
+detection_summary.json repeats them all), so reading a clip's detections
+means parsing hundreds of files that are mostly whitespace. A detection
+store is a single .npz with one array per field, one row per box, sorted by
+frame:
+
+    frame, class_id, confidence, x1, y1, x2, y2,
+    center_x_ratio, center_y_ratio, area_ratio
+
+plus every frame number and filename (frames without boxes included), the
+class names and the video's width, height and fps. np.savez writes the
+members uncompressed, so DetectionStore memory-maps them where they lie in
+the file. Nothing is read until a column is used, and a frame range is a
+binary search and a slice of the frame column.
+
+Usage:
+  python detection_store.py convert yolo/frames_all
+  python detection_store.py query yolo/frames_all/detections.npz --frames 100 160 --classes sandwich --min-conf 0.6
+"""
+
+import argparse
+import json
+import struct
+import sys
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from keyframes import Detections
+
+COLUMNS = {
+    "frame": np.int32,
+    "class_id": np.int16,
+    "confidence": np.float32,
+    "x1": np.float32,
+    "y1": np.float32,
+    "x2": np.float32,
+    "y2": np.float32,
+    "center_x_ratio": np.float32,
+    "center_y_ratio": np.float32,
+    "area_ratio": np.float32,
+}
+BOX = ("x1", "y1", "x2", "y2")
+NORMALIZED = ("center_x_ratio", "center_y_ratio", "area_ratio")
+
+
+def _open_npz(path: Union[str, Path], mmap: bool = True) -> Dict[str, np.ndarray]:
+    """Arrays of an .npz, memory-mapped in place where the member is stored uncompressed."""
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        arrays = {}
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if not mmap or info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            # The member's data follows its local header: 30 bytes, then the name and extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject or not shape or 0 in shape:
+                # np.memmap can't map empty or 0-d arrays
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            arrays[name] = np.memmap(
+                path, dtype=dtype, mode="r", offset=f.tell(), shape=shape, order="F" if fortran_order else "C"
+            )
+    return arrays
+
+
+def write_store(
+    path: Union[str, Path],
+    columns: Dict[str, np.ndarray],
+    frame_numbers: Sequence[int],
+    frame_filenames: Sequence[str],
+    names: Dict[int, str],
+    width: int = 0,
+    height: int = 0,
+    fps: float = 0.0,
+):
+    """Write detections as a detection store.
+
+    Args:
+        path: Output .npz
+        columns: One array per name in COLUMNS, one row per box
+        frame_numbers: Every frame, with or without boxes
+        frame_filenames: Image file of each frame ("" if none)
+        names: Class name by class id
+        width: Frame width in pixels
+        height: Frame height in pixels
+        fps: Frames per second of the video
+    """
+    missing = set(COLUMNS) - set(columns)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+    # Stable sort: boxes of a frame keep their order
+    order = np.argsort(np.asarray(columns["frame"]), kind="stable")
+    arrays = {name: np.asarray(columns[name], dtype=dtype)[order] for name, dtype in COLUMNS.items()}
+    class_ids = sorted(names)
+    np.savez(
+        path,
+        **arrays,
+        frame_numbers=np.asarray(frame_numbers, dtype=np.int32),
+        frame_filenames=np.asarray(frame_filenames, dtype=str),
+        class_ids=np.asarray(class_ids, dtype=np.int16),
+        class_names=np.asarray([names[i] for i in class_ids], dtype=str),
+        width=np.int32(width),
+        height=np.int32(height),
+        fps=np.float64(fps),
+    )
+
+
+class DetectionStore:
+    """Read-only view of a detection store.
+
+    Columns are memory-mapped (unless mmap=False) and read on first use;
+    store["confidence"] is the whole column, select() a filtered subset.
+    """
+
+    def __init__(self, path: Union[str, Path], mmap: bool = True):
+        self.path = Path(path)
+        try:
+            self._arrays = _open_npz(self.path, mmap)
+        except Exception as e:
+            raise Exception(f"Error opening detection store {path}: {str(e)}")
+        missing = set(COLUMNS) - set(self._arrays)
+        if missing:
+            raise Exception(f"Error: {path} is not a detection store (missing {', '.join(sorted(missing))})")
+        self.names = {int(i): str(n) for i, n in zip(self._arrays["class_ids"], self._arrays["class_names"])}
+        self.width = int(self._arrays["width"])
+        self.height = int(self._arrays["height"])
+        self.fps = float(self._arrays["fps"])
+
+    def __len__(self) -> int:
+        return len(self._arrays["frame"])
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self._arrays[column]
+
+    @property
+    def frame_numbers(self) -> np.ndarray:
+        """Every frame of the clip, including frames without boxes."""
+        return self._arrays["frame_numbers"]
+
+    @property
+    def frame_filenames(self) -> np.ndarray:
+        return self._arrays["frame_filenames"]
+
+    def class_ids(self, classes: Sequence[Union[int, str]]) -> np.ndarray:
+        """Class ids for class names or ids."""
+        by_name = {name: class_id for class_id, name in self.names.items()}
+        ids = []
+        for cls in classes:
+            if isinstance(cls, str) and not cls.isdigit():
+                if cls not in by_name:
+                    raise ValueError(f"Unknown class {cls!r}; known: {', '.join(sorted(by_name))}")
+                ids.append(by_name[cls])
+            else:
+                ids.append(int(cls))
+        return np.asarray(ids, dtype=np.int16)
+
+    def frame_rows(self, first: Optional[int] = None, last: Optional[int] = None) -> slice:
+        """Rows of frames first to last (inclusive), found by binary search."""
+        frames = self._arrays["frame"]
+        start = 0 if first is None else int(np.searchsorted(frames, first, side="left"))
+        stop = len(frames) if last is None else int(np.searchsorted(frames, last, side="right"))
+        return slice(start, max(start, stop))
+
+    def select(
+        self,
+        first: Optional[int] = None,
+        last: Optional[int] = None,
+        classes: Optional[Sequence[Union[int, str]]] = None,
+        min_conf: Optional[float] = None,
+        columns: Sequence[str] = tuple(COLUMNS),
+    ) -> Dict[str, np.ndarray]:
+        """Detections of frames first to last (inclusive), of some classes, at or above a confidence.
+
+        Args:
+            first: First frame number (default: the first)
+            last: Last frame number (default: the last)
+            classes: Class names or ids to keep (default: all)
+            min_conf: Lowest confidence kept (default: all)
+            columns: Columns to return
+
+        Returns:
+            Column name to array, one row per selected box
+        """
+        rows = self.frame_rows(first, last)
+        mask = None
+        if classes is not None:
+            mask = np.isin(self._arrays["class_id"][rows], self.class_ids(classes))
+        if min_conf is not None:
+            confident = self._arrays["confidence"][rows] >= min_conf
+            mask = confident if mask is None else mask & confident
+        if mask is None:
+            return {name: self._arrays[name][rows] for name in columns}
+        return {name: self._arrays[name][rows][mask] for name in columns}
+
+    def detections(self, frame: int) -> Detections:
+        """Boxes of one frame."""
+        rows = self.frame_rows(frame, frame)
+        return Detections(
+            np.stack([self._arrays[name][rows] for name in BOX], axis=1),
+            np.asarray(self._arrays["confidence"][rows]),
+            self._arrays["class_id"][rows].astype(np.float32),
+        )
+
+    def iter_frames(self) -> Iterator[Tuple[int, Detections]]:
+        """(frame number, Detections) for every frame in order, frames without boxes included."""
+        frames = np.asarray(self._arrays["frame"])
+        frame_numbers = np.asarray(self.frame_numbers)
+        starts = np.searchsorted(frames, frame_numbers, side="left")
+        stops = np.searchsorted(frames, frame_numbers, side="right")
+        xyxy = np.stack([self._arrays[name] for name in BOX], axis=1)
+        conf = np.asarray(self._arrays["confidence"])
+        cls = self._arrays["class_id"].astype(np.float32)
+        for frame, start, stop in zip(frame_numbers, starts, stops):
+            yield int(frame), Detections(xyxy[start:stop], conf[start:stop], cls[start:stop])
+
+
+def read_json_dir(directory: Union[str, Path]) -> dict:
+    """Read yolo/frames_all-style per-frame JSON detections into write_store() arguments.
+
+    Args:
+        directory: Directory with detections/frame_*.json (or the detections
+            directory itself); its detection_summary.json, if any, gives the
+            video's width, height and fps
+
+    Returns:
+        Keyword arguments for write_store()
+    """
+    directory = Path(directory)
+    detections_dir = directory / "detections" if (directory / "detections").is_dir() else directory
+    paths = sorted(detections_dir.glob("frame_*.json"))
+    if not paths:
+        raise Exception(f"Error: No frame_*.json detections in {detections_dir}")
+
+    columns = {name: [] for name in COLUMNS}
+    frame_numbers, frame_filenames, names = [], [], {}
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                frame = json.load(f)
+        except Exception as e:
+            raise Exception(f"Error reading {path}: {str(e)}")
+        frame_numbers.append(frame["frame_number"])
+        frame_filenames.append(frame.get("frame_filename", ""))
+        for box in frame["detections"]:
+            columns["frame"].append(frame["frame_number"])
+            columns["class_id"].append(box["class_id"])
+            columns["confidence"].append(box["confidence"])
+            for name in BOX:
+                columns[name].append(box["bbox"][name])
+            for name in NORMALIZED:
+                columns[name].append(box["normalized"][name])
+            names[box["class_id"]] = box["class_name"]
+
+    video = {}
+    for summary in (detections_dir / "detection_summary.json", detections_dir.parent / "detection_summary.json"):
+        if summary.exists():
+            with open(summary, encoding="utf-8") as f:
+                video = json.load(f).get("video_properties", {})
+            break
+
+    return {
+        "columns": columns,
+        "frame_numbers": frame_numbers,
+        "frame_filenames": frame_filenames,
+        "names": names,
+        "width": video.get("width", 0),
+        "height": video.get("height", 0),
+        "fps": video.get("fps", 0.0),
+    }
+
+
+def convert(directory: Union[str, Path], output: Optional[Union[str, Path]] = None) -> Path:
+    """Convert per-frame JSON detections to a detection store (default: DIR/detections.npz)."""
+    directory = Path(directory)
+    output = Path(output) if output else directory / "detections.npz"
+    write_store(output, **read_json_dir(directory))
+    return output
+
+
+def _directory_size(paths: List[Path]) -> int:
+    return sum(path.stat().st_size for path in paths)
+
+
+def run_convert(args):
+    try:
+        output = convert(args.directory, args.output)
+    except Exception as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    store = DetectionStore(output)
+    directory = Path(args.directory)
+    json_files = list(directory.rglob("*.json"))
+    print(f"✅ Wrote {len(store)} detection(s) of {len(store.frame_numbers)} frame(s) to {output}")
+    print(
+        f"   {output.stat().st_size / 1024:.0f} KB, from {len(json_files)} JSON file(s) "
+        f"of {_directory_size(json_files) / 1024:.0f} KB"
+    )
+
+
+def run_query(args):
+    try:
+        store = DetectionStore(args.store)
+        first, last = args.frames if args.frames else (None, None)
+        selected = store.select(first, last, args.classes, args.min_conf)
+    except Exception as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"{'frame':>6} {'class':<14} {'conf':>5} {'x1':>7} {'y1':>7} {'x2':>7} {'y2':>7}")
+    for row in range(min(len(selected["frame"]), args.limit)):
+        print(
+            f"{selected['frame'][row]:>6} {store.names.get(int(selected['class_id'][row]), '?'):<14} "
+            f"{selected['confidence'][row]:>5.2f} "
+            + " ".join(f"{selected[name][row]:>7.1f}" for name in BOX)
+        )
+    frames = np.unique(selected["frame"])
+    print(f"\n{len(selected['frame'])} detection(s) in {len(frames)} frame(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert per-frame JSON detections to a columnar store and query it",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 detection_store.py convert yolo/frames_all
+  python3 detection_store.py query yolo/frames_all/detections.npz --classes sandwich bowl --min-conf 0.6
+        """,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser("convert", help="Convert DIR/detections/frame_*.json")
+    convert_parser.add_argument("directory", help="Directory with detections/frame_*.json (e.g. yolo/frames_all)")
+    convert_parser.add_argument("--output", "-o", help="Output .npz (default: DIR/detections.npz)")
+    convert_parser.set_defaults(run=run_convert)
+
+    query_parser = commands.add_parser("query", help="Print the detections of a frame range and classes")
+    query_parser.add_argument("store", help="Detection store (.npz)")
+    query_parser.add_argument(
+        "--frames", type=int, nargs=2, metavar=("FIRST", "LAST"), help="Frame range, inclusive (default: all)"
+    )
+    query_parser.add_argument("--classes", nargs="+", help="Class names or ids (default: all)")
+    query_parser.add_argument("--min-conf", type=float, help="Lowest confidence (default: all)")
+    query_parser.add_argument("--limit", type=int, default=50, help="Rows printed at most (default: 50)")
+    query_parser.set_defaults(run=run_query)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
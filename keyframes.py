@@ -0,0 +1,271 @@
+"""
+Keyframe detection: run the detector on some frames of a video and fill in the rest.
+
+At 60 fps boxes barely move from one frame to the next, so detecting on every
+frame mostly recomputes the same boxes. KeyframeDetector runs the detector on
+every `every`-th frame, and sooner when the picture has changed a lot since
+the last keyframe (motion_score() of small grayscale thumbnails, which costs
+far less than a detector call). Frames in between get their boxes from the
+keyframes around them:
+
+- "interpolate": boxes matched (by class and IoU) between the previous and
+  the next keyframe move linearly between them. Frames wait for the next
+  keyframe, so up to `every` frames are held back; the last frame of the
+  video is detected.
+- "track": boxes keep moving at the velocity measured between the last two
+  keyframes. No lookahead, for when frames must not be held back.
+- "hold": the last keyframe's boxes are repeated.
+
+benchmarks/bench_keyframes.py measures the speedup and how far the filled-in
+boxes are from detecting every frame.
+"""
+
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+FILL_MODES = ("interpolate", "track", "hold")
+
+
+class Detections(NamedTuple):
+    """Boxes of one frame.
+
+    xyxy is (n, 4), conf and cls are (n,). source is the detector output of
+    the keyframe they come from (e.g. an ultralytics result), if any.
+    """
+
+    xyxy: np.ndarray
+    conf: np.ndarray
+    cls: np.ndarray
+    source: object = None
+
+
+def no_detections(source=None) -> Detections:
+    """A frame without boxes."""
+    return Detections(
+        np.zeros((0, 4), dtype=np.float32),
+        np.zeros(0, dtype=np.float32),
+        np.zeros(0, dtype=np.float32),
+        source,
+    )
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of boxes a (n, 4) and b (m, 4) in xyxy, as an (n, m) array."""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(np.clip(a[:, 2:] - a[:, :2], 0, None), axis=1)
+    area_b = np.prod(np.clip(b[:, 2:] - b[:, :2], 0, None), axis=1)
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def greedy_match(iou: np.ndarray, min_iou: float = 0.3) -> Tuple[np.ndarray, np.ndarray]:
+    """Pair rows and columns of an IoU matrix, highest IoU first, each used at most once.
+
+    Returns:
+        (rows, columns) of the pairs with IoU >= min_iou
+    """
+    rows, cols = [], []
+    used_rows, used_cols = set(), set()
+    for flat in np.argsort(-iou, axis=None, kind="stable"):
+        i, j = divmod(int(flat), iou.shape[1])
+        if iou[i, j] < min_iou:
+            break
+        if i in used_rows or j in used_cols:
+            continue
+        used_rows.add(i)
+        used_cols.add(j)
+        rows.append(i)
+        cols.append(j)
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+
+def match_boxes(a: Detections, b: Detections, min_iou: float = 0.3) -> Tuple[np.ndarray, np.ndarray]:
+    """Pair boxes of the same class in two frames, highest IoU first.
+
+    Args:
+        a: Boxes of one frame
+        b: Boxes of the other frame
+        min_iou: Pairs overlapping less than this are not matched
+
+    Returns:
+        (rows into a, rows into b) of the matched pairs
+    """
+    iou = box_iou(a.xyxy, b.xyxy)
+    iou[np.asarray(a.cls)[:, None] != np.asarray(b.cls)[None, :]] = 0
+    return greedy_match(iou, min_iou)
+
+
+def thumbnail(frame: np.ndarray, width: int = 64) -> np.ndarray:
+    """Small grayscale copy of a BGR frame for motion_score().
+
+    Every 4th pixel is area-averaged down to `width`, about half the cost of
+    shrinking the whole frame and plenty to tell motion apart.
+    """
+    small = frame[::4, ::4]
+    height = max(1, round(width * small.shape[0] / small.shape[1]))
+    small = cv2.resize(small, (width, height), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small.astype(np.float32)
+
+
+def motion_score(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute difference of two thumbnails, in gray levels (0-255)."""
+    return float(np.mean(np.abs(a - b)))
+
+
+def _select(detections: Detections, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return detections.xyxy[rows], detections.conf[rows], detections.cls[rows]
+
+
+def _clipped(xyxy, conf, cls, shape, source) -> Detections:
+    """Boxes clipped to the frame, dropping those left without area."""
+    height, width = shape[:2]
+    xyxy = np.clip(xyxy, 0, [width, height, width, height]).astype(np.float32)
+    keep = (xyxy[:, 2] > xyxy[:, 0]) & (xyxy[:, 3] > xyxy[:, 1])
+    return Detections(xyxy[keep], conf[keep], cls[keep], source)
+
+
+class KeyframeDetector:
+    """Detect on keyframes and fill in the boxes of the frames in between.
+
+    Feed it the frames of a video in order with push(), then call flush() at
+    the end; both return the frames that are ready, in order.
+
+    Args:
+        detect: Runs the detector on a list of frames, returning Detections per frame
+        every: Detect on every `every`-th frame at least (1: every frame)
+        motion_threshold: Also detect when motion_score() against the last
+            keyframe exceeds this (None: only every `every` frames)
+        fill: How frames in between get boxes: "interpolate", "track" or "hold"
+        min_iou: IoU above which boxes of two keyframes are the same object
+    """
+
+    def __init__(
+        self,
+        detect: Callable[[List[np.ndarray]], Sequence[Detections]],
+        every: int = 5,
+        motion_threshold: Optional[float] = None,
+        fill: str = "interpolate",
+        min_iou: float = 0.3,
+    ):
+        if fill not in FILL_MODES:
+            raise ValueError(f"fill must be one of {', '.join(FILL_MODES)}, got {fill!r}")
+        self.detect = detect
+        self.every = max(1, every)
+        self.motion_threshold = motion_threshold
+        self.fill = fill
+        self.min_iou = min_iou
+
+        self.frames = 0
+        self.keyframes = 0
+        self.motion_keyframes = 0
+        self._key_index = None  # last frame chosen as a keyframe
+        self._key_thumb = None
+        self._key = None  # Detections of the last keyframe detected so far
+        self._detected_index = None
+        self._velocity = None  # track: per-frame motion of each box of _key
+        self._pending = []  # interpolate: (index, frame) waiting for the next keyframe
+
+    def _is_keyframe(self, index: int, thumb: Optional[np.ndarray]) -> bool:
+        if self._key_index is None or index - self._key_index >= self.every:
+            return True
+        if thumb is not None and motion_score(thumb, self._key_thumb) > self.motion_threshold:
+            self.motion_keyframes += 1
+            return True
+        return False
+
+    def push(self, frames: Sequence[np.ndarray]) -> List[Tuple[np.ndarray, Detections, bool]]:
+        """Take the next frames of the video.
+
+        Keyframes among them are detected in one detector call.
+
+        Returns:
+            (frame, detections, is_keyframe) of every frame that is ready, in order
+        """
+        selected = []
+        for frame in frames:
+            index = self.frames
+            self.frames += 1
+            thumb = thumbnail(frame) if self.motion_threshold is not None else None
+            is_key = self._is_keyframe(index, thumb)
+            if is_key:
+                self._key_index = index
+                self._key_thumb = thumb
+            selected.append((index, frame, is_key))
+
+        keyframes = [frame for _, frame, is_key in selected if is_key]
+        found = iter(self.detect(keyframes) if keyframes else ())
+        ready = []
+        for index, frame, is_key in selected:
+            if is_key:
+                self._keyframe(index, frame, next(found), ready)
+            else:
+                self._between(index, frame, ready)
+        return ready
+
+    def flush(self) -> List[Tuple[np.ndarray, Detections, bool]]:
+        """Frames still held back at the end of the video (interpolate only).
+
+        The last frame is detected so the ones before it can be interpolated.
+        """
+        if not self._pending:
+            return []
+        index, frame = self._pending.pop()
+        ready = []
+        self._keyframe(index, frame, self.detect([frame])[0], ready)
+        return ready
+
+    def _keyframe(self, index: int, frame: np.ndarray, detections: Detections, ready: list):
+        self.keyframes += 1
+        previous, previous_index = self._key, self._detected_index
+        if previous is not None and self.fill != "hold":
+            rows, cols = match_boxes(previous, detections, self.min_iou)
+            if self.fill == "track":
+                self._velocity = np.zeros_like(detections.xyxy)
+                self._velocity[cols] = (detections.xyxy[cols] - previous.xyxy[rows]) / (index - previous_index)
+            else:
+                for between, pending_frame in self._pending:
+                    t = (between - previous_index) / (index - previous_index)
+                    ready.append(
+                        (pending_frame, self._interpolated(previous, detections, rows, cols, t, pending_frame.shape), False)
+                    )
+                self._pending = []
+        self._key = detections
+        self._detected_index = index
+        ready.append((frame, detections, True))
+
+    def _between(self, index: int, frame: np.ndarray, ready: list):
+        key = self._key
+        if self.fill == "interpolate":
+            self._pending.append((index, frame))
+        elif self.fill == "track" and self._velocity is not None:
+            steps = index - self._detected_index
+            ready.append(
+                (frame, _clipped(key.xyxy + self._velocity * steps, key.conf, key.cls, frame.shape, key.source), False)
+            )
+        else:
+            ready.append((frame, key, False))
+
+    @staticmethod
+    def _interpolated(a: Detections, b: Detections, rows, cols, t: float, shape) -> Detections:
+        """Matched boxes t of the way from a to b; unmatched ones from the nearer keyframe."""
+        xyxy = a.xyxy[rows] + (b.xyxy[cols] - a.xyxy[rows]) * t
+        conf = a.conf[rows] + (b.conf[cols] - a.conf[rows]) * t
+        cls = b.cls[cols]
+        nearer, matched = (a, rows) if t < 0.5 else (b, cols)
+        unmatched = np.setdiff1d(np.arange(len(nearer.xyxy)), matched)
+        extra_xyxy, extra_conf, extra_cls = _select(nearer, unmatched)
+        return _clipped(
+            np.concatenate([xyxy, extra_xyxy]),
+            np.concatenate([conf, extra_conf]),
+            np.concatenate([cls, extra_cls]),
+            shape,
+            nearer.source,
+        )
@@ -1,22 +1,32 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from typing import Optional, List, Dict
-from openai import OpenAI
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
+from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from typing import TYPE_CHECKING, Optional, List, Dict, Tuple
 import os
-import faiss
+import asyncio
+import json
 import numpy as np
 import pickle
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from io import BytesIO
-from PIL import Image
 import base64
-import cv2
+import glob
 import subprocess
 import tempfile
-import requests
 import time
 from pathlib import Path
 
+from metadata_index import MetadataIndex
+from metrics import Counter, Gauge, Histogram, render as render_metrics, span
+from phash_index import HashIndex, dhash
+from query_cache import LRUCache, image_hash
+
+# openai, faiss (vector_store), PIL, cv2 and requests are imported where they are
+# first used so the app starts answering /healthz before they are loaded
+if TYPE_CHECKING:
+    from vector_store import VectorStore
+
 # Load environment variables
 load_dotenv()
 
@@ -25,7 +35,21 @@ load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     raise ValueError("OPENAI_API_KEY environment variable is not set")
-client = OpenAI(api_key=api_key)
+_client = None
+
+# Provider endpoints; point both at mock_providers.py for offline and load tests
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # None: api.openai.com
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io").rstrip("/")
+
+
+def get_client():
+    """OpenAI client, created (and the openai package imported) on first use."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        _client = OpenAI(api_key=api_key, base_url=OPENAI_BASE_URL)
+    return _client
 
 # Initialize ElevenLabs API key
 elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
@@ -33,55 +57,409 @@ if not elevenlabs_api_key:
     print("Warning: ELEVENLABS_API_KEY not set. Audio transcription will not work.")
 
 # Global variables for FAISS index and metadata
-faiss_index = None
+vector_store = None
 faiss_metadata = []
-EMBEDDING_DIM = 1536  # text-embedding-3-small dimension
+metadata_index = MetadataIndex()  # filter bitmaps over faiss_metadata
+duplicate_index = HashIndex()  # dHash of each image -> its first metadata row
+index_info = {}  # embedding model, dimension and prompt hash the live index was built with
+# Embedding model and dimension for new indexes. An existing index keeps
+# serving with the ones it was built with (FAISS_INFO_FILE) until a re-index
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+DESCRIPTION_VARIATIONS = 5  # descriptions generated (and embedded) per image
+PROMPT_FILE = "prompt.txt"
+# Full embedding dimension stored on disk (text-embedding-3-small: up to 1536)
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1536"))
+# First-pass search dimension; below EMBEDDING_DIM enables two-stage search
+SEARCH_DIM = int(os.getenv("SEARCH_DIM") or 0) or EMBEDDING_DIM
 FAISS_INDEX_FILE = "faiss_index.bin"
 FAISS_METADATA_FILE = "faiss_metadata.pkl"
+FAISS_INFO_FILE = "faiss_index.json"  # model, dimension and prompt hash of the index
+FAISS_VECTORS_FILE = "faiss_vectors.f32"  # full-precision vectors used for re-ranking
+
+# Coarse index storage: flat (exact float32), fp16, sq8 (int8) or pq
+FAISS_STORAGE = os.getenv("FAISS_STORAGE", "flat")
+FAISS_RERANK_FACTOR = int(os.getenv("FAISS_RERANK_FACTOR", "4"))
+FAISS_TRAIN_SIZE = int(os.getenv("FAISS_TRAIN_SIZE", "1000"))
+
+# Coarse index shards, searched in parallel. Vectors go to a shard by hashing
+# SHARD_KEY: a metadata field such as "cuisine" or "restaurant_id", or (when
+# empty) the image index.
+FAISS_SHARDS = int(os.getenv("FAISS_SHARDS", "1"))
+SHARD_KEY = os.getenv("SHARD_KEY", "")
+
+# Snapshots: POST /index-snapshot writes to SNAPSHOT_DIR; a node started without
+# an index serves SNAPSHOT_IMPORT (a snapshot directory) in place. See snapshot.py
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_IMPORT = os.getenv("SNAPSHOT_IMPORT", "")
+
+# Near-duplicate uploads (dHash within DUPLICATE_MAX_DISTANCE bits of an indexed
+# image): "reuse" copies the existing descriptions and embeddings, "reject"
+# refuses the upload, "off" describes every upload
+DUPLICATE_POLICY = os.getenv("DUPLICATE_POLICY", "reuse")
+DUPLICATE_MAX_DISTANCE = int(os.getenv("DUPLICATE_MAX_DISTANCE", "6"))
+
+# Variation dedup at ingest: an image's description embeddings within cosine
+# VARIATION_DEDUP_THRESHOLD of each other are stored once. "distinct" keeps the
+# first of each group, "centroid" stores the group mean, "off" stores all five
+VARIATION_DEDUP = os.getenv("VARIATION_DEDUP", "off")
+VARIATION_DEDUP_THRESHOLD = float(os.getenv("VARIATION_DEDUP_THRESHOLD", "0.95"))
+
+# /search-images caches (entries); 0 disables. See query_cache.py
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+
+# Compact once this fraction of rows are tombstones left by deletes/replaces
+COMPACT_THRESHOLD = float(os.getenv("COMPACT_THRESHOLD", "0.2"))
+
+# Background re-index (POST /index-reindex): provider requests per second it
+# may use, so it doesn't eat the rate limit live traffic needs, and
+# descriptions per embeddings request
+REINDEX_RATE = float(os.getenv("REINDEX_RATE", "2"))
+REINDEX_BATCH = int(os.getenv("REINDEX_BATCH", "100"))
+REINDEX_MODES = ("auto", "embeddings", "descriptions")
+
+# Serializes changes to vector_store/faiss_metadata. Searches don't take it, so
+# they keep being served from the old store while a compaction is building.
+index_lock = asyncio.Lock()
+compaction_task = None
+reindex_task = None
+reindex_status = {"state": "idle"}
+
+# Progress of the background index load, reported by /healthz and /readyz
+startup_task = None
+startup_status = {
+    "phase": "starting",
+    "started_at": time.time(),
+    "rows": None,
+    "ready_seconds": None,
+    "error": None,
+}
+
+# Bumped by every change to what a search can return; part of the result cache key
+index_version = 0
+# Random id of the current row numbering, replaced whenever rows are renumbered
+# (load, compaction, re-index swap). /index-list cursors carry it.
+row_layout = ""
+description_cache = LRUCache(QUERY_CACHE_SIZE)
+search_cache = LRUCache(QUERY_CACHE_SIZE)
+
+
+# Metrics served by /metrics; see metrics.py. Stage timings come from span()
+PROVIDER_SECONDS = Histogram(
+    "provider_request_seconds", "Latency of provider API calls", ("call",)
+)  # call: vision, embedding, stt
+PROVIDER_ERRORS = Counter("provider_errors_total", "Failed provider API calls", ("call",))
+FAISS_SEARCH_SECONDS = Histogram("faiss_search_seconds", "Vector store search time")
+FFMPEG_SECONDS = Histogram("ffmpeg_seconds", "Audio extraction time with ffmpeg")
+LOCK_WAIT_SECONDS = Histogram(
+    "index_lock_wait_seconds", "Time spent waiting for index_lock", ("operation",)
+)
+HTTP_SECONDS = Histogram(
+    "http_request_seconds", "Request latency by route", ("method", "route", "status")
+)
+Gauge(
+    "query_cache_hit_ratio",
+    "Hit ratio of the /search-images caches",
+    lambda: {
+        ("descriptions",): description_cache.stats()["hit_ratio"],
+        ("results",): search_cache.stats()["hit_ratio"],
+    },
+    ("cache",),
+)
+Gauge(
+    "index_vectors",
+    "Live vectors in the index",
+    lambda: vector_store.ntotal if vector_store is not None else 0,
+)
+
+
+@asynccontextmanager
+async def index_locked(operation: str):
+    """Hold index_lock, recording how long the operation queued for it."""
+    start = time.perf_counter()
+    async with index_lock:
+        LOCK_WAIT_SECONDS.observe(time.perf_counter() - start, operation=operation)
+        yield
+
+
+def bump_index_version():
+    """Invalidate cached search results after the index changed."""
+    global index_version
+    index_version += 1
+
+
+def new_row_layout():
+    """Invalidate /index-list cursors after rows were renumbered."""
+    global row_layout
+    row_layout = os.urandom(8).hex()
+
+
+def shard_key(entry: Dict, row: int):
+    """Shard key of a metadata entry: SHARD_KEY's value, else the image index, else the row."""
+    if SHARD_KEY and entry.get(SHARD_KEY) is not None:
+        return entry[SHARD_KEY]
+    if entry.get("image_index") is not None:
+        return entry["image_index"]
+    return row
+
+
+def create_vector_store(metadata: List[Dict], dim: int = EMBEDDING_DIM, **kwargs) -> "VectorStore":
+    """Load the vector store from disk, or create an empty one.
+
+    Extra keyword arguments go to VectorStore, e.g. vectors_source to serve a
+    snapshot's vectors in place.
+    """
+    from vector_store import VectorStore
+
+    return VectorStore.load(
+        FAISS_INDEX_FILE,
+        FAISS_VECTORS_FILE,
+        dim,
+        FAISS_STORAGE,
+        rows=len(metadata),
+        deleted=[i for i, item in enumerate(metadata) if item.get("deleted")],
+        shard_keys=[shard_key(item, i) for i, item in enumerate(metadata)],
+        rerank_factor=FAISS_RERANK_FACTOR,
+        train_size=FAISS_TRAIN_SIZE,
+        search_dim=min(SEARCH_DIM, dim) if SEARCH_DIM < EMBEDDING_DIM else dim,
+        n_shards=FAISS_SHARDS,
+        **kwargs,
+    )
+
+
+def save_index():
+    """Write the coarse index shards, metadata and index info via temporary files renamed into place."""
+    vector_store.save(FAISS_INDEX_FILE)
+    with open(FAISS_METADATA_FILE + ".tmp", "wb") as f:
+        pickle.dump(faiss_metadata, f)
+    os.replace(FAISS_METADATA_FILE + ".tmp", FAISS_METADATA_FILE)
+    write_index_info(index_info)
+
+
+def configured_index_info() -> Dict:
+    """Model, dimension and prompt hash that new embeddings would be made with."""
+    from snapshot import prompt_hash
+
+    return {
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_dim": EMBEDDING_DIM,
+        "prompt_hash": prompt_hash(PROMPT_FILE),
+    }
+
+
+def read_index_info() -> Dict:
+    """Info of the index on disk. Indexes saved before it existed match the config."""
+    if os.path.exists(FAISS_INFO_FILE) and os.path.exists(FAISS_METADATA_FILE):
+        with open(FAISS_INFO_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return configured_index_info()
+
+
+def write_index_info(info: Dict):
+    with open(FAISS_INFO_FILE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    os.replace(FAISS_INFO_FILE + ".tmp", FAISS_INFO_FILE)
+
+
+def index_mismatches() -> List[str]:
+    """Fields of index_info that differ from the configuration (re-index to fix)."""
+    configured = configured_index_info()
+    return [key for key, value in configured.items() if index_info.get(key) != value]
 
 
 def get_indexed_image_paths():
     """Get list of image paths already in the index."""
-    return [item.get("image_path", "") for item in faiss_metadata]
+    return [
+        item.get("image_path", "") for item in faiss_metadata if not item.get("deleted")
+    ]
 
 
 def get_indexed_image_indices():
     """Get set of image indices already in the index."""
-    return {item.get("image_index") for item in faiss_metadata if "image_index" in item}
+    return {
+        item.get("image_index")
+        for item in faiss_metadata
+        if "image_index" in item and not item.get("deleted")
+    }
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup: Load FAISS index and metadata
-    global faiss_index, faiss_metadata
+def get_image_rows(image_index: int) -> List[int]:
+    """Get the vector ids of the live descriptions stored for an image index."""
+    return [
+        i
+        for i, item in enumerate(faiss_metadata)
+        if item.get("image_index") == image_index and not item.get("deleted")
+    ]
+
+
+def build_duplicate_index(metadata: List[Dict]) -> HashIndex:
+    """Index the dHash of every live image under the row of its first description."""
+    index = HashIndex(DUPLICATE_MAX_DISTANCE)
+    for row, entry in enumerate(metadata):
+        if (
+            entry.get("dhash") is not None
+            and entry.get("description_variation") == 1
+            and not entry.get("deleted")
+        ):
+            index.add(int(entry["dhash"]), row)
+    return index
+
+
+def load_index_from_disk() -> Tuple[List[Dict], "VectorStore", MetadataIndex, HashIndex, Dict]:
+    """Read metadata, the vector store and index info, creating an empty index if needed.
 
-    if os.path.exists(FAISS_INDEX_FILE) and os.path.exists(FAISS_METADATA_FILE):
+    Runs on a worker thread; progress is reported through startup_status.
+    """
+    if SNAPSHOT_IMPORT and not os.path.exists(FAISS_METADATA_FILE):
+        # Fails startup (the node never reports ready) if the snapshot is
+        # corrupt or was embedded with a different model, dimension or prompt
+        from snapshot import open_snapshot
+
+        startup_status["phase"] = "checking snapshot"
+        snapshot = open_snapshot(SNAPSHOT_IMPORT, EMBEDDING_MODEL, EMBEDDING_DIM, PROMPT_FILE)
+        # Files without metadata belong to other rows (e.g. a write that was
+        # never saved); the coarse index is rebuilt from the snapshot's vectors
+        stem, ext = os.path.splitext(FAISS_INDEX_FILE)
+        for path in [FAISS_INDEX_FILE] + glob.glob(f"{glob.escape(stem)}.shard*{ext}"):
+            if os.path.exists(path):
+                os.remove(path)
+        if os.path.exists(FAISS_VECTORS_FILE):
+            os.rename(FAISS_VECTORS_FILE, FAISS_VECTORS_FILE + ".bak")
+
+        # Serve from the snapshot in place: metadata straight from metadata.arrow,
+        # vectors.npy mapped past its header. The first save writes our own files.
+        startup_status["phase"] = "loading snapshot"
+        metadata = snapshot.metadata()
+        startup_status["rows"] = len(metadata)
+        info = configured_index_info()
+        store = create_vector_store(
+            metadata,
+            vectors_source=snapshot.path(snapshot.manifest["vectors_file"]),
+            vectors_offset=snapshot.vectors_offset(),
+        )
+        print(
+            f"Loaded snapshot {SNAPSHOT_IMPORT} with {store.ntotal} vectors "
+            f"({store.storage} storage)"
+        )
+    elif os.path.exists(FAISS_METADATA_FILE):
+        info = read_index_info()
+        # Missing or mismatched shard files are rebuilt from the side file on load
         try:
-            # Load FAISS index
-            faiss_index = faiss.read_index(FAISS_INDEX_FILE)
             # Load metadata
+            startup_status["phase"] = "loading metadata"
             with open(FAISS_METADATA_FILE, "rb") as f:
-                faiss_metadata = pickle.load(f)
-            print(f"Loaded FAISS index with {faiss_index.ntotal} vectors")
+                metadata = pickle.load(f)
+            # Load FAISS index and full-precision side file
+            startup_status["phase"] = "loading vectors"
+            startup_status["rows"] = len(metadata)
+            store = create_vector_store(metadata, info["embedding_dim"])
+            print(
+                f"Loaded FAISS index with {store.ntotal} vectors "
+                f"({store.storage} storage)"
+            )
         except Exception as e:
             print(f"Error loading FAISS index: {e}. Creating new index.")
-            faiss_index = faiss.IndexFlatIP(EMBEDDING_DIM)
-            faiss_metadata = []
+            for path in (FAISS_INDEX_FILE, FAISS_VECTORS_FILE):
+                if os.path.exists(path):
+                    os.rename(path, path + ".bak")
+            metadata = []
+            info = configured_index_info()
+            store = create_vector_store(metadata)
     else:
         # Create new index
-        faiss_index = faiss.IndexFlatIP(EMBEDDING_DIM)
-        faiss_metadata = []
-        print("Created new FAISS index")
+        if os.path.exists(FAISS_VECTORS_FILE):
+            os.rename(FAISS_VECTORS_FILE, FAISS_VECTORS_FILE + ".bak")
+        metadata = []
+        info = configured_index_info()
+        store = create_vector_store(metadata)
+        print(f"Created new FAISS index ({store.storage} storage)")
+
+    startup_status["phase"] = "indexing metadata"
+    filters = MetadataIndex.from_metadata(metadata)
+    duplicates = build_duplicate_index(metadata)
+    # Import openai here rather than on the first request
+    get_client()
+    return metadata, store, filters, duplicates, info
+
+
+async def load_index():
+    """Background startup task: load the index, then mark the service ready."""
+    global vector_store, faiss_metadata, metadata_index, duplicate_index, index_info
+
+    try:
+        metadata, store, filters, duplicates, info = await asyncio.to_thread(
+            load_index_from_disk
+        )
+    except Exception as e:
+        startup_status["phase"] = "failed"
+        startup_status["error"] = str(e)
+        print(f"Error starting up: {e}")
+        return
+
+    vector_store, faiss_metadata, metadata_index = store, metadata, filters
+    duplicate_index, index_info = duplicates, info
+    search_cache.clear()
+    bump_index_version()
+    new_row_layout()
+    startup_status["phase"] = "ready"
+    startup_status["ready_seconds"] = round(time.time() - startup_status["started_at"], 3)
+    print(f"✓ Ready in {startup_status['ready_seconds']:.2f}s")
+
+    mismatches = index_mismatches()
+    if mismatches and faiss_metadata:
+        print(
+            f"⚠ Index was built with a different {', '.join(mismatches)}; it keeps "
+            f"serving with {index_info['embedding_model']} ({index_info['embedding_dim']}d) "
+            f"until POST /index-reindex"
+        )
+
+
+def index_ready() -> bool:
+    return startup_status["phase"] == "ready"
+
+
+def require_index():
+    """Raise 503 until the background startup task has loaded the index."""
+    if not index_ready():
+        raise HTTPException(
+            status_code=503,
+            detail=f"Index is not ready ({startup_status['phase']})",
+            headers={"Retry-After": "1"},
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: Load FAISS index and metadata in the background so the app can
+    # answer /healthz and /readyz right away
+    global vector_store, faiss_metadata, metadata_index, duplicate_index
+    global index_lock, compaction_task, reindex_task, startup_task
+    index_lock = asyncio.Lock()
+    compaction_task = None
+    reindex_task = None
+    reindex_status.clear()
+    reindex_status["state"] = "idle"
+    vector_store, faiss_metadata, metadata_index = None, [], MetadataIndex()
+    duplicate_index = HashIndex(DUPLICATE_MAX_DISTANCE)
+    startup_status.update(
+        phase="starting", started_at=time.time(), rows=None, ready_seconds=None, error=None
+    )
+    startup_task = asyncio.create_task(load_index())
 
     yield
 
     # Shutdown: Save FAISS index and metadata
-    if faiss_index is not None and faiss_index.ntotal > 0:
+    if not startup_task.done():
+        await asyncio.gather(startup_task, return_exceptions=True)
+    if compaction_task is not None and not compaction_task.done():
+        await asyncio.gather(compaction_task, return_exceptions=True)
+    if reindex_running():
+        # The old index is saved below; a restart starts the re-index over
+        reindex_task.cancel()
+        await asyncio.gather(reindex_task, return_exceptions=True)
+    if vector_store is not None and len(faiss_metadata) > 0:
         try:
-            faiss.write_index(faiss_index, FAISS_INDEX_FILE)
-            with open(FAISS_METADATA_FILE, "wb") as f:
-                pickle.dump(faiss_metadata, f)
-            print(f"Saved FAISS index with {faiss_index.ntotal} vectors")
+            save_index()
+            print(f"Saved FAISS index with {vector_store.ntotal} vectors")
         except Exception as e:
             print(f"Error saving FAISS index: {e}")
 
@@ -89,6 +467,21 @@ async def lifespan(app: FastAPI):
 app = FastAPI(title="Image Description API", lifespan=lifespan)
 
 
+@app.middleware("http")
+async def record_request_time(request: Request, call_next):
+    """Observe every request in http_request_seconds by route template."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
+    )
+    return response
+
+
 def parse_index_from_filename(filename: str) -> Optional[int]:
     """Extract index number from filename (number before underscore)."""
     if not filename:
@@ -103,6 +496,117 @@ def parse_index_from_filename(filename: str) -> Optional[int]:
     return None
 
 
+def description_request(image_bytes: bytes, variation: int = 0) -> dict:
+    """Chat-completions request body that describes an image.
+
+    Shared by get_image_description_from_bytes and the batch files written by
+    batch_ingest.py.
+
+    Args:
+        image_bytes: The image bytes
+        variation: Variation number (0-4) to generate different descriptions
+    """
+    # Load prompt from file
+    prompt_file = PROMPT_FILE
+    if os.path.exists(prompt_file):
+        with open(prompt_file, "r", encoding="utf-8") as f:
+            system_prompt = f.read().strip()
+    else:
+        system_prompt = "You are a food analysis assistant. Describe the food in the image objectively, focusing on ingredients, preparation style, and dish type."
+
+    from PIL import Image
+
+    image = Image.open(BytesIO(image_bytes))
+
+    buffered = BytesIO()
+    if image.format:
+        image.save(buffered, format=image.format)
+    else:
+        image.save(buffered, format="PNG")
+    image_base64 = base64.b64encode(buffered.getvalue()).decode()
+
+    mime_type = image.format.lower() if image.format else "png"
+    if mime_type == "jpeg":
+        mime_type = "jpg"
+
+    # Add variation instruction to get different descriptions
+    user_prompt = (
+        "Analyze this image and describe the food according to the instructions."
+    )
+    if variation > 0:
+        user_prompt += f" Provide a different perspective or emphasis on this description (variation {variation + 1})."
+
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {
+                "role": "system",
+                "content": system_prompt,
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": user_prompt,
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/{mime_type};base64,{image_base64}"
+                        },
+                    },
+                ],
+            },
+        ],
+        "max_tokens": 500,
+        "temperature": 0,
+    }
+
+
+def create_description(image_bytes: bytes, variation: int = 0) -> str:
+    """Describe an image with the vision model (blocking; the re-index job runs it on a thread).
+
+    Args:
+        image_bytes: The image bytes
+        variation: Variation number (0-4) to generate different descriptions
+    """
+    try:
+        with PROVIDER_SECONDS.time(call="vision"):
+            response = get_client().chat.completions.create(
+                **description_request(image_bytes, variation)
+            )
+
+        description = response.choices[0].message.content.strip()
+        return description
+    except Exception as e:
+        PROVIDER_ERRORS.inc(call="vision")
+        raise Exception(f"Error getting image description: {str(e)}")
+
+
+def create_embeddings(texts: List[str], model: str, dimensions: int) -> np.ndarray:
+    """Embed texts in one embeddings request (blocking).
+
+    Args:
+        texts: Texts to embed
+        model: Embedding model
+        dimensions: Embedding size; text-embedding-3 models shorten natively
+
+    Returns:
+        float32 array with one row per text
+    """
+    try:
+        with PROVIDER_SECONDS.time(call="embedding"):
+            response = get_client().embeddings.create(
+                model=model, input=texts, dimensions=dimensions
+            )
+        data = sorted(response.data, key=lambda item: item.index)
+        return np.array([item.embedding for item in data], dtype=np.float32)
+    except Exception as e:
+        PROVIDER_ERRORS.inc(call="embedding")
+        raise Exception(f"Error getting embedding: {str(e)}")
+
+
 async def get_image_description_from_bytes(
     image_bytes: bytes, variation: int = 0
 ) -> str:
@@ -112,81 +616,581 @@ async def get_image_description_from_bytes(
         image_bytes: The image bytes
         variation: Variation number (0-4) to generate different descriptions
     """
-    try:
-        # Load prompt from file
-        prompt_file = "prompt.txt"
-        if os.path.exists(prompt_file):
-            with open(prompt_file, "r", encoding="utf-8") as f:
-                system_prompt = f.read().strip()
-        else:
-            system_prompt = "You are a food analysis assistant. Describe the food in the image objectively, focusing on ingredients, preparation style, and dish type."
+    return create_description(image_bytes, variation)
+
+
+async def get_embedding(text: str, info: Optional[Dict] = None) -> np.ndarray:
+    """Get embedding for text using OpenAI embeddings API.
+
+    Args:
+        text: Text to embed
+        info: Index info whose model and dimension to use (default: the live
+            index's, which differs from the configuration until a re-index)
+    """
+    info = info or index_info
+    return create_embeddings([text], info["embedding_model"], info["embedding_dim"])[0]
+
+
+async def describe_and_embed(
+    image_bytes: bytes, info: Optional[Dict] = None, operation: str = "add"
+) -> Tuple[List[str], np.ndarray]:
+    """Generate 5 different descriptions of an image and embed each separately.
+
+    Args:
+        info: Index info to embed for (default: the live index's)
+        operation: Prefix of the stage names it is timed under ("add", "replace")
+    """
+    descriptions = []
+    with span(f"{operation}.describe", variations=DESCRIPTION_VARIATIONS):
+        for i in range(DESCRIPTION_VARIATIONS):
+            description = await get_image_description_from_bytes(image_bytes, variation=i)
+            descriptions.append(description)
+
+    embeddings = []
+    with span(f"{operation}.embed", texts=len(descriptions)):
+        for description in descriptions:
+            embeddings.append(await get_embedding(description, info))
 
-        image = Image.open(BytesIO(image_bytes))
+    return descriptions, np.vstack(embeddings)
 
-        buffered = BytesIO()
-        if image.format:
-            image.save(buffered, format=image.format)
+
+async def embeddings_for_live_index(
+    descriptions: List[str], embeddings: np.ndarray, info: Dict
+) -> np.ndarray:
+    """Embeddings made for `info`, re-embedded if a re-index swapped the model meanwhile.
+
+    Callers hold index_lock, so the live index can't change again before the insert.
+    """
+    if info is index_info:
+        return embeddings
+    return await asyncio.to_thread(
+        create_embeddings,
+        descriptions,
+        index_info["embedding_model"],
+        index_info["embedding_dim"],
+    )
+
+
+def merge_variations(
+    descriptions: List[str], embeddings: np.ndarray
+) -> Tuple[List[str], np.ndarray, Optional[List[Dict]]]:
+    """Apply VARIATION_DEDUP to one image's descriptions and embeddings.
+
+    Returns the descriptions and embeddings to store, plus per-entry metadata
+    giving each kept entry its original variation number and the variations
+    merged into it (None when nothing is merged).
+    """
+    if VARIATION_DEDUP == "off" or len(descriptions) < 2:
+        return descriptions, embeddings, None
+
+    from vector_store import merge_similar
+
+    merged, groups = merge_similar(
+        embeddings, VARIATION_DEDUP_THRESHOLD, centroid=VARIATION_DEDUP == "centroid"
+    )
+    if len(groups) == len(descriptions):
+        return descriptions, embeddings, None
+
+    entry_attributes = []
+    for group in groups:
+        attributes = {"description_variation": group[0] + 1}
+        if len(group) > 1:
+            attributes["merged_variations"] = [row + 1 for row in group[1:]]
+        entry_attributes.append(attributes)
+    return [descriptions[group[0]] for group in groups], merged, entry_attributes
+
+
+def make_entries(
+    descriptions: List[str],
+    image_path: Optional[str],
+    image_index: Optional[int],
+    attributes: Optional[Dict] = None,
+    entry_attributes: Optional[List[Dict]] = None,
+) -> List[Dict]:
+    """Metadata entries for one image's descriptions.
+
+    Args:
+        attributes: Extra metadata stored on every entry (e.g. cuisine, restaurant_id)
+        entry_attributes: Extra metadata per entry, e.g. the variation numbers
+            kept and merged by merge_variations
+    """
+    entries = []
+    for i, description in enumerate(descriptions):
+        # Store metadata with index number
+        metadata_entry = {
+            "image_path": image_path or "uploaded",
+            "description": description,
+            "description_variation": i + 1,
+        }
+        if image_index is not None:
+            metadata_entry["image_index"] = image_index
+        for key, value in (attributes or {}).items():
+            if value is not None:
+                metadata_entry[key] = value
+        if entry_attributes:
+            metadata_entry.update(entry_attributes[i])
+        entries.append(metadata_entry)
+    return entries
+
+
+def insert_entries(entries: List[Dict], embeddings: np.ndarray) -> int:
+    """Add embeddings and their metadata entries (any number of images) in one add.
+
+    Callers must hold index_lock. Returns the number of vectors added.
+    """
+    # Add to FAISS index (the store L2-normalizes for cosine similarity)
+    first_row = len(faiss_metadata)
+    ids = vector_store.add(
+        embeddings,
+        shard_keys=[shard_key(entry, first_row + i) for i, entry in enumerate(entries)],
+    )
+    assert ids[0] == first_row, "FAISS index and metadata out of sync"
+    faiss_metadata.extend(entries)
+    metadata_index.append(entries)
+    for row, entry in enumerate(entries, first_row):
+        if entry.get("dhash") is not None and entry.get("description_variation") == 1:
+            duplicate_index.add(int(entry["dhash"]), row)
+    bump_index_version()
+
+    return len(ids)
+
+
+def insert_descriptions(
+    descriptions: List[str],
+    embeddings: np.ndarray,
+    image_path: Optional[str],
+    image_index: Optional[int],
+    attributes: Optional[Dict] = None,
+    entry_attributes: Optional[List[Dict]] = None,
+) -> int:
+    """Add one image's description embeddings to the index with one metadata entry each.
+
+    Callers must hold index_lock. Returns the number of vectors added.
+    See make_entries for the arguments.
+    """
+    entries = make_entries(
+        descriptions, image_path, image_index, attributes, entry_attributes
+    )
+    return insert_entries(entries, embeddings)
+
+
+def get_duplicate_rows(first_row: int) -> List[int]:
+    """Rows of the live descriptions inserted together with `first_row`."""
+    first = faiss_metadata[first_row]
+    rows = []
+    variation = 0
+    for row in range(first_row, len(faiss_metadata)):
+        entry = faiss_metadata[row]
+        # Variation numbers rise within one insert (with gaps where variations
+        # were merged) and restart at 1 for the next image
+        if (
+            entry.get("deleted")
+            or entry.get("dhash") != first.get("dhash")
+            or entry.get("description_variation", 0) <= variation
+        ):
+            break
+        variation = entry["description_variation"]
+        rows.append(row)
+    return rows
+
+
+def remove_rows(ids: List[int]) -> int:
+    """Tombstone vectors and their metadata. Callers must hold index_lock."""
+    removed = vector_store.remove(ids)
+    for i in ids:
+        faiss_metadata[i]["deleted"] = True
+        duplicate_index.remove(i)
+    bump_index_version()
+    return removed
+
+
+async def compact_index() -> dict:
+    """Rebuild the side file, FAISS index and metadata without tombstoned rows.
+
+    The new store is built on a worker thread while searches keep using the
+    current one; adds and deletes wait for index_lock. The new store is then
+    swapped in and saved.
+    """
+    global vector_store, faiss_metadata, metadata_index, duplicate_index
+
+    async with index_locked("compact"):
+        removed = vector_store.tombstones
+        if removed == 0:
+            return {"success": True, "removed": 0, "index_size": vector_store.ntotal}
+
+        start_time = time.time()
+        print(f"Compacting FAISS index: dropping {removed} deleted vectors...")
+        new_store, kept_ids = await asyncio.to_thread(
+            vector_store.compacted, FAISS_VECTORS_FILE + ".compact"
+        )
+        new_metadata = [faiss_metadata[i] for i in kept_ids]
+        new_metadata_index = await asyncio.to_thread(
+            MetadataIndex.from_metadata, new_metadata
+        )
+        new_duplicate_index = await asyncio.to_thread(build_duplicate_index, new_metadata)
+
+        vector_store.vectors.close()
+        new_store.vectors.replace(FAISS_VECTORS_FILE)
+        vector_store, faiss_metadata = new_store, new_metadata
+        metadata_index = new_metadata_index
+        duplicate_index = new_duplicate_index
+        bump_index_version()
+        new_row_layout()
+        save_index()
+
+        elapsed = time.time() - start_time
+        print(f"✓ Compaction completed in {elapsed:.1f}s ({vector_store.ntotal} vectors)")
+        return {
+            "success": True,
+            "removed": removed,
+            "index_size": vector_store.ntotal,
+            "seconds": round(elapsed, 2),
+        }
+
+
+def maybe_schedule_compaction():
+    """Start a background compaction once tombstones pass COMPACT_THRESHOLD."""
+    global compaction_task
+
+    rows = len(vector_store.vectors)
+    if rows == 0 or vector_store.tombstones / rows < COMPACT_THRESHOLD:
+        return
+    if reindex_running():
+        # The re-indexed store leaves deleted rows out anyway
+        return
+    if compaction_task is None or compaction_task.done():
+        compaction_task = asyncio.create_task(compact_index())
+
+
+def reindex_running() -> bool:
+    return reindex_task is not None and not reindex_task.done()
+
+
+def reindex_progress() -> dict:
+    """reindex_status plus throughput and ETA while a re-index runs."""
+    progress = dict(reindex_status)
+    if progress["state"] in ("running", "swapping"):
+        elapsed = time.time() - progress["started_at"]
+        rate = progress["rows_done"] / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, progress["rows_total"] - progress["rows_done"])
+        progress["elapsed_seconds"] = round(elapsed, 1)
+        progress["rows_per_second"] = round(rate, 2)
+        progress["eta_seconds"] = round(remaining / rate, 1) if rate > 0 else None
+    return progress
+
+
+def reindex_groups(start: int, end: int, by_image: bool) -> List[List[int]]:
+    """Live rows in [start, end), grouped per image insert or in REINDEX_BATCH chunks.
+
+    Args:
+        by_image: Group the rows inserted together for one image (consecutive
+            rows with the same path and rising variation numbers), else chunk them
+    """
+    groups = []
+    previous = None
+    for row in range(start, end):
+        entry = faiss_metadata[row]
+        if entry.get("deleted"):
+            continue
+        if by_image:
+            same_image = (
+                previous is not None
+                and previous.get("image_path") == entry.get("image_path")
+                and previous.get("description_variation", 0) < entry.get("description_variation", 0)
+                and groups[-1][-1] == row - 1
+            )
+        else:
+            same_image = bool(groups) and len(groups[-1]) < REINDEX_BATCH
+        if same_image:
+            groups[-1].append(row)
         else:
-            image.save(buffered, format="PNG")
-        image_base64 = base64.b64encode(buffered.getvalue()).decode()
+            groups.append([row])
+        previous = entry
+    return groups
+
+
+class Throttle:
+    """Spaces provider requests at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_at = time.monotonic()
 
-        mime_type = image.format.lower() if image.format else "png"
-        if mime_type == "jpeg":
-            mime_type = "jpg"
+    async def wait(self):
+        delay = self.next_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.next_at = max(self.next_at, time.monotonic()) + self.interval
 
-        # Add variation instruction to get different descriptions
-        user_prompt = (
-            "Analyze this image and describe the food according to the instructions."
+
+async def reindex_group(
+    rows: List[int], describe: bool, target: Dict, throttle: Throttle
+) -> Tuple[List[Dict], np.ndarray, bool]:
+    """New metadata entries and embeddings for a group of live rows.
+
+    With `describe`, the image is described again from image_path with the
+    current prompt (rows must be one image's); if the file is gone, its stored
+    descriptions are embedded again instead.
+
+    Returns:
+        (entries, embeddings, image_missing)
+    """
+    entries = [dict(faiss_metadata[row]) for row in rows]
+    image_path = entries[0].get("image_path")
+    if describe and image_path and os.path.isfile(image_path):
+        image_bytes = await asyncio.to_thread(Path(image_path).read_bytes)
+        descriptions = []
+        for variation in range(DESCRIPTION_VARIATIONS):
+            await throttle.wait()
+            descriptions.append(
+                await asyncio.to_thread(create_description, image_bytes, variation)
+            )
+        await throttle.wait()
+        embeddings = await asyncio.to_thread(
+            create_embeddings, descriptions, target["embedding_model"], target["embedding_dim"]
         )
-        if variation > 0:
-            user_prompt += f" Provide a different perspective or emphasis on this description (variation {variation + 1})."
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt,
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": user_prompt,
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/{mime_type};base64,{image_base64}"
-                            },
-                        },
-                    ],
-                },
-            ],
-            max_tokens=500,
-            temperature=0,
+        descriptions, embeddings, entry_attributes = merge_variations(descriptions, embeddings)
+        attributes = {
+            key: value
+            for key, value in entries[0].items()
+            if key not in ("image_path", "image_index", "description", "description_variation", "merged_variations")
+        }
+        entries = make_entries(
+            descriptions, image_path, entries[0].get("image_index"), attributes, entry_attributes
         )
+        return entries, embeddings, False
 
-        description = response.choices[0].message.content.strip()
-        return description
-    except Exception as e:
-        raise Exception(f"Error getting image description: {str(e)}")
+    await throttle.wait()
+    embeddings = await asyncio.to_thread(
+        create_embeddings,
+        [entry["description"] for entry in entries],
+        target["embedding_model"],
+        target["embedding_dim"],
+    )
+    return entries, embeddings, describe
+
+
+def discard_shadow(shadow: "VectorStore", shadow_path: str):
+    shadow.vectors.close()
+    if os.path.exists(shadow_path):
+        os.remove(shadow_path)
 
 
-async def get_embedding(text: str) -> np.ndarray:
-    """Get embedding for text using OpenAI embeddings API."""
+async def reindex_index(mode: str) -> dict:
+    """Rebuild the index with the configured embedding model (and prompt) and swap it in.
+
+    The new vectors go to a shadow store built next to the live one, which
+    keeps serving searches and taking adds and deletes meanwhile. Rows added
+    while the job runs are caught up, rows deleted meanwhile are left out, and
+    the shadow store is swapped in under index_lock like a compaction. Provider
+    calls are spaced to REINDEX_RATE per second.
+
+    Args:
+        mode: "embeddings" re-embeds the stored descriptions, "descriptions"
+            describes every image again from its image_path first, "auto"
+            picks "descriptions" if the prompt changed
+    """
+    global vector_store, faiss_metadata, metadata_index, duplicate_index, index_info
+    from vector_store import VectorStore
+
+    target = configured_index_info()
+    if mode == "auto":
+        mode = "descriptions" if index_info.get("prompt_hash") != target["prompt_hash"] else "embeddings"
+    source_metadata = faiss_metadata
+    start_rows = len(source_metadata)
+    reindex_status.clear()
+    reindex_status.update(
+        state="running",
+        mode=mode,
+        source={key: index_info.get(key) for key in target},
+        target=target,
+        started_at=time.time(),
+        rows_done=0,
+        rows_total=0,
+        missing_images=0,
+        error=None,
+    )
+
+    shadow_path = FAISS_VECTORS_FILE + ".shadow"
+    if os.path.exists(shadow_path):
+        os.remove(shadow_path)
+    dim = target["embedding_dim"]
+    shadow = VectorStore(
+        dim,
+        shadow_path,
+        FAISS_STORAGE,
+        rerank_factor=FAISS_RERANK_FACTOR,
+        train_size=FAISS_TRAIN_SIZE,
+        search_dim=min(SEARCH_DIM, dim) if SEARCH_DIM < EMBEDDING_DIM else dim,
+        n_shards=FAISS_SHARDS,
+        index_path=FAISS_INDEX_FILE,
+    )
+    new_metadata: List[Dict] = []
+    # (live rows, shadow rows) per group, to drop the groups deleted meanwhile
+    groups: List[Tuple[List[int], range]] = []
+    throttle = Throttle(REINDEX_RATE)
+
+    async def process(start: int, end: int):
+        # Rows added after the job started were described with the current prompt
+        describe = mode == "descriptions" and start < start_rows
+        for rows in reindex_groups(start, min(end, start_rows) if describe else end, describe):
+            entries, embeddings, missing = await reindex_group(rows, describe, target, throttle)
+            first = len(new_metadata)
+            shadow.add(
+                embeddings,
+                shard_keys=[shard_key(entry, first + i) for i, entry in enumerate(entries)],
+            )
+            new_metadata.extend(entries)
+            groups.append((rows, range(first, len(new_metadata))))
+            reindex_status["rows_done"] += len(rows)
+            reindex_status["missing_images"] += int(missing)
+        if describe and end > start_rows:
+            await process(start_rows, end)
+
+    start_time = time.time()
+    print(
+        f"Re-indexing {len(vector_store.live_ids())} vectors ({mode}) with "
+        f"{target['embedding_model']} ({dim}d) at {REINDEX_RATE:g} requests/s..."
+    )
     try:
-        response = client.embeddings.create(model="text-embedding-3-small", input=text)
-        embedding = np.array(response.data[0].embedding, dtype=np.float32)
-        return embedding
+        done = 0
+        while done < len(faiss_metadata):
+            end = len(faiss_metadata)
+            # Rows added while the job runs grow the total
+            reindex_status["rows_total"] = reindex_status["rows_done"] + sum(
+                len(rows) for rows in reindex_groups(done, end, False)
+            )
+            await process(done, end)
+            done = end
+
+        async with index_locked("reindex_swap"):
+            reindex_status["state"] = "swapping"
+            if faiss_metadata is not source_metadata:
+                raise Exception("The index was replaced while re-indexing")
+            # Adds that slipped in after the last catch-up
+            await process(done, len(faiss_metadata))
+
+            deleted = [
+                row
+                for live_rows, shadow_rows in groups
+                if any(faiss_metadata[i].get("deleted") for i in live_rows)
+                for row in shadow_rows
+            ]
+            if deleted:
+                shadow.remove(deleted)
+                for row in deleted:
+                    new_metadata[row]["deleted"] = True
+            new_metadata_index = await asyncio.to_thread(
+                MetadataIndex.from_metadata, new_metadata
+            )
+            new_duplicate_index = await asyncio.to_thread(build_duplicate_index, new_metadata)
+
+            vector_store.vectors.close()
+            shadow.vectors.replace(FAISS_VECTORS_FILE)
+            vector_store, faiss_metadata = shadow, new_metadata
+            metadata_index = new_metadata_index
+            duplicate_index = new_duplicate_index
+            index_info = target
+            description_cache.clear()
+            search_cache.clear()
+            bump_index_version()
+            new_row_layout()
+            save_index()
+    except asyncio.CancelledError:
+        discard_shadow(shadow, shadow_path)
+        reindex_status.update(state="cancelled", finished_at=time.time())
+        print("⚠ Re-index cancelled; the old index keeps serving")
+        raise
     except Exception as e:
-        raise Exception(f"Error getting embedding: {str(e)}")
+        discard_shadow(shadow, shadow_path)
+        reindex_status.update(state="failed", error=str(e), finished_at=time.time())
+        print(f"❌ Re-index failed: {e}; the old index keeps serving")
+        return reindex_progress()
+
+    elapsed = time.time() - start_time
+    reindex_status.update(state="done", finished_at=time.time(), seconds=round(elapsed, 2))
+    print(
+        f"✓ Re-index completed in {elapsed:.1f}s ({vector_store.ntotal} vectors, "
+        f"{reindex_status['missing_images']} images re-embedded from stored descriptions)"
+    )
+    return reindex_progress()
+
+
+def describe_duplicate(match: Tuple[int, int]) -> dict:
+    first_row, distance = match
+    original = faiss_metadata[first_row]
+    return {
+        "image_path": original.get("image_path"),
+        "image_index": original.get("image_index"),
+        "distance": distance,
+    }
+
 
+async def add_duplicate(
+    image_path: Optional[str], image_index: Optional[int], attributes: Dict
+) -> Optional[dict]:
+    """Apply DUPLICATE_POLICY to an upload whose dHash (attributes["dhash"]) may match.
+
+    Returns None if no indexed image is within DUPLICATE_MAX_DISTANCE.
+    """
+    if DUPLICATE_POLICY == "reject":
+        match = duplicate_index.nearest(attributes["dhash"])
+        if match is None:
+            return None
+        duplicate_of = describe_duplicate(match)
+        return {
+            "success": False,
+            "message": f"Near-duplicate of {duplicate_of['image_path']} (distance {match[1]})",
+            "image_path": image_path,
+            "image_index": image_index,
+            "duplicate_of": duplicate_of,
+            "index_size": vector_store.ntotal,
+        }
 
-async def add_image_to_index(image_bytes: bytes, image_path: str = None) -> dict:
-    """Add an image to the FAISS index by generating 5 descriptions and embedding each separately."""
-    global faiss_index, faiss_metadata
+    async with index_locked("add_duplicate"):
+        # Looked up under the lock: a compaction renumbers rows
+        match = duplicate_index.nearest(attributes["dhash"])
+        if match is None:
+            return None
+        duplicate_of = describe_duplicate(match)
+        rows = get_duplicate_rows(match[0])
+        descriptions = [faiss_metadata[row]["description"] for row in rows]
+        embeddings = vector_store.vectors.take(np.array(rows))
+        entry_attributes = [
+            {
+                key: faiss_metadata[row][key]
+                for key in ("description_variation", "merged_variations")
+                if key in faiss_metadata[row]
+            }
+            for row in rows
+        ]
+        attributes["duplicate_of"] = duplicate_of["image_path"]
+        added_count = insert_descriptions(
+            descriptions, embeddings, image_path, image_index, attributes, entry_attributes
+        )
+
+    return {
+        "success": True,
+        "message": f"Near-duplicate of {duplicate_of['image_path']}: reused {added_count} descriptions",
+        "image_path": image_path or "uploaded",
+        "image_index": image_index,
+        "descriptions_count": added_count,
+        "duplicate_of": duplicate_of,
+        "index_size": vector_store.ntotal,
+    }
+
+
+async def add_image_to_index(
+    image_bytes: bytes, image_path: str = None, attributes: Optional[Dict] = None
+) -> dict:
+    """Add an image to the FAISS index by generating 5 descriptions and embedding each separately.
+
+    Args:
+        image_bytes: The image bytes
+        image_path: Original path; the image index is parsed from its filename
+        attributes: Extra metadata for every description (e.g. cuisine, restaurant_id)
+    """
+    global vector_store, faiss_metadata
 
     try:
         # Parse index from filename
@@ -201,43 +1205,34 @@ async def add_image_to_index(image_bytes: bytes, image_path: str = None) -> dict
                     "message": f"Image with index {image_index} already in index",
                     "image_path": image_path,
                     "image_index": image_index,
-                    "index_size": faiss_index.ntotal,
+                    "index_size": vector_store.ntotal,
                 }
 
-        # Generate 5 different descriptions
-        descriptions = []
-        for i in range(5):
-            description = await get_image_description_from_bytes(
-                image_bytes, variation=i
+        attributes = dict(attributes or {})
+        if DUPLICATE_POLICY != "off":
+            # Look for a near-duplicate before spending any API calls on it
+            with span("add.dhash"):
+                attributes["dhash"] = await asyncio.to_thread(dhash, image_bytes)
+            with span("add.duplicate_lookup", policy=DUPLICATE_POLICY):
+                result = await add_duplicate(image_path, image_index, attributes)
+            if result is not None:
+                return result
+
+        # Generate 5 different descriptions and embed each separately
+        info = index_info
+        descriptions, embeddings = await describe_and_embed(image_bytes, info, "add")
+        with span("add.merge_variations", mode=VARIATION_DEDUP):
+            descriptions, embeddings, entry_attributes = merge_variations(
+                descriptions, embeddings
             )
-            descriptions.append(description)
 
         # Add each description separately to the index
-        added_count = 0
-        for i, description in enumerate(descriptions):
-            # Get embedding for description
-            embedding = await get_embedding(description)
-
-            # Reshape for FAISS (needs to be 2D array)
-            embedding = embedding.reshape(1, -1)
-
-            # Normalize for cosine similarity (L2 normalization)
-            faiss.normalize_L2(embedding)
-
-            # Add to FAISS index
-            faiss_index.add(embedding)
-
-            # Store metadata with index number
-            metadata_entry = {
-                "image_path": image_path or "uploaded",
-                "description": description,
-                "description_variation": i + 1,
-            }
-            if image_index is not None:
-                metadata_entry["image_index"] = image_index
-
-            faiss_metadata.append(metadata_entry)
-            added_count += 1
+        with span("add.index_insert", vectors=len(descriptions)):
+            async with index_locked("add_image"):
+                embeddings = await embeddings_for_live_index(descriptions, embeddings, info)
+                added_count = insert_descriptions(
+                    descriptions, embeddings, image_path, image_index, attributes, entry_attributes
+                )
 
         return {
             "success": True,
@@ -245,12 +1240,79 @@ async def add_image_to_index(image_bytes: bytes, image_path: str = None) -> dict
             "image_path": image_path or "uploaded",
             "image_index": image_index,
             "descriptions_count": added_count,
-            "index_size": faiss_index.ntotal,
+            "index_size": vector_store.ntotal,
         }
     except Exception as e:
         raise Exception(f"Error adding image to index: {str(e)}")
 
 
+async def delete_image_from_index(image_index: int) -> Optional[dict]:
+    """Remove every description of an image. Returns None if it isn't indexed."""
+    async with index_locked("delete_image"):
+        ids = get_image_rows(image_index)
+        if not ids:
+            return None
+        removed = remove_rows(ids)
+
+    maybe_schedule_compaction()
+    return {
+        "success": True,
+        "message": f"Removed {removed} descriptions of image {image_index}",
+        "image_index": image_index,
+        "removed_count": removed,
+        "index_size": vector_store.ntotal,
+    }
+
+
+async def replace_image_in_index(
+    image_index: int, image_bytes: bytes, image_path: Optional[str] = None
+) -> Optional[dict]:
+    """Re-describe an indexed image from new bytes. Returns None if it isn't indexed."""
+    if not get_image_rows(image_index):
+        return None
+
+    try:
+        # Describe first so the old entries keep serving until the new ones are ready
+        info = index_info
+        descriptions, embeddings = await describe_and_embed(image_bytes, info, "replace")
+        descriptions, embeddings, entry_attributes = merge_variations(
+            descriptions, embeddings
+        )
+        new_dhash = (
+            await asyncio.to_thread(dhash, image_bytes)
+            if DUPLICATE_POLICY != "off"
+            else None
+        )
+
+        async with index_locked("replace_image"):
+            ids = get_image_rows(image_index)
+            if not ids:
+                return None
+            image_path = image_path or faiss_metadata[ids[0]].get("image_path")
+            attributes = {
+                key: faiss_metadata[ids[0]].get(key) for key in ("cuisine", "restaurant_id")
+            }
+            attributes["dhash"] = new_dhash
+            embeddings = await embeddings_for_live_index(descriptions, embeddings, info)
+            removed = remove_rows(ids)
+            added_count = insert_descriptions(
+                descriptions, embeddings, image_path, image_index, attributes, entry_attributes
+            )
+    except Exception as e:
+        raise Exception(f"Error replacing image in index: {str(e)}")
+
+    maybe_schedule_compaction()
+    return {
+        "success": True,
+        "message": f"Image {image_index} re-described with {added_count} descriptions",
+        "image_path": image_path,
+        "image_index": image_index,
+        "removed_count": removed,
+        "descriptions_count": added_count,
+        "index_size": vector_store.ntotal,
+    }
+
+
 async def extract_audio_from_video(video_bytes: bytes) -> bytes:
     """Extract audio from video using ffmpeg.
     
@@ -280,12 +1342,13 @@ async def extract_audio_from_video(video_bytes: bytes) -> bytes:
             audio_path
         ]
         
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        with FFMPEG_SECONDS.time():
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
         
         if result.returncode != 0:
             raise Exception(f"ffmpeg error: {result.stderr}")
@@ -317,7 +1380,9 @@ async def transcribe_audio_with_elevenlabs(audio_bytes: bytes, max_retries: int
     """
     if not elevenlabs_api_key:
         raise Exception("ElevenLabs API key not configured")
-    
+
+    import requests
+
     try:
         # Save audio to temporary file for API call
         with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as audio_file:
@@ -326,7 +1391,7 @@ async def transcribe_audio_with_elevenlabs(audio_bytes: bytes, max_retries: int
         
         try:
             # Call ElevenLabs STT API using REST API with retry logic
-            url = "https://api.elevenlabs.io/v1/speech-to-text"
+            url = f"{ELEVENLABS_BASE_URL}/v1/speech-to-text"
             headers = {
                 "xi-api-key": elevenlabs_api_key
             }
@@ -343,8 +1408,11 @@ async def transcribe_audio_with_elevenlabs(audio_bytes: bytes, max_retries: int
                             "model_id": "scribe_v1"
                         }
                         
-                        response = requests.post(url, headers=headers, files=files, data=data, timeout=60)
+                        with PROVIDER_SECONDS.time(call="stt"):
+                            response = requests.post(url, headers=headers, files=files, data=data, timeout=60)
                         
+                        if response.status_code != 200:
+                            PROVIDER_ERRORS.inc(call="stt")
                         if response.status_code == 200:
                             transcription = response.json()
                             return transcription
@@ -362,6 +1430,7 @@ async def transcribe_audio_with_elevenlabs(audio_bytes: bytes, max_retries: int
                             raise Exception(f"ElevenLabs API error: {response.status_code} - {response.text}")
                             
                 except requests.exceptions.RequestException as e:
+                    PROVIDER_ERRORS.inc(call="stt")
                     last_error = e
                     if attempt < max_retries:
                         delay = base_delay * (2 ** attempt)
@@ -398,8 +1467,11 @@ async def analyze_video_frames(video_bytes: bytes, num_frames: int = 5) -> List[
         video_path = video_file.name
     
     try:
+        import cv2
+
         # Open video with OpenCV
-        cap = cv2.VideoCapture(video_path)
+        with span("video.open"):
+            cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise Exception("Could not open video file")
         
@@ -420,20 +1492,23 @@ async def analyze_video_frames(video_bytes: bytes, num_frames: int = 5) -> List[
         
         frame_descriptions = []
         for i, frame_idx in enumerate(frame_indices, 1):
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            ret, frame = cap.read()
+            with span("video.frame_decode", frame=frame_idx):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+                ret, frame = cap.read()
             
             if not ret:
                 continue
             
             # Convert frame to image bytes
-            _, buffer = cv2.imencode('.jpg', frame)
+            with span("video.frame_encode", frame=frame_idx):
+                _, buffer = cv2.imencode('.jpg', frame)
             frame_bytes = buffer.tobytes()
             
             # Get description using OpenAI Vision API
             try:
                 print(f"  Frame {i}/{len(frame_indices)} (t={frame_idx/fps:.2f}s)...", end=" ", flush=True)
-                description = await get_image_description_from_bytes(frame_bytes)
+                with span("video.frame_describe", frame=frame_idx):
+                    description = await get_image_description_from_bytes(frame_bytes)
                 timestamp = frame_idx / fps if fps > 0 else 0
                 
                 frame_descriptions.append({
@@ -454,41 +1529,73 @@ async def analyze_video_frames(video_bytes: bytes, num_frames: int = 5) -> List[
             pass
 
 
-async def search_similar_images(image_bytes: bytes, top_k: int = 5) -> dict:
-    """Search for similar images in FAISS index."""
-    global faiss_index, faiss_metadata
+async def search_similar_images(
+    image_bytes: bytes, top_k: int = 5, filters: Optional[Dict] = None
+) -> dict:
+    """Search for similar images in FAISS index.
+
+    Args:
+        image_bytes: The query image bytes
+        top_k: Number of results
+        filters: Optional restaurant_id, cuisine, image_index_min and
+            image_index_max. Only matching entries are scored.
+    """
+    global vector_store, faiss_metadata
 
-    if faiss_index is None or faiss_index.ntotal == 0:
+    if vector_store is None or vector_store.ntotal == 0:
         raise HTTPException(
             status_code=400, detail="FAISS index is empty. Add images first."
         )
 
     try:
-        # Get image description
-        description = await get_image_description_from_bytes(image_bytes)
-
-        # Get embedding for description
-        query_embedding = await get_embedding(description)
+        query_hash = image_hash(image_bytes)
+        filter_key = tuple(sorted((k, v) for k, v in (filters or {}).items() if v is not None))
+        cached = search_cache.get((query_hash, index_version, top_k, filter_key))
+        if cached is not None:
+            return cached
+
+        # The query must be embedded with the model of the index it searches;
+        # a re-index swap while it is being described starts it over
+        while True:
+            info = index_info
+            described = description_cache.get((query_hash, info["embedding_model"]))
+            if described is None:
+                # Get image description
+                with span("search.describe", variations=1):
+                    description = await get_image_description_from_bytes(image_bytes)
+
+                # Get embedding for description
+                with span("search.embed", texts=1):
+                    query_embedding = await get_embedding(description, info)
+                description_cache.put((query_hash, info["embedding_model"]), (description, query_embedding))
+            else:
+                description, query_embedding = described
+            if info is index_info:
+                break
 
-        # Reshape for FAISS (needs to be 2D array)
-        query_embedding = query_embedding.reshape(1, -1)
+        # Read the version with no await before the search, so the cached
+        # result belongs to exactly this index state
+        version = index_version
 
-        # Normalize for cosine similarity (L2 normalization)
-        faiss.normalize_L2(query_embedding)
+        # Row mask for the filters; FAISS skips rows outside it while scanning
+        with span("search.filter_mask"):
+            allowed = metadata_index.mask(**(filters or {}))
 
         # Search in FAISS
-        # For IndexFlatIP, returns inner product (cosine similarity for normalized vectors)
+        # Returns inner product (cosine similarity for normalized vectors). Compressed
+        # storage over-fetches candidates and re-ranks them against the full vectors.
         # Higher values = more similar (range: -1 to 1, typically 0 to 1 for embeddings)
-        similarities, indices = faiss_index.search(
-            query_embedding, min(top_k, faiss_index.ntotal)
-        )
+        with span("search.faiss_search", top_k=top_k), FAISS_SEARCH_SECONDS.time():
+            similarities, indices = vector_store.search(
+                query_embedding.reshape(1, -1), top_k, allowed
+            )
 
         # Convert inner product (cosine similarity) to percentage
         # Cosine similarity ranges from -1 to 1, but embeddings are typically 0 to 1
         # Convert to percentage: (similarity + 1) / 2 * 100 for full range, or just similarity * 100 for 0-1 range
         results = []
         for i, (similarity, idx) in enumerate(zip(similarities[0], indices[0])):
-            if idx < len(faiss_metadata):
+            if 0 <= idx < len(faiss_metadata):
                 # Convert cosine similarity (0-1 range) to percentage
                 similarity_percentage = similarity * 100
                 results.append(
@@ -501,10 +1608,12 @@ async def search_similar_images(image_bytes: bytes, top_k: int = 5) -> dict:
                     }
                 )
 
-        return {
+        response = {
             "query_description": description,
             "results": results,
         }
+        search_cache.put((query_hash, version, top_k, filter_key), response)
+        return response
     except Exception as e:
         raise Exception(f"Error searching similar images: {str(e)}")
 
@@ -522,58 +1631,368 @@ async def describe_image(file: UploadFile = File(...)):
 
 @app.post("/add-image")
 async def add_image(
-    file: UploadFile = File(...), image_path: Optional[str] = Form(None)
+    file: UploadFile = File(...),
+    image_path: Optional[str] = Form(None),
+    cuisine: Optional[str] = Form(None),
+    restaurant_id: Optional[str] = Form(None),
 ):
     """Add an image to the FAISS index from bytes."""
+    require_index()
     try:
         image_bytes = await file.read()
-        result = await add_image_to_index(image_bytes, image_path)
+        result = await add_image_to_index(
+            image_bytes,
+            image_path,
+            {"cuisine": cuisine, "restaurant_id": restaurant_id},
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/search-images")
-async def search_images(file: UploadFile = File(...)):
-    """Search for similar images in the FAISS index from bytes."""
+async def search_images(
+    file: UploadFile = File(...),
+    top_k: int = Form(5),
+    restaurant_id: Optional[str] = Form(None),
+    cuisine: Optional[str] = Form(None),
+    image_index_min: Optional[int] = Form(None),
+    image_index_max: Optional[int] = Form(None),
+):
+    """Search for similar images in the FAISS index from bytes, optionally filtered."""
+    require_index()
     try:
         image_bytes = await file.read()
-        result = await search_similar_images(image_bytes, top_k=5)
+        filters = {
+            "restaurant_id": restaurant_id,
+            "cuisine": cuisine,
+            "image_index_min": image_index_min,
+            "image_index_max": image_index_max,
+        }
+        result = await search_similar_images(image_bytes, top_k=top_k, filters=filters)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.delete("/images/{image_index}")
+async def delete_image(image_index: int):
+    """Remove an image and all of its descriptions from the FAISS index."""
+    require_index()
+    try:
+        result = await delete_image_from_index(image_index)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Image {image_index} not in index")
+    return result
+
+
+@app.put("/images/{image_index}")
+async def replace_image(
+    image_index: int,
+    file: UploadFile = File(...),
+    image_path: Optional[str] = Form(None),
+):
+    """Replace an indexed image: re-describe it from the uploaded bytes."""
+    require_index()
+    try:
+        image_bytes = await file.read()
+        result = await replace_image_in_index(image_index, image_bytes, image_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Image {image_index} not in index")
+    return result
+
+
+@app.post("/index-compact")
+async def compact():
+    """Rebuild the FAISS index and metadata without deleted entries."""
+    require_index()
+    if reindex_running():
+        raise HTTPException(status_code=409, detail="A re-index is running")
+    try:
+        return await compact_index()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/index-reindex")
+async def start_reindex(mode: str = "auto"):
+    """Start re-embedding the index with the configured model and prompt in the background.
+
+    The current index keeps serving until the new one is swapped in; follow
+    progress with GET /index-reindex.
+    """
+    global reindex_task
+
+    require_index()
+    if mode not in REINDEX_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(REINDEX_MODES)}")
+    if reindex_running():
+        raise HTTPException(status_code=409, detail="A re-index is already running")
+    if compaction_task is not None and not compaction_task.done():
+        raise HTTPException(status_code=409, detail="A compaction is running")
+    if vector_store.ntotal == 0:
+        raise HTTPException(status_code=400, detail="FAISS index is empty. Nothing to re-index.")
+
+    reindex_task = asyncio.create_task(reindex_index(mode))
+    # Let the task set up its status before reporting it
+    await asyncio.sleep(0)
+    return {"success": True, "reindex": reindex_progress()}
+
+
+@app.get("/index-reindex")
+async def get_reindex():
+    """Progress of the current or last re-index."""
+    return {"reindex": reindex_progress(), "reindex_needed": index_mismatches() if index_info else []}
+
+
+@app.delete("/index-reindex")
+async def cancel_reindex():
+    """Stop a running re-index and discard its shadow index."""
+    if not reindex_running():
+        raise HTTPException(status_code=404, detail="No re-index is running")
+    reindex_task.cancel()
+    await asyncio.gather(reindex_task, return_exceptions=True)
+    return {"success": True, "reindex": reindex_progress()}
+
+
+@app.post("/index-snapshot")
+async def create_snapshot():
+    """Export the live index to a new portable snapshot under SNAPSHOT_DIR."""
+    require_index()
+    try:
+        from snapshot import export_snapshot
+
+        directory = os.path.join(SNAPSHOT_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        async with index_locked("snapshot"):
+            manifest = await asyncio.to_thread(
+                export_snapshot,
+                directory,
+                faiss_metadata,
+                vector_store.vectors.array()[: len(faiss_metadata)],
+                index_info["embedding_model"],
+                # The prompt the index was described with; prompt.txt may have
+                # changed since, with the re-index not yet run
+                index_info.get("prompt_hash"),
+            )
+        return {"success": True, "path": directory, "manifest": manifest}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/index-shards/{shard}/load")
+async def load_shard(shard: int):
+    """Load a shard back into memory so searches include it again."""
+    require_index()
+    if not 0 <= shard < FAISS_SHARDS:
+        raise HTTPException(status_code=404, detail=f"Shard {shard} does not exist")
+    try:
+        async with index_locked("load_shard"):
+            await asyncio.to_thread(vector_store.load_shard, shard)
+            bump_index_version()
+        return {"success": True, "shard": shard, "shards": vector_store.stats()["shards"]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/index-shards/{shard}/unload")
+async def unload_shard(shard: int):
+    """Save a shard to disk and drop it from memory. Searches skip it until it is loaded."""
+    require_index()
+    if not 0 <= shard < FAISS_SHARDS:
+        raise HTTPException(status_code=404, detail=f"Shard {shard} does not exist")
+    try:
+        async with index_locked("unload_shard"):
+            vector_store.unload_shard(shard)
+            bump_index_version()
+        return {"success": True, "shard": shard, "shards": vector_store.stats()["shards"]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus-style metrics: provider, search, ffmpeg, lock-wait and stage latency histograms."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving, whether or not the index is loaded."""
+    return {
+        "status": "ok",
+        "phase": startup_status["phase"],
+        "uptime_seconds": round(time.time() - startup_status["started_at"], 3),
+    }
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once the index is loaded, 503 with load progress before that."""
+    body = {
+        "ready": index_ready(),
+        "phase": startup_status["phase"],
+        "rows": startup_status["rows"],
+        "elapsed_seconds": round(time.time() - startup_status["started_at"], 3),
+        "ready_seconds": startup_status["ready_seconds"],
+        "error": startup_status["error"],
+    }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
 @app.get("/index-stats")
 async def get_index_stats():
     """Get statistics about the FAISS index."""
-    global faiss_index, faiss_metadata
+    global vector_store, faiss_metadata
     return {
-        "index_size": faiss_index.ntotal if faiss_index else 0,
+        "ready": index_ready(),
+        "index_size": vector_store.ntotal if vector_store else 0,
         "metadata_count": len(faiss_metadata),
-        "embedding_dimension": EMBEDDING_DIM,
+        "embedding_model": index_info.get("embedding_model"),
+        "embedding_dimension": index_info.get("embedding_dim"),
+        "reindex_needed": index_mismatches() if index_info else [],
+        "storage": vector_store.stats() if vector_store else None,
+        "compacting": compaction_task is not None and not compaction_task.done(),
+        "reindex": reindex_progress(),
+        "index_version": index_version,
+        "query_cache": {
+            "descriptions": description_cache.stats(),
+            "results": search_cache.stats(),
+        },
     }
 
 
-@app.get("/index-list")
-async def get_index_list():
-    """Get all indexed images with their descriptions."""
-    global faiss_index, faiss_metadata
+# Fields /index-list can return; descriptions are the bulk of each entry
+INDEX_LIST_FIELDS = (
+    "index",
+    "image_path",
+    "description",
+    "description_variation",
+    "merged_variations",
+    "image_index",
+    "cuisine",
+    "restaurant_id",
+)
+INDEX_LIST_MAX_LIMIT = 10000
+
+
+def parse_fields(fields: str) -> List[str]:
+    """Parse a comma-separated field projection for /index-list."""
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in INDEX_LIST_FIELDS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields {unknown}. Options: {', '.join(INDEX_LIST_FIELDS)}",
+        )
+    return names
 
-    if faiss_index is None or faiss_index.ntotal == 0:
-        return {"total": 0, "items": []}
 
-    items = []
-    for idx, metadata in enumerate(faiss_metadata):
-        items.append(
-            {
-                "index": idx,
-                "image_path": metadata.get("image_path", "unknown"),
-                "description": metadata.get("description", ""),
-            }
+def iter_index_entries(metadata: List[Dict], fields: List[str], start: int = 0):
+    """Yield (row, projected entry) for live metadata rows from `start` on.
+
+    Iterates over the list it is given, so a compaction swapping in a new list
+    doesn't disturb a listing in progress. Rows appended meanwhile are included.
+    """
+    for idx in range(max(start, 0), len(metadata)):
+        entry = metadata[idx]
+        if entry.get("deleted"):
+            continue
+        item = {}
+        for name in fields:
+            if name == "index":
+                item["index"] = idx
+            elif name == "image_path":
+                item["image_path"] = entry.get("image_path", "unknown")
+            elif name == "description":
+                item["description"] = entry.get("description", "")
+            elif name in entry:
+                item[name] = entry[name]
+        yield idx, item
+
+
+def encode_cursor(row: int) -> str:
+    """Opaque /index-list cursor for `row` under the current row numbering."""
+    payload = json.dumps({"layout": row_layout, "row": row}).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Row an /index-list cursor points at.
+
+    Raises 400 for a malformed cursor and 409 if rows were renumbered (by a
+    compaction, re-index or restart) since it was issued.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        layout, row = payload["layout"], int(payload["row"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if layout != row_layout:
+        raise HTTPException(
+            status_code=409,
+            detail="The index was renumbered since this cursor was issued; "
+            "start the listing again without a cursor",
         )
+    return row
 
-    return {"total": len(items), "items": items}
+
+@app.get("/index-list")
+async def get_index_list(
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    fields: str = "index,image_path,description",
+):
+    """Get one page of indexed images with their descriptions.
+
+    Args:
+        cursor: Where to continue; pass the previous page's next_cursor
+        limit: Maximum number of entries in the page
+        fields: Comma-separated fields to return, e.g. "index,image_path" to
+            leave out descriptions
+    """
+    require_index()
+    global vector_store, faiss_metadata
+
+    names = parse_fields(fields)
+    limit = max(1, min(limit, INDEX_LIST_MAX_LIMIT))
+    start = decode_cursor(cursor) if cursor else 0
+
+    if vector_store is None or vector_store.ntotal == 0:
+        return {"total": 0, "items": [], "next_cursor": None}
+
+    items = []
+    next_cursor = None
+    for idx, item in iter_index_entries(faiss_metadata, names, start):
+        if len(items) == limit:
+            next_cursor = encode_cursor(idx)
+            break
+        items.append(item)
+
+    return {"total": vector_store.ntotal, "items": items, "next_cursor": next_cursor}
+
+
+@app.get("/index-list/stream")
+async def stream_index_list(fields: str = "index,image_path,description"):
+    """Stream every indexed entry as NDJSON, one JSON object per line."""
+    require_index()
+    names = parse_fields(fields)
+    metadata = faiss_metadata
+
+    def lines():
+        batch = []
+        for _, item in iter_index_entries(metadata, names):
+            batch.append(json.dumps(item, ensure_ascii=False))
+            if len(batch) == 1000:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @app.post("/analyze-video")
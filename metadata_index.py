@@ -0,0 +1,90 @@
+"""
+Row bitmaps over the FAISS metadata, used to filter vector search.
+
+Rows are metadata positions, which are also vector ids. Equality filters
+(restaurant_id, cuisine) keep a posting list of rows per value and cache the
+bitmap built from it; image_index range filters compare against a column of
+image indices. The combined mask is handed to VectorStore.search, which passes
+it to FAISS as an IDSelectorBitmap so filtering happens during the scan rather
+than by over-fetching and discarding results.
+"""
+
+from array import array
+from typing import Dict, List, Optional
+
+import numpy as np
+
+FILTER_FIELDS = ("restaurant_id", "cuisine")
+
+
+class MetadataIndex:
+    """Append-only filter columns for the metadata list."""
+
+    def __init__(self):
+        self.rows = 0
+        self._image_index = array("q")
+        self._postings: Dict[str, Dict[str, List[int]]] = {
+            field: {} for field in FILTER_FIELDS
+        }
+        self._bitmaps: Dict[tuple, np.ndarray] = {}
+
+    @classmethod
+    def from_metadata(cls, metadata: List[Dict]) -> "MetadataIndex":
+        index = cls()
+        index.append(metadata)
+        return index
+
+    def append(self, entries: List[Dict]):
+        """Index entries added to the end of the metadata list."""
+        for entry in entries:
+            image_index = entry.get("image_index")
+            self._image_index.append(-1 if image_index is None else int(image_index))
+            for field in FILTER_FIELDS:
+                value = entry.get(field)
+                if value is not None:
+                    self._postings[field].setdefault(str(value), []).append(self.rows)
+                    self._bitmaps.pop((field, str(value)), None)
+            self.rows += 1
+
+    def image_indices(self) -> np.ndarray:
+        """Image index of every row (-1 where there is none)."""
+        return np.frombuffer(self._image_index, dtype=np.int64, count=self.rows)
+
+    def bitmap(self, field: str, value) -> np.ndarray:
+        """Rows whose `field` equals `value`."""
+        key = (field, str(value))
+        mask = self._bitmaps.get(key)
+        if mask is None or len(mask) != self.rows:
+            mask = np.zeros(self.rows, dtype=bool)
+            mask[self._postings[field].get(str(value), [])] = True
+            self._bitmaps[key] = mask
+        return mask
+
+    def mask(
+        self,
+        restaurant_id: Optional[str] = None,
+        cuisine: Optional[str] = None,
+        image_index_min: Optional[int] = None,
+        image_index_max: Optional[int] = None,
+    ) -> Optional[np.ndarray]:
+        """AND of the given filters as a row mask, or None when no filter is set."""
+        masks = [
+            self.bitmap(field, value)
+            for field, value in (("restaurant_id", restaurant_id), ("cuisine", cuisine))
+            if value is not None
+        ]
+        if image_index_min is not None or image_index_max is not None:
+            image_indices = self.image_indices()
+            in_range = image_indices >= 0
+            if image_index_min is not None:
+                in_range &= image_indices >= image_index_min
+            if image_index_max is not None:
+                in_range &= image_indices <= image_index_max
+            masks.append(in_range)
+
+        if not masks:
+            return None
+        mask = masks[0].copy()
+        for other in masks[1:]:
+            mask &= other
+        return mask
@@ -0,0 +1,189 @@
+"""
+Prometheus-style metrics and optional tracing spans for the API.
+
+Histograms, counters and gauges are kept in process and rendered in the
+Prometheus text exposition format by render(), which /metrics serves. Nothing
+here needs prometheus_client.
+
+span() times a stage into the `stage_seconds` histogram and, when the
+opentelemetry package is installed, also opens an OpenTelemetry span, so an
+exporter configured through the usual OTEL_* variables sees where a request
+spent its time.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Sequence, Tuple
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# Seconds; covers cache hits through slow vision calls and video transcriptions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry: List["Metric"] = []
+
+
+def _labels_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named metric with label names, registered for render()."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram of observed values (seconds, by default buckets).
+
+    Args:
+        name: Metric name
+        help: One-line description
+        labelnames: Names of the labels passed to observe()
+        buckets: Upper bounds of the buckets, ascending (+Inf is added)
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts, sum, count
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            series = {key: (list(counts), total, n) for key, (counts, total, n) in self._series.items()}
+        for key, (counts, total, n) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _labels_text(self.labelnames, key, f'le="{_format(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _labels_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {n}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonic counter per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_labels_text(self.labelnames, key)} {_format(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(Metric):
+    """Value read when metrics are rendered.
+
+    Args:
+        read: Returns the value, or with labelnames a dict of label-value tuple -> value
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.read = read
+
+    def samples(self) -> List[str]:
+        values = self.read()
+        if not self.labelnames:
+            values = {(): values}
+        return [
+            f"{self.name}{_labels_text(self.labelnames, key)} {_format(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+STAGE_SECONDS = Histogram("stage_seconds", "Time spent in each request stage", ("stage",))
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a stage into stage_seconds, inside an OpenTelemetry span if available."""
+    tracer_span = (
+        trace.get_tracer("food-discovery-api").start_as_current_span(name, attributes=attributes)
+        if trace is not None
+        else nullcontext()
+    )
+    with tracer_span, STAGE_SECONDS.time(stage=name):
+        yield
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
@@ -0,0 +1,379 @@
+"""
+Local stand-ins for the OpenAI and ElevenLabs endpoints the app uses, for tests,
+offline runs and load tests.
+
+Serves chat completions, embeddings, file uploads and the Batch API under
+/v1 (OpenAI), and speech-to-text under /v1/speech-to-text (ElevenLabs), with no
+network access or cost. Responses are deterministic:
+  * a description is a handful of food words picked from a hash of the image
+    (so the same image always gets the same words) plus a few picked per
+    variation,
+  * an embedding is the normalized sum of one pseudo-random vector per word,
+    so texts that share words get similar embeddings,
+  * a transcription has ~2.5 words per second of audio.
+
+The synchronous endpoints simulate provider behaviour, set by environment
+variables or at runtime with POST /mock/config:
+  MOCK_CHAT_LATENCY_MS, MOCK_EMBEDDINGS_LATENCY_MS, MOCK_STT_LATENCY_MS
+      mean latency per endpoint (default MOCK_LATENCY_MS, 0)
+  MOCK_JITTER_MS       standard deviation of the latency (default 0)
+  MOCK_ERROR_RATE      fraction of requests answered with a 500 (default 0)
+  MOCK_429_RATE        fraction of requests answered with a 429 (default 0)
+  MOCK_RATE_LIMIT_RPS  requests per second per endpoint before 429s (default 0, off)
+  MOCK_RETRY_AFTER     Retry-After seconds sent with 429s (default 1)
+Counters per endpoint are at GET /mock/stats.
+
+Batches are processed in the background MOCK_BATCH_SECONDS after they are
+created, by the same handlers as the synchronous endpoints (without faults).
+
+Usage:
+  uvicorn mock_providers:app --port 8100
+  OPENAI_BASE_URL=http://127.0.0.1:8100/v1 ELEVENLABS_BASE_URL=http://127.0.0.1:8100 \
+      uvicorn main:app
+  OPENAI_BASE_URL=http://127.0.0.1:8100/v1 python batch_ingest.py samples/
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import os
+import random
+import time
+import wave
+import uuid
+import zlib
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, Response
+
+MOCK_BATCH_SECONDS = float(os.getenv("MOCK_BATCH_SECONDS", "1"))
+
+ENDPOINTS = ("chat", "embeddings", "stt")
+_latency = float(os.getenv("MOCK_LATENCY_MS", "0"))
+config = {
+    "latency_ms": {
+        endpoint: float(os.getenv(f"MOCK_{endpoint.upper()}_LATENCY_MS", _latency))
+        for endpoint in ENDPOINTS
+    },
+    "jitter_ms": float(os.getenv("MOCK_JITTER_MS", "0")),
+    "error_rate": float(os.getenv("MOCK_ERROR_RATE", "0")),
+    "rate_limit_rate": float(os.getenv("MOCK_429_RATE", "0")),
+    "rate_limit_rps": float(os.getenv("MOCK_RATE_LIMIT_RPS", "0")),
+    "retry_after": float(os.getenv("MOCK_RETRY_AFTER", "1")),
+}
+stats = {endpoint: {"requests": 0, "errors": 0, "rate_limited": 0} for endpoint in ENDPOINTS}
+
+FOOD_WORDS = (
+    "rice noodles dumplings curry tacos pizza pasta sushi ramen salad burger "
+    "steak chicken beef pork tofu shrimp salmon egg cheese tomato basil chili "
+    "garlic ginger soy sesame lime coconut avocado mushroom spinach potato "
+    "bread rolled grilled fried steamed roasted braised crispy creamy spicy "
+    "sweet sour smoky fresh glazed sauce broth bowl plate skewer wrap"
+).split()
+
+app = FastAPI(title="Mock Providers")
+
+files: Dict[str, bytes] = {}
+batches: Dict[str, dict] = {}
+batch_tasks = set()  # references to running batches, so they aren't garbage-collected
+
+
+def new_id(prefix: str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:24]}"
+
+
+def pick_words(seed: bytes, n: int) -> List[str]:
+    rng = np.random.default_rng(int.from_bytes(hashlib.sha256(seed).digest()[:8], "little"))
+    return [FOOD_WORDS[i] for i in rng.choice(len(FOOD_WORDS), n, replace=False)]
+
+
+def describe(body: dict) -> str:
+    """Description for a chat-completions body: words from the image, plus some per variation."""
+    image, prompt = b"", ""
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            continue
+        for part in content:
+            if part.get("type") == "image_url":
+                image += part["image_url"]["url"].encode()
+            elif part.get("type") == "text":
+                prompt += part["text"]
+    words = pick_words(image, 8) + pick_words(image + prompt.encode(), 3)
+    return "A dish of " + ", ".join(words) + "."
+
+
+@lru_cache(maxsize=4096)
+def word_vector(word: str, dim: int) -> np.ndarray:
+    rng = np.random.default_rng(zlib.crc32(word.encode("utf-8")))
+    return rng.standard_normal(dim).astype(np.float32)
+
+
+def embed(text: str, dim: int) -> List[float]:
+    words = [w.strip(".,").lower() for w in text.split()] or [""]
+    vector = np.sum([word_vector(w, dim) for w in words], axis=0)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def chat_completion(body: dict) -> dict:
+    content = describe(body)
+    prompt_tokens = sum(len(json.dumps(m.get("content"))) // 4 for m in body.get("messages", []))
+    completion_tokens = len(content.split())
+    return {
+        "id": new_id("chatcmpl"),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def embeddings(body: dict) -> dict:
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    dim = int(body.get("dimensions") or 1536)
+    tokens = sum(len(text.split()) for text in inputs)
+    return {
+        "object": "list",
+        "data": [
+            {"object": "embedding", "index": i, "embedding": embed(text, dim)}
+            for i, text in enumerate(inputs)
+        ],
+        "model": body.get("model", "text-embedding-3-small"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+def transcription(audio: bytes) -> dict:
+    """ElevenLabs-style transcription: words spread over the audio's duration."""
+    try:
+        with wave.open(io.BytesIO(audio)) as w:
+            duration = w.getnframes() / w.getframerate()
+    except (wave.Error, EOFError):
+        duration = len(audio) / 32000  # 16 kHz 16-bit mono
+    n_words = max(1, int(duration * 2.5))
+    words = [pick_words(audio + bytes([i % 256]), 1)[0] for i in range(n_words)]
+    step = duration / n_words if duration else 0.4
+    return {
+        "language_code": "en",
+        "language_probability": 0.98,
+        "text": " ".join(words),
+        "words": [
+            {"text": word, "start": round(i * step, 3), "end": round((i + 0.8) * step, 3), "type": "word"}
+            for i, word in enumerate(words)
+        ],
+    }
+
+
+HANDLERS = {
+    "/v1/chat/completions": chat_completion,
+    "/v1/embeddings": embeddings,
+}
+
+
+class TokenBucket:
+    """Allows `rate` requests per second with bursts up to one second's worth."""
+
+    def __init__(self):
+        self.tokens = None  # starts full
+        self.updated = time.monotonic()
+
+    def take(self, rate: float) -> bool:
+        now = time.monotonic()
+        if self.tokens is None:
+            self.tokens = rate
+        self.tokens = min(rate, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+buckets = {endpoint: TokenBucket() for endpoint in ENDPOINTS}
+
+
+def rate_limited(endpoint: str) -> JSONResponse:
+    if endpoint == "stt":
+        body = {"detail": {"status": "too_many_concurrent_requests", "message": "Rate limit exceeded (mock)"}}
+    else:
+        body = {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}}
+    headers = {"retry-after": str(config["retry_after"]), "retry-after-ms": str(int(config["retry_after"] * 1000))}
+    return JSONResponse(body, status_code=429, headers=headers)
+
+
+async def simulate(endpoint: str):
+    """Apply the configured rate limit, faults and latency. Returns an error response or None."""
+    counters = stats[endpoint]
+    counters["requests"] += 1
+    rps = config["rate_limit_rps"]
+    if (rps > 0 and not buckets[endpoint].take(rps)) or random.random() < config["rate_limit_rate"]:
+        counters["rate_limited"] += 1
+        return rate_limited(endpoint)
+    if random.random() < config["error_rate"]:
+        counters["errors"] += 1
+        return JSONResponse(
+            {"error": {"message": "Internal server error (mock)", "type": "server_error", "code": None}},
+            status_code=500,
+        )
+    latency = random.gauss(config["latency_ms"][endpoint], config["jitter_ms"])
+    if latency > 0:
+        await asyncio.sleep(latency / 1000)
+    return None
+
+
+@app.post("/v1/chat/completions")
+async def create_chat_completion(request: Request):
+    body = await request.json()
+    return await simulate("chat") or chat_completion(body)
+
+
+@app.post("/v1/embeddings")
+async def create_embeddings(request: Request):
+    body = await request.json()
+    return await simulate("embeddings") or embeddings(body)
+
+
+@app.post("/v1/speech-to-text")
+async def speech_to_text(file: UploadFile = File(...), model_id: str = Form("scribe_v1")):
+    audio = await file.read()
+    return await simulate("stt") or transcription(audio)
+
+
+@app.get("/mock/config")
+async def get_config():
+    return config
+
+
+@app.post("/mock/config")
+async def update_config(request: Request):
+    """Merge settings into the config, e.g. {"error_rate": 0.05, "latency_ms": {"chat": 2000}}."""
+    for key, value in (await request.json()).items():
+        if key not in config:
+            raise HTTPException(status_code=400, detail=f"Unknown setting: {key}")
+        if isinstance(config[key], dict):
+            config[key].update({k: float(v) for k, v in value.items() if k in config[key]})
+        else:
+            config[key] = float(value)
+    return config
+
+
+@app.get("/mock/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/mock/stats/reset")
+async def reset_stats():
+    for counters in stats.values():
+        counters.update(requests=0, errors=0, rate_limited=0)
+    return stats
+
+
+@app.post("/v1/files")
+async def upload_file(file: UploadFile = File(...), purpose: str = Form(...)):
+    file_id = new_id("file")
+    files[file_id] = await file.read()
+    return file_object(file_id, file.filename, purpose)
+
+
+def file_object(file_id: str, filename: str, purpose: str) -> dict:
+    return {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(files[file_id]),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "status": "processed",
+    }
+
+
+@app.get("/v1/files/{file_id}/content")
+async def file_content(file_id: str):
+    if file_id not in files:
+        raise HTTPException(status_code=404, detail=f"No such file: {file_id}")
+    return Response(content=files[file_id], media_type="application/octet-stream")
+
+
+async def run_batch(batch: dict):
+    """Answer every request line of a batch input file and write the output file."""
+    await asyncio.sleep(MOCK_BATCH_SECONDS)
+    batch["status"] = "in_progress"
+    batch["in_progress_at"] = int(time.time())
+    handler = HANDLERS[batch["endpoint"]]
+    lines = files[batch["input_file_id"]].decode("utf-8").splitlines()
+    batch["request_counts"]["total"] = len(lines)
+
+    output = []
+    for line in lines:
+        request = json.loads(line)
+        result = {"id": new_id("batch_req"), "custom_id": request["custom_id"], "error": None}
+        try:
+            result["response"] = {
+                "status_code": 200,
+                "request_id": uuid.uuid4().hex,
+                "body": await asyncio.to_thread(handler, request["body"]),
+            }
+            batch["request_counts"]["completed"] += 1
+        except Exception as e:
+            result["response"] = None
+            result["error"] = {"code": "invalid_request", "message": str(e)}
+            batch["request_counts"]["failed"] += 1
+        output.append(json.dumps(result))
+
+    file_id = new_id("file")
+    files[file_id] = ("\n".join(output) + "\n").encode("utf-8")
+    batch["output_file_id"] = file_id
+    batch["status"] = "completed"
+    batch["completed_at"] = int(time.time())
+
+
+@app.post("/v1/batches")
+async def create_batch(request: Request):
+    body = await request.json()
+    if body.get("input_file_id") not in files:
+        raise HTTPException(status_code=404, detail=f"No such file: {body.get('input_file_id')}")
+    if body.get("endpoint") not in HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported endpoint: {body.get('endpoint')}")
+
+    batch = {
+        "id": new_id("batch"),
+        "object": "batch",
+        "endpoint": body["endpoint"],
+        "errors": None,
+        "input_file_id": body["input_file_id"],
+        "completion_window": body.get("completion_window", "24h"),
+        "status": "validating",
+        "output_file_id": None,
+        "error_file_id": None,
+        "created_at": int(time.time()),
+        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        "metadata": body.get("metadata"),
+    }
+    batches[batch["id"]] = batch
+    task = asyncio.create_task(run_batch(batch))
+    batch_tasks.add(task)
+    task.add_done_callback(batch_tasks.discard)
+    return batch
+
+
+@app.get("/v1/batches/{batch_id}")
+async def retrieve_batch(batch_id: str):
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail=f"No such batch: {batch_id}")
+    return batches[batch_id]
@@ -2,58 +2,194 @@ import os
 import sys
 import argparse
 import csv
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import util
 from pathlib import Path
-from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 try:
-    from ultralytics import YOLO
+    import ultralytics  # noqa: F401
     from PIL import Image
 except ImportError:
     print("❌ Error: ultralytics package not installed")
     print("   Install it with: pip install ultralytics")
     sys.exit(1)
 
+import numpy as np
 
-def detect_objects_in_image(
-    model, image_path: str, save_annotated: bool = False, output_path: str = None
-) -> dict:
+from keyframes import Detections, no_detections
+from tracker import Tracker, write_lifetimes
+from video_segments import limit_threads
+from yolo_export import BACKENDS
+from yolo_inference import batched, load_model, result_detections
+
+
+class AnnotatedImageWriter(threading.Thread):
+    """
+    Saves annotated images on a background thread, so detection doesn't wait
+    for image encoding. save() blocks once max_pending images are queued.
+    """
+
+    def __init__(self, max_pending: int = 64):
+        super().__init__(name="annotated-writer", daemon=True)
+        self.queue = queue.Queue(maxsize=max_pending)
+
+    def save(self, image: np.ndarray, output_path: str):
+        self.queue.put((image, output_path))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            image, output_path = item
+            try:
+                Image.fromarray(image).save(output_path)
+            except Exception as e:
+                print(f"⚠️  Error saving {output_path}: {e}")
+
+    def close(self):
+        """Save everything queued, then stop."""
+        self.queue.put(None)
+        self.join()
+
+
+# Model and annotated-image writer of this process (see start_worker)
+_worker = {}
+
+
+def start_worker(
+    model_name: str,
+    backend: str,
+    int8: bool,
+    output_dir: str,
+    threads: int = 0,
+    model=None,
+):
     """
-    Run YOLO object detection on a single image.
-    Returns a dictionary with object category counts.
+    Load the model and start the annotated-image writer for detect_objects_in_batch.
+    Runs once in each worker process (or in this process without --workers).
 
     Args:
-        model: YOLO model instance
-        image_path: Path to input image
-        save_annotated: Whether to save annotated image
-        output_path: Path to save annotated image (if save_annotated is True)
+        model_name: YOLO model to use
+        backend: Runtime for the model: pytorch, onnx or openvino
+        int8: Run the INT8-quantized export
+        output_dir: Directory to save annotated images
+        threads: Threads for OpenCV and PyTorch in this process (0: leave the defaults)
+        model: Model already loaded in this process, used instead of loading another
     """
-    try:
-        results = model(image_path, verbose=False)
+    if threads:
+        limit_threads(threads)
+    writer = AnnotatedImageWriter()
+    writer.start()
+    # Worker processes run this when they exit, so queued images are saved
+    util.Finalize(writer, writer.close, exitpriority=10)
+    if model is None:
+        model = load_model(model_name, backend, int8)
+    _worker.update(model=model, writer=writer, output_dir=output_dir)
+
+
+def detect_objects_in_batch(
+    image_paths: List[str],
+) -> List[Tuple[str, Optional[Dict[str, int]], Optional[Detections]]]:
+    """
+    Run YOLO object detection on a batch of images in one model call and queue
+    their annotated images for saving.
 
-        # Count objects by category
-        object_counts = defaultdict(int)
-
-        for result in results:
-            # Get detected objects
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get class name
-                    class_id = int(box.cls[0])
-                    class_name = model.names[class_id]
-                    object_counts[class_name] += 1
-
-            # Save annotated image if requested
-            if save_annotated and output_path:
-                annotated_img = (
-                    result.plot()
-                )  # Creates annotated image with boxes and labels
-                Image.fromarray(annotated_img).save(output_path)
-
-        return dict(object_counts)
+    Args:
+        image_paths: Paths to input images
+
+    Returns:
+        (image name, object counts by category, boxes) per image, in order;
+        counts and boxes are None for images that could not be processed
+    """
+    model = _worker["model"]
+    try:
+        results = model(image_paths, verbose=False)
     except Exception as e:
-        print(f"⚠️  Error processing {image_path}: {e}")
-        return {}
+        if len(image_paths) > 1:
+            # One unreadable image fails the whole batch; retry them one by one
+            return [row for image_path in image_paths for row in detect_objects_in_batch([image_path])]
+        print(f"⚠️  Error processing {image_paths[0]}: {e}")
+        return [(Path(image_paths[0]).name, None, None)]
+
+    rows = []
+    for image_path, result in zip(image_paths, results):
+        name = Path(image_path).name
+        # Count objects by category
+        object_counts = {}
+        boxes = result.boxes
+        if boxes is not None and len(boxes) > 0:
+            class_ids, counts = np.unique(boxes.cls.cpu().numpy().astype(int), return_counts=True)
+            object_counts = {model.names[int(c)]: int(n) for c, n in zip(class_ids, counts)}
+
+        # Creates annotated image with boxes and labels
+        _worker["writer"].save(result.plot(), str(Path(_worker["output_dir"]) / name))
+        # Boxes without the result, which is costly to send between processes
+        rows.append((name, object_counts, result_detections(result)._replace(source=None)))
+    return rows
+
+
+def _ordered_results(pool, batches: Iterable[List[str]], window: int) -> Iterator[list]:
+    """Results of detect_objects_in_batch per batch, in order, with up to `window` batches in flight."""
+    pending = deque()
+    for batch in batches:
+        pending.append(pool.submit(detect_objects_in_batch, batch))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def checkpoint_source_path(output_csv: str) -> Path:
+    """Sidecar next to the output CSV naming the input directory its rows came from."""
+    return Path(output_csv + ".input")
+
+
+def read_checkpoint(output_csv: str, fieldnames: List[str], input_dir: str) -> Set[str]:
+    """
+    Images already in the output CSV, to skip on a rerun.
+    A last row cut off by a crash is removed.
+
+    Rows are keyed by image name, so they only count for the input directory
+    recorded in the CSV's sidecar (see checkpoint_source_path).
+
+    Returns:
+        Image names; raises if the CSV has other columns or was written for
+        another input directory
+    """
+    path = Path(output_csv)
+    if not path.exists() or path.stat().st_size == 0:
+        return set()
+
+    source_path = checkpoint_source_path(output_csv)
+    source = source_path.read_text(encoding="utf-8").strip() if source_path.exists() else None
+    if source != str(Path(input_dir).resolve()):
+        raise Exception(
+            f"Error: {output_csv} holds results for {source or 'an unknown input directory'}, "
+            f"not {input_dir}; use --restart or another --output-csv"
+        )
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        if not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+    with open(path, newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return set()
+        if header != fieldnames:
+            raise Exception(
+                f"Error: {output_csv} has different columns (another model?); "
+                "use --restart or another --output-csv"
+            )
+        return {row[0] for row in reader if row}
 
 
 def process_images(
@@ -61,15 +197,34 @@ def process_images(
     output_csv: str,
     model_name: str = "yolov8n.pt",
     output_dir: str = "export2",
+    backend: str = "pytorch",
+    int8: bool = False,
+    batch_size: int = 16,
+    workers: int = 1,
+    restart: bool = False,
+    tracks_csv: Optional[str] = None,
+    max_age: int = 30,
 ):
     """
-    Process all images in input_dir and create CSV with object counts.
+    Process all images in input_dir and stream a CSV with object counts.
+
+    Rows are appended and flushed batch by batch, so an interrupted run keeps
+    what it finished; a rerun skips images already in the CSV whose annotated
+    image exists.
 
     Args:
         input_dir: Directory containing images
         output_csv: Output CSV file path
         model_name: YOLO model to use (default: yolov8n.pt for nano model)
         output_dir: Directory to save annotated images (default: export2)
+        backend: Runtime for the model: pytorch, onnx or openvino (default: pytorch)
+        int8: Run the INT8-quantized export (onnx or openvino only)
+        batch_size: Images per model call (default: 16)
+        workers: Worker processes, each with its own model (default: 1, this process)
+        restart: Start the CSV over instead of skipping images already in it
+        tracks_csv: Also track objects across the images, taken as consecutive
+            video frames in name order, and write each track's lifetime here
+        max_age: With tracks_csv, images a track survives without a detection
     """
     input_path = Path(input_dir)
 
@@ -92,82 +247,119 @@ def process_images(
     image_files.sort()
     print(f"Found {len(image_files)} image(s) to process")
 
-    # Load YOLO model
-    print(f"Loading YOLO model: {model_name}...")
+    # Load YOLO model (also downloads or exports it once before the workers start)
+    print(f"Loading YOLO model: {model_name} ({backend}{', INT8' if int8 else ''})...")
     try:
-        model = YOLO(model_name)
+        model = load_model(model_name, backend, int8)
         print("✅ Model loaded successfully")
     except Exception as e:
         print(f"❌ Error loading YOLO model: {e}")
         print("   The model will be downloaded automatically on first use")
         return False
 
+    # Define columns: image name + every category the model knows, so rows
+    # can be written as they come and appended to on a rerun
+    categories = sorted(set(model.names.values()))
+    fieldnames = ["image"] + categories
+
     # Create output directory for annotated images
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     print(f"Annotated images will be saved to: {output_dir}/")
 
-    # Process all images and collect object counts
-    all_results = []
-    all_categories = set()
-
-    print("\nProcessing images...")
-    for i, image_file in enumerate(image_files, 1):
-        print(f"  [{i}/{len(image_files)}] Processing: {image_file.name}")
-
-        # Prepare output path for annotated image
-        annotated_output = output_path / image_file.name
-
-        # Detect objects and save annotated image
-        object_counts = detect_objects_in_image(
-            model,
-            str(image_file),
-            save_annotated=True,
-            output_path=str(annotated_output),
-        )
-
-        # Store results with image filename
-        result_row = {"image": image_file.name}
-        result_row.update(object_counts)
-        all_results.append(result_row)
-
-        # Track all unique categories
-        all_categories.update(object_counts.keys())
-
-    # Sort categories for consistent column order
-    sorted_categories = sorted(all_categories)
-
-    # Write CSV file
-    print(f"\nWriting results to: {output_csv}")
+    if restart:
+        for path in (Path(output_csv), checkpoint_source_path(output_csv)):
+            if path.exists():
+                os.remove(path)
     try:
-        with open(output_csv, "w", newline="", encoding="utf-8") as csvfile:
-            # Define columns: image name + all categories
-            fieldnames = ["image"] + sorted_categories
-
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            # Write each row
-            for result_row in all_results:
-                # Ensure all categories are present (fill with 0 if missing)
-                row = {"image": result_row["image"]}
-                for category in sorted_categories:
-                    row[category] = result_row.get(category, 0)
-                writer.writerow(row)
-
-        print(
-            f"✅ Successfully created CSV with {len(all_results)} row(s) and {len(sorted_categories)} category columns"
-        )
-        print(f"   Categories detected: {', '.join(sorted_categories)}")
-        print(
-            f"✅ Successfully saved {len(image_files)} annotated image(s) to: {output_dir}/"
-        )
-        return True
+        in_csv = read_checkpoint(output_csv, fieldnames, input_dir)
+    except Exception as e:
+        print(f"❌ {e}")
+        return False
+    if tracks_csv:
+        # Tracking needs the boxes of every frame
+        todo = [str(f) for f in image_files]
+        tracker = Tracker(max_age=max_age)
+    else:
+        todo = [
+            str(f)
+            for f in image_files
+            if f.name not in in_csv or not (output_path / f.name).exists()
+        ]
+    if len(todo) < len(image_files):
+        print(f"Skipping {len(image_files) - len(todo)} image(s) already in {output_csv}")
+
+    workers = max(1, workers)
+    print(f"\nProcessing {len(todo)} image(s), {batch_size} per batch, {workers} worker(s)...")
+    rows_written = failed = done = 0
+    categories_detected = set()
 
+    try:
+        with open(output_csv, "a", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            if csvfile.tell() == 0:
+                writer.writerow(fieldnames)
+                checkpoint_source_path(output_csv).write_text(
+                    str(input_path.resolve()) + "\n", encoding="utf-8"
+                )
+
+            batches = batched(todo, max(1, batch_size))
+            if workers == 1:
+                # Reuse the model loaded above rather than open a second session
+                start_worker(model_name, backend, int8, output_dir, model=model)
+                results = (detect_objects_in_batch(batch) for batch in batches)
+            else:
+                pool = ProcessPoolExecutor(
+                    workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=start_worker,
+                    initargs=(model_name, backend, int8, output_dir, max(1, (os.cpu_count() or 1) // workers)),
+                )
+                results = _ordered_results(pool, batches, workers * 2)
+
+            try:
+                for rows in results:
+                    for name, object_counts, detections in rows:
+                        done += 1
+                        if tracks_csv:
+                            tracker.update(detections or no_detections(), done)
+                        if object_counts is None:
+                            failed += 1
+                            continue
+                        categories_detected.update(object_counts)
+                        # Rerun for a missing annotated image: the row is already there
+                        if name in in_csv:
+                            continue
+                        writer.writerow([name] + [object_counts.get(c, 0) for c in categories])
+                        rows_written += 1
+                    csvfile.flush()
+                    print(f"  [{done}/{len(todo)}] Processed up to: {rows[-1][0]}")
+            finally:
+                if workers == 1:
+                    _worker["writer"].close()
+                else:
+                    pool.shutdown(cancel_futures=True)
+    except KeyboardInterrupt:
+        print(f"\n⚠️  Interrupted; {rows_written} row(s) were saved, rerun to continue")
+        return False
     except Exception as e:
         print(f"❌ Error writing CSV file: {e}")
         return False
 
+    print(
+        f"✅ Successfully wrote {rows_written} row(s) to {output_csv} ({len(in_csv)} from earlier runs)"
+    )
+    if categories_detected:
+        print(f"   Categories detected: {', '.join(sorted(categories_detected))}")
+    print(f"✅ Successfully saved {done - failed} annotated image(s) to: {output_dir}/")
+    if failed:
+        print(f"⚠️  {failed} image(s) failed and were left out; rerun to retry them")
+    if tracks_csv:
+        lifetimes = tracker.finish()
+        write_lifetimes(tracks_csv, lifetimes, model.names)
+        print(f"✅ Wrote {len(lifetimes)} track lifetime(s) to: {tracks_csv}")
+    return True
+
 
 def main():
     """Main function."""
@@ -179,6 +371,9 @@ Examples:
   python3 object_permanence.py
   python3 object_permanence.py --input-dir exports --output-csv results.csv
   python3 object_permanence.py --model yolov8s.pt --output-dir export2
+  python3 object_permanence.py --backend onnx --int8
+  python3 object_permanence.py --workers 4 --batch-size 32
+  python3 object_permanence.py -i exports --tracks tracks.csv
         """,
     )
     parser.add_argument(
@@ -191,7 +386,8 @@ Examples:
         "--output-csv",
         "-o",
         default="object_counts.csv",
-        help="Output CSV file path (default: object_counts.csv)",
+        help="Output CSV file path (default: object_counts.csv). Rerunning on the same input "
+        "directory skips images already in it",
     )
     parser.add_argument(
         "--model",
@@ -205,11 +401,65 @@ Examples:
         default="export2",
         help="Output directory for annotated images (default: export2)",
     )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="pytorch",
+        help="Runtime for the model; onnx and openvino export it once and cache it (default: pytorch)",
+    )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="Run an INT8-quantized export, calibrated on yolo/frames_all/images (onnx or openvino)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        "-b",
+        type=int,
+        default=16,
+        help="Images per YOLO call (default: 16)",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="Worker processes, each with its own model (default: 1)",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Start the CSV over instead of skipping images already in it",
+    )
+
+    parser.add_argument(
+        "--tracks",
+        help="Also track objects across the images as consecutive video frames (name order) "
+        "and write each track's lifetime to this CSV",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=int,
+        default=30,
+        help="With --tracks, frames a track survives without a detection (default: 30)",
+    )
 
     args = parser.parse_args()
+    if args.int8 and args.backend == "pytorch":
+        parser.error("--int8 needs --backend onnx or openvino")
 
     success = process_images(
-        args.input_dir, args.output_csv, args.model, args.output_dir
+        args.input_dir,
+        args.output_csv,
+        args.model,
+        args.output_dir,
+        args.backend,
+        args.int8,
+        args.batch_size,
+        args.workers,
+        args.restart,
+        args.tracks,
+        args.max_age,
     )
 
     if not success:
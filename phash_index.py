@@ -0,0 +1,136 @@
+"""
+Perceptual-hash index for spotting near-duplicate uploads before any API call.
+
+Images are reduced to a 64-bit dHash (difference hash): the image is shrunk to
+9x8 grayscale and each bit says whether a pixel is brighter than its right-hand
+neighbour. Resizing and re-compressing barely change it, and light crops move
+only a few bits, so near-duplicates are hashes within a small Hamming distance.
+
+Lookup uses multi-index hashing: the hash is split into four 16-bit chunks,
+each with its own table. Two hashes within distance r agree on at least one
+chunk to within r // 4 bits (pigeonhole), so only candidates from those table
+buckets are compared, instead of every stored hash.
+"""
+
+from array import array
+from io import BytesIO
+from itertools import combinations
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+CHUNKS = 4
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """64-bit difference hash of an image (for the default hash_size of 8)."""
+    from PIL import Image
+
+    image = Image.open(BytesIO(image_bytes))
+    image.draft("L", (hash_size * 8, hash_size * 8))  # fast JPEG downscale on decode
+    image = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _chunks(h: int) -> List[int]:
+    return [(h >> (CHUNK_BITS * i)) & CHUNK_MASK for i in range(CHUNKS)]
+
+
+def _neighbours(chunk: int, radius: int) -> List[int]:
+    """All chunk values within `radius` flipped bits of `chunk`."""
+    values = [chunk]
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), flips):
+            value = chunk
+            for bit in bits:
+                value ^= 1 << bit
+            values.append(value)
+    return values
+
+
+# Number of set bits in every byte value, for vectorized popcount
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class HashIndex:
+    """Multi-index hash table over 64-bit hashes, each stored under an integer key.
+
+    Table buckets hold slot numbers; candidate slots from all probed buckets are
+    verified against their full hashes in one vectorized pass.
+
+    Args:
+        max_distance: Default Hamming radius for lookups
+    """
+
+    def __init__(self, max_distance: int = 5):
+        self.max_distance = max_distance
+        self._tables: List[Dict[int, array]] = [{} for _ in range(CHUNKS)]
+        self._slots: Dict[int, int] = {}
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._keys = np.full(1024, -1, dtype=np.int64)
+        self._used = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(self, h: int, key: int):
+        """Store hash `h` under `key` (replacing any hash the key had)."""
+        if key in self._slots:
+            self.remove(key)
+        if self._used == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+            self._keys = np.concatenate([self._keys, np.full_like(self._keys, -1)])
+        slot = self._used
+        self._used += 1
+        self._hashes[slot] = h
+        self._keys[slot] = key
+        self._slots[key] = slot
+        for table, chunk in zip(self._tables, _chunks(h)):
+            bucket = table.get(chunk)
+            if bucket is None:
+                bucket = table[chunk] = array("q")
+            bucket.append(slot)
+
+    def remove(self, key: int) -> bool:
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return False
+        for table, chunk in zip(self._tables, _chunks(int(self._hashes[slot]))):
+            bucket = table[chunk]
+            del bucket[bucket.index(slot)]
+            if not bucket:
+                del table[chunk]
+        self._keys[slot] = -1
+        return True
+
+    def search(self, h: int, max_distance: int = None) -> List[Tuple[int, int]]:
+        """Keys whose hash is within `max_distance` bits of `h`, as (key, distance), closest first."""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        radius = max_distance // CHUNKS
+        buckets = [
+            table[value]
+            for table, chunk in zip(self._tables, _chunks(h))
+            for value in _neighbours(chunk, radius)
+            if value in table
+        ]
+        if not buckets:
+            return []
+        slots = np.unique(np.concatenate([np.frombuffer(b, dtype=np.int64) for b in buckets]))
+        xor = self._hashes[slots] ^ np.uint64(h)
+        distances = POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+        hits = np.flatnonzero(distances <= max_distance)
+        order = hits[np.argsort(distances[hits], kind="stable")]
+        return [(int(self._keys[slots[i]]), int(distances[i])) for i in order]
+
+    def nearest(self, h: int, max_distance: int = None):
+        """(key, distance) of the closest stored hash within range, or None."""
+        matches = self.search(h, max_distance)
+        return matches[0] if matches else None
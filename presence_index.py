@@ -0,0 +1,283 @@
+"""
+Temporal presence index: in which frames is each class visible?
+
+Questions like "when is a sandwich visible with confidence above 0.6" would
+otherwise scan every detection of the clip. PresenceIndex run-length encodes
+the frames where each class is detected (at or above min_conf) into sorted,
+disjoint intervals of frame numbers:
+
+- gap: runs separated by at most `gap` frames without a detection are merged,
+  so a few missed detections don't split an interval.
+- min_frames: intervals shorter than this after merging are dropped
+  (one-frame false positives).
+
+Because the intervals of a class are sorted and disjoint, their starts and
+their ends are both sorted, so an interval query (which intervals overlap
+frames a..b) and a point query (is the class visible at frame n) are binary
+searches, O(log intervals).
+
+The index is built from a detection store (detection_store.py) in a few
+vectorized passes, so it is rebuilt for each min_conf and gap rather than
+saved.
+
+Usage:
+  python presence_index.py yolo/frames_all/detections.npz --classes sandwich --min-conf 0.6 --gap 10
+  python presence_index.py yolo/frames_all --at 120
+  python presence_index.py yolo/frames_all --range 100 200 --min-frames 30
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from detection_store import DetectionStore
+
+
+class Interval(NamedTuple):
+    """Frames start to end (inclusive) where a class is visible."""
+
+    start: int
+    end: int
+    detected: int  # frames with a detection; the rest are bridged gaps
+    peak: float  # highest confidence in the interval
+
+    @property
+    def frames(self) -> int:
+        return self.end - self.start + 1
+
+
+class ClassIntervals(NamedTuple):
+    starts: np.ndarray
+    ends: np.ndarray
+    detected: np.ndarray
+    peaks: np.ndarray
+
+    def interval(self, i: int) -> Interval:
+        return Interval(int(self.starts[i]), int(self.ends[i]), int(self.detected[i]), float(self.peaks[i]))
+
+
+def run_length_encode(frames: np.ndarray, confidences: np.ndarray, gap: int = 0) -> ClassIntervals:
+    """Intervals of sorted frame numbers (repeats allowed), merging runs at most `gap` frames apart.
+
+    Args:
+        frames: Frame of each detection, sorted
+        confidences: Confidence of each detection
+        gap: Missing frames bridged between runs
+
+    Returns:
+        Start, end, detected frames and peak confidence of each interval
+    """
+    if len(frames) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return ClassIntervals(empty, empty, empty, np.zeros(0, dtype=np.float32))
+    unique, first = np.unique(frames, return_index=True)
+    frame_peaks = np.maximum.reduceat(confidences, first)
+    breaks = np.flatnonzero(np.diff(unique) > gap + 1) + 1
+    run_starts = np.concatenate([[0], breaks])
+    run_stops = np.concatenate([breaks, [len(unique)]])
+    return ClassIntervals(
+        unique[run_starts].astype(np.int64),
+        unique[run_stops - 1].astype(np.int64),
+        run_stops - run_starts,
+        np.maximum.reduceat(frame_peaks, run_starts),
+    )
+
+
+class PresenceIndex:
+    """Presence intervals of each class, with interval and point queries in O(log n)."""
+
+    def __init__(
+        self,
+        intervals: Dict[str, ClassIntervals],
+        frame_numbers: np.ndarray,
+        fps: float = 0.0,
+        min_conf: float = 0.0,
+        gap: int = 0,
+    ):
+        self._intervals = intervals
+        self.frame_numbers = np.asarray(frame_numbers)
+        self.fps = fps
+        self.min_conf = min_conf
+        self.gap = gap
+
+    @classmethod
+    def build(
+        cls,
+        frames: np.ndarray,
+        class_ids: np.ndarray,
+        confidences: np.ndarray,
+        names: Dict[int, str],
+        frame_numbers: Optional[np.ndarray] = None,
+        fps: float = 0.0,
+        min_conf: float = 0.0,
+        gap: int = 0,
+        min_frames: int = 1,
+    ) -> "PresenceIndex":
+        """Index detections given as columns, one row per box.
+
+        Args:
+            frames: Frame number of each box
+            class_ids: Class id of each box
+            confidences: Confidence of each box
+            names: Class name by class id
+            frame_numbers: Every frame of the clip (default: the frames with boxes)
+            fps: Frames per second, for times in seconds
+            min_conf: Boxes below this confidence don't count
+            gap: Missing frames bridged within an interval
+            min_frames: Shortest interval kept, after bridging
+        """
+        frames = np.asarray(frames)
+        class_ids = np.asarray(class_ids)
+        confidences = np.asarray(confidences, dtype=np.float32)
+        keep = confidences >= min_conf
+        order = np.argsort(frames[keep], kind="stable")
+        frames, class_ids, confidences = frames[keep][order], class_ids[keep][order], confidences[keep][order]
+
+        intervals = {}
+        for class_id in np.unique(class_ids):
+            mask = class_ids == class_id
+            runs = run_length_encode(frames[mask], confidences[mask], gap)
+            long_enough = runs.ends - runs.starts + 1 >= min_frames
+            if long_enough.any():
+                intervals[names.get(int(class_id), str(int(class_id)))] = ClassIntervals(
+                    *(column[long_enough] for column in runs)
+                )
+        if frame_numbers is None:
+            frame_numbers = np.unique(frames)
+        return cls(intervals, frame_numbers, fps, min_conf, gap)
+
+    @classmethod
+    def from_store(
+        cls, store: Union[DetectionStore, str, Path], min_conf: float = 0.0, gap: int = 0, min_frames: int = 1
+    ) -> "PresenceIndex":
+        """Index a detection store (or the path of one)."""
+        if not isinstance(store, DetectionStore):
+            store = DetectionStore(store)
+        return cls.build(
+            store["frame"],
+            store["class_id"],
+            store["confidence"],
+            store.names,
+            store.frame_numbers,
+            store.fps,
+            min_conf,
+            gap,
+            min_frames,
+        )
+
+    @property
+    def classes(self) -> List[str]:
+        return sorted(self._intervals)
+
+    def _class(self, name: str) -> Optional[ClassIntervals]:
+        return self._intervals.get(name)
+
+    def intervals(self, name: str, first: Optional[int] = None, last: Optional[int] = None) -> List[Interval]:
+        """Intervals of a class overlapping frames first to last (inclusive; default: all)."""
+        runs = self._class(name)
+        if runs is None:
+            return []
+        # First interval ending at or after `first`, up to the last starting at or before `last`
+        lo = 0 if first is None else int(np.searchsorted(runs.ends, first, side="left"))
+        hi = len(runs.starts) if last is None else int(np.searchsorted(runs.starts, last, side="right"))
+        return [runs.interval(i) for i in range(lo, hi)]
+
+    def interval_at(self, name: str, frame: int) -> Optional[Interval]:
+        """The interval of a class containing a frame, if the class is visible then."""
+        runs = self._class(name)
+        if runs is None:
+            return None
+        i = int(np.searchsorted(runs.starts, frame, side="right")) - 1
+        if i >= 0 and runs.ends[i] >= frame:
+            return runs.interval(i)
+        return None
+
+    def contains(self, name: str, frame: int) -> bool:
+        """Whether a class is visible at a frame."""
+        return self.interval_at(name, frame) is not None
+
+    def present_at(self, frame: int) -> List[str]:
+        """Classes visible at a frame."""
+        return [name for name in self.classes if self.contains(name, frame)]
+
+    def frames_present(self, name: str) -> int:
+        """Frames covered by the intervals of a class."""
+        runs = self._class(name)
+        return 0 if runs is None else int(np.sum(runs.ends - runs.starts + 1))
+
+    def seconds(self, frame: int) -> float:
+        """Time of a frame from the start of the clip (0 without fps)."""
+        if not self.fps or not len(self.frame_numbers):
+            return 0.0
+        return (frame - int(self.frame_numbers[0])) / self.fps
+
+
+def _format_interval(index: PresenceIndex, interval: Interval) -> str:
+    times = f"{index.seconds(interval.start):.2f}s-{index.seconds(interval.end + 1):.2f}s"
+    return (
+        f"frames {interval.start:>5}-{interval.end:<5} {times:<14} "
+        f"{interval.frames:>4} frame(s), {interval.detected / interval.frames:>4.0%} detected, "
+        f"peak {interval.peak:.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Show when each class is visible, from a detection store",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 presence_index.py yolo/frames_all --classes sandwich --min-conf 0.6 --gap 10
+  python3 presence_index.py yolo/frames_all --at 120
+  python3 presence_index.py yolo/frames_all/detections.npz --range 100 200
+        """,
+    )
+    parser.add_argument("store", help="Detection store (.npz), or a directory with detections.npz")
+    parser.add_argument("--classes", nargs="+", help="Classes to show (default: all)")
+    parser.add_argument("--min-conf", type=float, default=0.0, help="Lowest confidence counted (default: 0)")
+    parser.add_argument("--gap", type=int, default=0, help="Missing frames bridged within an interval (default: 0)")
+    parser.add_argument("--min-frames", type=int, default=1, help="Shortest interval shown (default: 1)")
+    parser.add_argument(
+        "--range", type=int, nargs=2, metavar=("FIRST", "LAST"), help="Only intervals overlapping these frames"
+    )
+    parser.add_argument("--at", type=int, metavar="FRAME", help="Only list the classes visible at this frame")
+    args = parser.parse_args()
+
+    path = Path(args.store)
+    if path.is_dir():
+        path = path / "detections.npz"
+    if not path.exists():
+        print(f"❌ Error: Detection store not found: {path}")
+        print("   Create one with: python detection_store.py convert DIR")
+        sys.exit(1)
+    try:
+        store = DetectionStore(path)
+        index = PresenceIndex.from_store(store, args.min_conf, args.gap, args.min_frames)
+        classes = args.classes or index.classes
+        store.class_ids(classes)  # unknown class names are an error, not "never visible"
+    except Exception as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.at is not None:
+        visible = [name for name in classes if index.contains(name, args.at)]
+        print(f"Frame {args.at} ({index.seconds(args.at):.2f}s): {', '.join(visible) or 'nothing'}")
+        for name in visible:
+            print(f"  {name:<14} {_format_interval(index, index.interval_at(name, args.at))}")
+        return
+
+    first, last = args.range if args.range else (None, None)
+    total = len(index.frame_numbers)
+    for name in classes:
+        intervals = index.intervals(name, first, last)
+        present = index.frames_present(name)
+        print(f"{name}: {len(intervals)} interval(s), visible in {present} of {total} frame(s) ({present / total:.0%})")
+        for interval in intervals:
+            print(f"  {_format_interval(index, interval)}")
+
+
+if __name__ == "__main__":
+    main()
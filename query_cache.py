@@ -0,0 +1,89 @@
+"""
+LRU caches for /search-images.
+
+Two caches sit in front of a search:
+  * descriptions: image hash -> (description, embedding). Describing and
+    embedding a query image doesn't depend on the index, so these stay valid.
+  * results: (image hash, index version, top_k, filters) -> response. The index
+    version is bumped by every add, delete, compaction and shard load/unload, so
+    a result computed against an older index is never looked up again and just
+    ages out of the LRU.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+
+def image_hash(image_bytes: bytes) -> str:
+    """Content hash used as the cache key of a query image."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def estimate_bytes(value: Any) -> int:
+    """Rough payload size of a cached value (arrays by nbytes, the rest as JSON)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_bytes(item) for item in value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(json.dumps(value, default=str))
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by entry count, with hit/miss counters.
+
+    Args:
+        max_entries: Entries kept before the least recently used is evicted.
+            0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[1]
+        size = estimate_bytes(value)
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
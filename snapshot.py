@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Portable snapshots of the image index for bringing up new nodes.
+
+A snapshot is a directory with
+  * vectors.npy     float32 (rows, dim) full-precision vectors, live rows only.
+                    np.load(..., mmap_mode="r") maps it without copying.
+  * metadata.arrow  one column per metadata field, as an Arrow IPC file that is
+                    memory-mapped on read. Needs pyarrow; without it the columns
+                    are written to metadata.json instead.
+  * manifest.json   embedding model and dimension, prompt hash, row count and a
+                    SHA-256 per file, checked before anything is loaded.
+
+A node started with SNAPSHOT_IMPORT serves from the snapshot directory in
+place (see open_snapshot) until its first write.
+
+The coarse FAISS index is not included. Row ids change on export (tombstones are
+dropped), and each node builds its own index from the vectors using its
+FAISS_STORAGE / SEARCH_DIM / FAISS_SHARDS settings.
+
+Usage:
+  python snapshot.py export snapshots/2024-06-01
+  python snapshot.py verify snapshots/2024-06-01
+  SNAPSHOT_IMPORT=snapshots/2024-06-01 uvicorn main:app
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+ARROW_METADATA_FILE = "metadata.arrow"
+JSON_METADATA_FILE = "metadata.json"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prompt_hash(prompt_file: str) -> Optional[str]:
+    """SHA-256 of the description prompt as main.py reads it, or None if there is none."""
+    if not os.path.exists(prompt_file):
+        return None
+    with open(prompt_file, "r", encoding="utf-8") as f:
+        return hashlib.sha256(f.read().strip().encode("utf-8")).hexdigest()
+
+
+def metadata_columns(metadata: List[Dict]) -> Dict[str, list]:
+    """Turn metadata entries into columns, one per field (missing values are None)."""
+    names = []
+    for entry in metadata:
+        for name in entry:
+            if name != "deleted" and name not in names:
+                names.append(name)
+    return {name: [entry.get(name) for entry in metadata] for name in names}
+
+
+def write_metadata(directory: str, metadata: List[Dict]) -> str:
+    """Write metadata columns as Arrow IPC, or JSON without pyarrow. Returns the file name."""
+    columns = metadata_columns(metadata)
+    if pa is None:
+        with open(os.path.join(directory, JSON_METADATA_FILE), "w", encoding="utf-8") as f:
+            json.dump({"rows": len(metadata), "columns": columns}, f, ensure_ascii=False)
+        return JSON_METADATA_FILE
+
+    arrays = {}
+    for name, values in columns.items():
+        try:
+            arrays[name] = pa.array(values)
+        except OverflowError:
+            # 64-bit hashes (dhash) don't fit int64
+            arrays[name] = pa.array(values, type=pa.uint64())
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed types in one field: keep them as text
+            arrays[name] = pa.array([None if v is None else str(v) for v in values])
+    table = pa.table(arrays) if arrays else pa.table({"image_path": pa.array([], pa.string())})
+    with pa.OSFile(os.path.join(directory, ARROW_METADATA_FILE), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return ARROW_METADATA_FILE
+
+
+def export_snapshot(
+    directory: str,
+    metadata: List[Dict],
+    vectors: np.ndarray,
+    embedding_model: str,
+    prompt_sha256: Optional[str],
+) -> dict:
+    """Write the live rows of an index to a snapshot directory.
+
+    Args:
+        directory: Snapshot directory; created, must not contain a snapshot yet
+        metadata: Metadata entries, one per vector row (tombstoned ones are skipped)
+        vectors: Full-precision vectors (e.g. the memory-mapped side file)
+        embedding_model: Model the vectors were embedded with
+        prompt_sha256: prompt_hash() of the prompt the descriptions were made
+            with, which is the index's, not necessarily prompt.txt's right now
+
+    Returns:
+        The manifest
+    """
+    if len(metadata) != len(vectors):
+        raise ValueError(f"{len(metadata)} metadata entries for {len(vectors)} vectors")
+    if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        raise FileExistsError(f"{directory} already holds a snapshot")
+    os.makedirs(directory, exist_ok=True)
+
+    live = np.array([not entry.get("deleted") for entry in metadata], dtype=bool)
+    live_ids = np.flatnonzero(live)
+    out = np.lib.format.open_memmap(
+        os.path.join(directory, VECTORS_FILE),
+        mode="w+",
+        dtype=np.float32,
+        shape=(len(live_ids), vectors.shape[1]),
+    )
+    for start in range(0, len(live_ids), 65_536):
+        chunk = live_ids[start : start + 65_536]
+        out[start : start + len(chunk)] = vectors[chunk]
+    out.flush()
+    del out
+
+    metadata_file = write_metadata(directory, [metadata[i] for i in live_ids])
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "embedding_model": embedding_model,
+        "embedding_dim": int(vectors.shape[1]),
+        "prompt_sha256": prompt_sha256,
+        "rows": int(len(live_ids)),
+        "vectors_file": VECTORS_FILE,
+        "metadata_file": metadata_file,
+        "files": {
+            name: {
+                "bytes": os.path.getsize(os.path.join(directory, name)),
+                "sha256": file_sha256(os.path.join(directory, name)),
+            }
+            for name in (VECTORS_FILE, metadata_file)
+        },
+    }
+    # Written last: a directory without a manifest is an unfinished export
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class Snapshot:
+    """A snapshot opened for reading. Vectors and Arrow metadata are memory-mapped."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No {MANIFEST_FILE} in {directory}")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot format {self.manifest.get('format_version')}"
+            )
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def verify_checksums(self):
+        """Check every file against the manifest's size and SHA-256."""
+        for name, expected in self.manifest["files"].items():
+            path = self.path(name)
+            if not os.path.exists(path):
+                raise ValueError(f"Snapshot file {name} is missing")
+            if os.path.getsize(path) != expected["bytes"]:
+                raise ValueError(f"Snapshot file {name} has the wrong size")
+            if file_sha256(path) != expected["sha256"]:
+                raise ValueError(f"Snapshot file {name} fails its checksum")
+
+    def check_compatible(
+        self,
+        embedding_model: str,
+        embedding_dim: int,
+        prompt_file: Optional[str],
+    ):
+        """Raise ValueError if this node would embed queries differently from the snapshot.
+
+        Args:
+            prompt_file: Description prompt of this node; None skips the prompt check
+        """
+        problems = []
+        if self.manifest["embedding_model"] != embedding_model:
+            problems.append(
+                f"embedding model {self.manifest['embedding_model']} != {embedding_model}"
+            )
+        if self.manifest["embedding_dim"] != embedding_dim:
+            problems.append(
+                f"embedding dimension {self.manifest['embedding_dim']} != {embedding_dim}"
+            )
+        if prompt_file is not None and self.manifest["prompt_sha256"] != prompt_hash(prompt_file):
+            problems.append("description prompt differs (prompt_sha256)")
+        if problems:
+            raise ValueError("Incompatible snapshot: " + "; ".join(problems))
+
+    def vectors(self) -> np.ndarray:
+        """Read-only memory-mapped vectors, shape (rows, dim)."""
+        vectors = np.load(self.path(self.manifest["vectors_file"]), mmap_mode="r")
+        if vectors.shape != (self.manifest["rows"], self.manifest["embedding_dim"]):
+            raise ValueError(f"vectors.npy has shape {vectors.shape}, manifest disagrees")
+        return vectors
+
+    def vectors_offset(self) -> int:
+        """Byte offset of the raw float32 rows in vectors.npy (the length of its header)."""
+        return self.vectors().offset
+
+    def metadata(self) -> List[Dict]:
+        """Metadata entries rebuilt from the columns (None values are left out)."""
+        name = self.manifest["metadata_file"]
+        if name == ARROW_METADATA_FILE:
+            if pa is None:
+                raise ImportError("pyarrow is required to read metadata.arrow")
+            with pa.memory_map(self.path(name), "r") as source:
+                columns = pa.ipc.open_file(source).read_all().to_pydict()
+        else:
+            with open(self.path(name), "r", encoding="utf-8") as f:
+                columns = json.load(f)["columns"]
+
+        rows = self.manifest["rows"]
+        entries = [{} for _ in range(rows)]
+        for field, values in columns.items():
+            for entry, value in zip(entries, values):
+                if value is not None:
+                    entry[field] = value
+        return entries
+
+
+def open_snapshot(
+    directory: str,
+    embedding_model: str,
+    embedding_dim: int,
+    prompt_file: Optional[str],
+) -> Snapshot:
+    """Open a snapshot for a node to serve from, after checking it is compatible and intact.
+
+    Nothing is copied: the node reads metadata.arrow and maps vectors.npy past
+    its header in place (see Snapshot.vectors_offset), and only writes its own
+    files once it changes the index.
+    """
+    snapshot = Snapshot(directory)
+    snapshot.check_compatible(embedding_model, embedding_dim, prompt_file)
+    snapshot.verify_checksums()
+    # Checks the shape against the manifest
+    snapshot.vectors()
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export and verify portable index snapshots",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("command", choices=["export", "verify"])
+    parser.add_argument("directory", help="Snapshot directory")
+    parser.add_argument("--metadata", default="faiss_metadata.pkl", help="Metadata file (default: faiss_metadata.pkl)")
+    parser.add_argument("--vectors", default="faiss_vectors.f32", help="Vector side file (default: faiss_vectors.f32)")
+    parser.add_argument("--model", default="text-embedding-3-small", help="Embedding model (default: text-embedding-3-small)")
+    parser.add_argument(
+        "--dim",
+        type=int,
+        default=int(os.getenv("EMBEDDING_DIM", "1536")),
+        help="Embedding dimension (default: EMBEDDING_DIM or 1536)",
+    )
+    parser.add_argument("--prompt", default="prompt.txt", help="Description prompt file (default: prompt.txt)")
+    parser.add_argument("--ignore-prompt", action="store_true", help="Skip the prompt hash check on verify")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "export":
+            with open(args.metadata, "rb") as f:
+                metadata = pickle.load(f)
+            rows = os.path.getsize(args.vectors) // (args.dim * 4)
+            vectors = np.memmap(args.vectors, dtype=np.float32, mode="r", shape=(rows, args.dim))
+            manifest = export_snapshot(
+                args.directory,
+                metadata,
+                vectors[: len(metadata)],
+                args.model,
+                prompt_hash(args.prompt),
+            )
+            print(f"✅ Exported {manifest['rows']} rows to {args.directory}")
+        else:
+            snapshot = Snapshot(args.directory)
+            snapshot.verify_checksums()
+            snapshot.check_compatible(
+                args.model, args.dim, None if args.ignore_prompt else args.prompt
+            )
+            print(f"✅ {args.directory} is intact and compatible ({snapshot.manifest['rows']} rows)")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Resume test for batch_ingest.py against the mock Batch API (mock_providers.py),
+served in-process on a free port. Each run works in a fresh directory, which
+holds the index files and the work directory.
+
+Usage: python -m pytest test_batch_ingest.py
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parent
+sys.path.insert(0, str(REPO))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+PORT = free_port()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+os.environ["MOCK_BATCH_SECONDS"] = "0"
+os.environ.setdefault("EMBEDDING_DIM", "64")
+
+import uvicorn  # noqa: E402
+
+import batch_ingest  # noqa: E402
+import main  # noqa: E402
+import mock_providers  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def mock_api():
+    server = uvicorn.Server(uvicorn.Config(mock_providers.app, host="127.0.0.1", port=PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch, mock_api):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "PROMPT_FILE", str(REPO / main.PROMPT_FILE))
+    images = tmp_path / "images"
+    images.mkdir()
+    return images
+
+
+def add_image(images: Path, name: str):
+    source = sorted((REPO / "samples").glob("*.jpg"))[0]
+    shutil.copy(source, images / name)
+
+
+def ingest(images: Path):
+    args = argparse.Namespace(directory=str(images), work_dir="batches", poll_seconds=0.05)
+    batch_ingest.run(args)
+    return set(main.get_indexed_image_paths())
+
+
+def test_nothing_to_ingest_leaves_no_state(workspace):
+    add_image(workspace, "101_a.jpg")
+    assert ingest(workspace) == {str(workspace / "101_a.jpg")}
+    assert not Path("batches/state.json").exists()
+
+    # Everything is indexed: no state may be left to stick to later runs
+    ingest(workspace)
+    assert not Path("batches/state.json").exists()
+
+    add_image(workspace, "102_b.jpg")
+    assert ingest(workspace) == {str(workspace / "101_a.jpg"), str(workspace / "102_b.jpg")}
+
+
+def test_empty_state_from_older_run_is_rescanned(workspace):
+    os.makedirs("batches")
+    batch_ingest.save_state("batches", {"images": []})
+    add_image(workspace, "103_c.jpg")
+    assert ingest(workspace) == {str(workspace / "103_c.jpg")}
+    assert not Path("batches/state.json").exists()
+
+
+def test_resume_after_submit(workspace, monkeypatch):
+    add_image(workspace, "104_d.jpg")
+    add_image(workspace, "105_e.jpg")
+    args = argparse.Namespace(directory=str(workspace), work_dir="batches", poll_seconds=0.05)
+
+    # Stop after the describe batches are submitted, as if the process died
+    def stop(*_):
+        raise KeyboardInterrupt
+
+    with monkeypatch.context() as patch, pytest.raises(KeyboardInterrupt):
+        patch.setattr(batch_ingest, "wait_for", stop)
+        batch_ingest.run(args)
+    state = batch_ingest.load_state("batches")
+    assert [Path(image["path"]).name for image in state["images"]] == ["104_d.jpg", "105_e.jpg"]
+    assert state["describe"]["batch_ids"]
+
+    # The rerun waits for the same describe batches and only submits the embed stage
+    submitted = set(mock_providers.batches)
+    assert ingest(workspace) == {str(workspace / "104_d.jpg"), str(workspace / "105_e.jpg")}
+    new_batches = [mock_providers.batches[i] for i in set(mock_providers.batches) - submitted]
+    assert [batch["endpoint"] for batch in new_batches] == ["/v1/embeddings"]
+    assert not Path("batches/state.json").exists()
@@ -4,7 +4,7 @@ import argparse
 from pathlib import Path
 
 try:
-    from ultralytics import YOLO
+    import ultralytics  # noqa: F401
     import cv2
     import numpy as np
 except ImportError as e:
@@ -13,12 +13,25 @@ except ImportError as e:
     print("   Install with: pip install ultralytics opencv-python")
     sys.exit(1)
 
+from keyframes import FILL_MODES
+from yolo_export import BACKENDS
+from yolo_inference import load_model, print_report, read_frames, run_pipeline
+from video_segments import run_segments
+
 
 def process_video_with_yolo(
     video_path: str,
     output_path: str,
     model_name: str = "yolov8n.pt",
     conf_threshold: float = 0.25,
+    batch_size: int = 1,
+    queue_size: int = 4,
+    every: int = 1,
+    motion_threshold: float = 12.0,
+    fill: str = "interpolate",
+    backend: str = "pytorch",
+    int8: bool = False,
+    first_frame: int = 0,
 ):
     """
     Process a video file frame by frame with YOLO object detection.
@@ -29,15 +42,25 @@ def process_video_with_yolo(
         output_path: Path to output video file
         model_name: YOLO model to use (default: yolov8n.pt)
         conf_threshold: Confidence threshold for detections (default: 0.25)
+        batch_size: Frames per YOLO call (default: 1); larger batches are faster on CPU
+        queue_size: Batches buffered between pipeline stages (default: 4)
+        every: Detect on every `every`-th frame and fill in boxes between (default: 1, every frame)
+        motion_threshold: With every > 1, also detect when the picture changed
+            more than this since the last keyframe (default: 12.0, 0 turns it off)
+        fill: How boxes between keyframes are filled in (default: interpolate)
+        backend: Runtime for the model: pytorch, onnx or openvino (default: pytorch)
+        int8: Run the INT8-quantized export (onnx or openvino only)
+        first_frame: Index of the input's first frame when it is a segment of
+            a longer video (see --segments); only used in progress messages
     """
     if not os.path.exists(video_path):
         print(f"❌ Error: Video file not found: {video_path}")
         return False
 
     # Load YOLO model
-    print(f"Loading YOLO model: {model_name}...")
+    print(f"Loading YOLO model: {model_name} ({backend}{', INT8' if int8 else ''})...")
     try:
-        model = YOLO(model_name)
+        model = load_model(model_name, backend, int8)
         print("✅ Model loaded successfully")
     except Exception as e:
         print(f"❌ Error loading YOLO model: {e}")
@@ -73,28 +96,39 @@ def process_video_with_yolo(
 
     print(f"\nProcessing frames...")
     frame_count = 0
+    report = None
 
-    try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_count += 1
+    def annotate(frame, result):
+        # Get annotated frame with all detections highlighted
+        return result.plot()
 
-            # Run YOLO detection on frame
-            results = model(frame, conf=conf_threshold, verbose=False)
+    def write(annotated_frame):
+        nonlocal frame_count
+        # Write annotated frame to output video
+        out.write(annotated_frame)
+        frame_count += 1
 
-            # Get annotated frame with all detections highlighted
-            annotated_frame = results[0].plot()
+        # Progress indicator
+        if frame_count % 30 == 0 or frame_count == total_frames:
+            progress = (frame_count / total_frames) * 100 if total_frames > 0 else 0
+            segment = f" of the segment from frame {first_frame}" if first_frame else ""
+            print(f"  Processed {frame_count}/{total_frames} frames{segment} ({progress:.1f}%)")
 
-            # Write annotated frame to output video
-            out.write(annotated_frame)
-
-            # Progress indicator
-            if frame_count % 30 == 0 or frame_count == total_frames:
-                progress = (frame_count / total_frames) * 100 if total_frames > 0 else 0
-                print(f"  Processed {frame_count}/{total_frames} frames ({progress:.1f}%)")
+    try:
+        # Decode, detect (batch_size frames per call), draw and encode on
+        # separate threads connected by bounded queues, in frame order
+        report = run_pipeline(
+            model,
+            read_frames(cap),
+            annotate,
+            write,
+            batch_size,
+            queue_size,
+            every=every,
+            motion_threshold=motion_threshold or None,
+            fill=fill,
+            conf=conf_threshold,
+        )
 
     except KeyboardInterrupt:
         print("\n⚠️  Processing interrupted by user")
@@ -109,6 +143,7 @@ def process_video_with_yolo(
         print(f"\n✅ Successfully processed {frame_count} frames")
         print(f"   Output saved to: {output_path}")
 
+    print_report(report)
     return True
 
 
@@ -122,6 +157,10 @@ Examples:
   python3 to_gif.py video.mp4 output.mp4
   python3 to_gif.py video.mp4 output.mp4 --model yolov8s.pt
   python3 to_gif.py video.mp4 output.mp4 --conf 0.5
+  python3 to_gif.py video.mp4 output.mp4 --batch-size 8
+  python3 to_gif.py video.mp4 output.mp4 --every 4
+  python3 to_gif.py video.mp4 output.mp4 --backend openvino --int8
+  python3 to_gif.py video.mp4 output.mp4 --segments 4
         """,
     )
     parser.add_argument(
@@ -145,12 +184,94 @@ Examples:
         default=0.25,
         help="Confidence threshold for detections (default: 0.25)",
     )
+    parser.add_argument(
+        "--batch-size",
+        "-b",
+        type=int,
+        default=1,
+        help="Frames per YOLO call (default: 1). Larger batches raise CPU throughput",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=4,
+        help="Batches buffered between decode, inference, drawing and encoding (default: 4)",
+    )
+    parser.add_argument(
+        "--every",
+        "-k",
+        type=int,
+        default=1,
+        help="Detect on every k-th frame and fill in boxes on the frames between (default: 1, every frame)",
+    )
+    parser.add_argument(
+        "--motion-threshold",
+        type=float,
+        default=12.0,
+        help="With --every, also detect when a frame differs from the last keyframe by more than "
+        "this mean gray level (default: 12, 0 turns it off)",
+    )
+    parser.add_argument(
+        "--fill",
+        choices=FILL_MODES,
+        default="interpolate",
+        help="How boxes between keyframes are filled in (default: interpolate)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="pytorch",
+        help="Runtime for the model; onnx and openvino export it once and cache it (default: pytorch)",
+    )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="Run an INT8-quantized export, calibrated on yolo/frames_all/images (onnx or openvino)",
+    )
+    parser.add_argument(
+        "--segments",
+        type=int,
+        default=1,
+        help="Split the video at keyframes into this many segments and process them in parallel "
+        "worker processes, then join them with ffmpeg (default: 1, no split)",
+    )
 
     args = parser.parse_args()
+    if args.int8 and args.backend == "pytorch":
+        parser.error("--int8 needs --backend onnx or openvino")
 
-    success = process_video_with_yolo(
-        args.input_video, args.output_video, args.model, args.conf
-    )
+    if args.segments > 1:
+        # Download or export the model once here rather than in every worker
+        load_model(args.model, args.backend, args.int8)
+        success = run_segments(
+            process_video_with_yolo,
+            args.input_video,
+            args.output_video,
+            args.segments,
+            model_name=args.model,
+            conf_threshold=args.conf,
+            batch_size=args.batch_size,
+            queue_size=args.queue_size,
+            every=args.every,
+            motion_threshold=args.motion_threshold,
+            fill=args.fill,
+            backend=args.backend,
+            int8=args.int8,
+        )
+    else:
+        success = process_video_with_yolo(
+            args.input_video,
+            args.output_video,
+            args.model,
+            args.conf,
+            args.batch_size,
+            args.queue_size,
+            args.every,
+            args.motion_threshold,
+            args.fill,
+            args.backend,
+            args.int8,
+        )
 
     if not success:
         sys.exit(1)
@@ -0,0 +1,759 @@
+"""
+Vector storage for the image index.
+
+Every vector is kept twice:
+  * a coarse FAISS index that may be compressed (flat, fp16, sq8 or pq) and may
+    hold only the first `search_dim` components, used to find candidates
+    quickly, and
+  * a float32 side file on disk that is read through np.memmap and used to
+    re-rank those candidates exactly on the full vectors.
+
+With the default "flat" storage at full dimension the coarse index is already
+exact and no re-ranking happens, which matches the original IndexFlatIP
+behaviour.
+
+Vector ids are row numbers in the side file. The coarse index is wrapped in an
+IndexIDMap2 so rows can be removed; removed rows stay in the side file as
+tombstones until the store is compacted.
+
+The coarse index can be split into shards by a key (image index, cuisine,
+restaurant, ...). Shards are searched in parallel on a thread pool (FAISS
+releases the GIL) and can be unloaded from memory and loaded back one at a time.
+"""
+
+import heapq
+import os
+import shutil
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+STORAGE_TYPES = ("flat", "fp16", "sq8", "pq")
+
+
+class VectorFile:
+    """Append-only float32 matrix stored as raw bytes and read through np.memmap.
+
+    A file that does not exist yet can borrow its rows from `source`, read from
+    byte `offset` on (e.g. a snapshot's vectors.npy past its header) without
+    copying them. The first write copies them to `path`.
+    """
+
+    def __init__(self, path: str, dim: int, source: Optional[str] = None, offset: int = 0):
+        self.path = path
+        self.dim = dim
+        self._view = None
+        self.source = source if source is not None and not os.path.exists(path) else None
+        self.offset = offset if self.source is not None else 0
+
+        if self.source is None and not os.path.exists(path):
+            open(path, "wb").close()
+
+        size = os.path.getsize(self.source or path) - self.offset
+        if size % self.row_bytes != 0:
+            raise ValueError(
+                f"{self.source or path} has {size} bytes, not a multiple of {dim} float32 columns"
+            )
+        self._count = size // self.row_bytes
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dim * np.dtype(np.float32).itemsize
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, vectors: np.ndarray):
+        """Append rows to the end of the file."""
+        self.own()
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with open(self.path, "ab") as f:
+            f.write(vectors.tobytes())
+        self._count += len(vectors)
+        self._view = None
+
+    def truncate(self, rows: int):
+        """Drop rows past `rows`, e.g. ones written before a crash lost their metadata."""
+        self.own()
+        self.close()
+        with open(self.path, "r+b") as f:
+            f.truncate(rows * self.row_bytes)
+        self._count = rows
+
+    def own(self):
+        """Copy borrowed rows from `source` to `path`, after which `source` is no longer read."""
+        if self.source is None:
+            return
+        self.close()
+        with open(self.source, "rb") as src, open(self.path + ".tmp", "wb") as dst:
+            src.seek(self.offset)
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(self.path + ".tmp", self.path)
+        self.source, self.offset = None, 0
+
+    def close(self):
+        """Release the memory map (required before replacing the file on Windows)."""
+        self._view = None
+
+    def replace(self, path: str):
+        """Move this file over `path` and keep using it from there."""
+        self.own()
+        self.close()
+        os.replace(self.path, path)
+        self.path = path
+
+    def array(self) -> np.ndarray:
+        """Read-only memory-mapped view of all rows."""
+        if self._count == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+        if self._view is None:
+            self._view = np.memmap(
+                self.source or self.path,
+                dtype=np.float32,
+                mode="r",
+                offset=self.offset,
+                shape=(self._count, self.dim),
+            )
+        return self._view
+
+    def take(self, ids: np.ndarray) -> np.ndarray:
+        """Gather rows by id. Ids are sorted first so the reads walk the file forwards."""
+        order = np.argsort(ids)
+        rows = np.empty((len(ids), self.dim), dtype=np.float32)
+        rows[order] = self.array()[ids[order]]
+        return rows
+
+
+def create_index(storage: str, dim: int, pq_m: Optional[int] = None) -> faiss.Index:
+    """Create an empty, id-mapped inner-product index for the given storage type."""
+    if storage == "flat":
+        base = faiss.IndexFlatIP(dim)
+    elif storage == "fp16":
+        base = faiss.IndexScalarQuantizer(
+            dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+        )
+    elif storage == "sq8":
+        base = faiss.IndexScalarQuantizer(
+            dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+        )
+    elif storage == "pq":
+        pq_m = pq_m or dim // 16
+        if dim % pq_m != 0:
+            raise ValueError(f"PQ sub-quantizers ({pq_m}) must divide dimension {dim}")
+        base = faiss.IndexPQ(dim, pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+    else:
+        raise ValueError(
+            f"Unknown storage type '{storage}'. Options: {', '.join(STORAGE_TYPES)}"
+        )
+    return faiss.IndexIDMap2(base)
+
+
+def base_index(index: faiss.Index) -> faiss.Index:
+    """Return the storage index inside an IndexIDMap, or the index itself."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def storage_of(index: faiss.Index) -> Optional[str]:
+    """Return the storage type name of an existing index, or None if unknown."""
+    index = base_index(index)
+    if isinstance(index, faiss.IndexFlat):
+        return "flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16:
+            return "fp16"
+        if index.sq.qtype == faiss.ScalarQuantizer.QT_8bit:
+            return "sq8"
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    return None
+
+
+def shard_for(key, n_shards: int) -> int:
+    """Stable shard number for a key (Python's hash() is randomized per process)."""
+    if n_shards == 1:
+        return 0
+    return zlib.crc32(str(key).encode("utf-8")) % n_shards
+
+
+def shard_path(index_path: str, shard: int, n_shards: int) -> str:
+    """File of one shard; a single shard keeps the plain index path."""
+    if n_shards == 1:
+        return index_path
+    stem, ext = os.path.splitext(index_path)
+    return f"{stem}.shard{shard}{ext}"
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return an L2-normalized float32 2D copy of the vectors."""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2, copy=True)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def merge_similar(
+    vectors: np.ndarray, threshold: float, centroid: bool = False
+) -> Tuple[np.ndarray, List[List[int]]]:
+    """Greedily group vectors whose cosine similarity reaches `threshold`.
+
+    Each vector joins the most similar earlier representative at or above the
+    threshold, or starts a new group. The first vector always starts group 0.
+
+    Args:
+        vectors: Vectors to merge (normalized here)
+        threshold: Cosine similarity at which two vectors are merged
+        centroid: Return the normalized mean of each group instead of its first vector
+
+    Returns:
+        (one vector per group, row numbers of each group with the representative first)
+    """
+    vectors = normalize(vectors)
+    representatives: List[int] = []
+    groups: List[List[int]] = []
+    for row in range(len(vectors)):
+        if representatives:
+            similarities = vectors[representatives] @ vectors[row]
+            best = int(np.argmax(similarities))
+            if similarities[best] >= threshold:
+                groups[best].append(row)
+                continue
+        representatives.append(row)
+        groups.append([row])
+
+    if centroid:
+        return normalize(np.stack([vectors[g].mean(axis=0) for g in groups])), groups
+    return vectors[representatives], groups
+
+
+class Shard:
+    """One partition of the coarse index. `index` is None while unloaded.
+
+    Writes that land on an unloaded shard only reach the side file; the shard
+    is marked stale and rebuilt from the side file when it is loaded again.
+    """
+
+    def __init__(self, index: Optional[faiss.Index] = None):
+        self.index = index
+        self.stale = False
+
+    @property
+    def loaded(self) -> bool:
+        return self.index is not None
+
+
+class VectorStore:
+    """Coarse (possibly compressed, possibly sharded) FAISS index plus exact re-ranking from disk.
+
+    Args:
+        dim: Embedding dimension
+        vectors_path: Path of the float32 side file holding the full vectors
+        storage: Coarse index type, one of STORAGE_TYPES
+        rerank_factor: Candidates fetched per requested result before re-ranking
+        train_size: Number of vectors collected before sq8/pq is trained. Until
+            then search scans the side file exactly.
+        pq_m: Number of PQ sub-quantizers (default: search_dim / 16)
+        search_dim: Dimensions kept in the coarse index (default: dim). Vectors are
+            truncated and re-normalized, which text-embedding-3 models support.
+        n_shards: Number of coarse index shards
+        index_path: Where the coarse index (or its shards) is saved; needed to
+            unload shards
+        vectors_source, vectors_offset: File (and byte offset) the side file
+            borrows its rows from until the first write, see VectorFile
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        vectors_path: str,
+        storage: str = "flat",
+        rerank_factor: int = 4,
+        train_size: int = 1000,
+        pq_m: Optional[int] = None,
+        search_dim: Optional[int] = None,
+        n_shards: int = 1,
+        index_path: Optional[str] = None,
+        vectors_source: Optional[str] = None,
+        vectors_offset: int = 0,
+    ):
+        if search_dim and not 0 < search_dim <= dim:
+            raise ValueError(f"search_dim must be between 1 and {dim}, got {search_dim}")
+        if n_shards < 1:
+            raise ValueError(f"n_shards must be at least 1, got {n_shards}")
+        self.dim = dim
+        self.search_dim = search_dim or dim
+        self.storage = storage
+        self.rerank_factor = max(1, rerank_factor)
+        # PQ k-means needs at least one training point per centroid (2^8)
+        self.train_size = max(train_size, 256) if storage == "pq" else train_size
+        self.pq_m = pq_m
+        self.n_shards = n_shards
+        self.index_path = index_path
+        self.vectors = VectorFile(vectors_path, dim, vectors_source, vectors_offset)
+        self.deleted = np.zeros(len(self.vectors), dtype=bool)
+        self.assignment = np.zeros(len(self.vectors), dtype=np.int32)
+        # Empty index every shard is cloned from; holds the sq8/pq training
+        self.template = create_index(storage, self.search_dim, pq_m)
+        self.shards = [Shard(faiss.clone_index(self.template)) for _ in range(n_shards)]
+        self._pool = None
+
+    @classmethod
+    def load(
+        cls,
+        index_path: str,
+        vectors_path: str,
+        dim: int,
+        storage: str = "flat",
+        rows: Optional[int] = None,
+        deleted: Iterable[int] = (),
+        shard_keys: Optional[List] = None,
+        **kwargs,
+    ) -> "VectorStore":
+        """Load a store from disk, migrating or rebuilding the coarse index as needed.
+
+        An index written before the side file existed is a plain IndexFlatIP; its
+        vectors are copied out into the side file on first load. Any shard on disk
+        that does not match the requested storage type, or is out of sync with the
+        side file, is rebuilt from the side file.
+
+        Args:
+            rows: Number of rows that have metadata. Extra rows at the end of the
+                side file (added before an unclean shutdown) are dropped.
+            deleted: Ids of tombstoned rows
+            shard_keys: Shard key of every row (default: the row id)
+        """
+        store = cls(dim, vectors_path, storage, index_path=index_path, **kwargs)
+        paths = [shard_path(index_path, s, store.n_shards) for s in range(store.n_shards)]
+        indexes = [faiss.read_index(p) if os.path.exists(p) else None for p in paths]
+
+        if store.n_shards == 1:
+            legacy = indexes[0]
+        else:
+            legacy = faiss.read_index(index_path) if os.path.exists(index_path) else None
+        if legacy is not None and len(store.vectors) == 0 and legacy.ntotal > 0:
+            if storage_of(legacy) != "flat" or legacy.d != dim:
+                raise ValueError(
+                    f"{vectors_path} is missing and a compressed index cannot be "
+                    "migrated without its full-precision vectors"
+                )
+            store.vectors.append(base_index(legacy).reconstruct_n(0, legacy.ntotal))
+
+        if rows is not None and rows < len(store.vectors):
+            store.vectors.truncate(rows)
+        store.deleted = np.zeros(len(store.vectors), dtype=bool)
+        store.deleted[np.fromiter(deleted, dtype=np.int64)] = True
+        store.assignment = store._assign(
+            np.arange(len(store.vectors), dtype=np.int64),
+            None if shard_keys is None else shard_keys[: len(store.vectors)],
+        )
+
+        trained = [
+            index
+            for index in indexes
+            if index is not None and store._compatible(index) and index.is_trained
+        ]
+        if trained:
+            store.template = faiss.clone_index(trained[0])
+            store.template.reset()
+        if not store.template.is_trained:
+            store._train_if_ready()
+            return store
+
+        for s, index in enumerate(indexes):
+            if (
+                index is not None
+                and store._compatible(index)
+                and index.is_trained
+                and index.ntotal == len(store._shard_rows(s))
+            ):
+                store.shards[s].index = index
+            else:
+                store._build_shard(s)
+        return store
+
+    def _compatible(self, index: faiss.Index) -> bool:
+        return (
+            isinstance(faiss.downcast_index(index), faiss.IndexIDMap2)
+            and storage_of(index) == self.storage
+            and index.d == self.search_dim
+        )
+
+    def save(self, index_path: Optional[str] = None):
+        """Write the loaded coarse index shards, each via a temporary file renamed into place.
+
+        The side file is written as vectors are added; one still borrowed from a
+        snapshot is copied to its own path here, as the metadata saved alongside
+        will expect it there. Files of unloaded shards that missed writes are
+        removed so they are rebuilt on the next load.
+        """
+        self.vectors.own()
+        self.index_path = index_path or self.index_path
+        for s, shard in enumerate(self.shards):
+            path = shard_path(self.index_path, s, self.n_shards)
+            if shard.loaded:
+                faiss.write_index(shard.index, path + ".tmp")
+                os.replace(path + ".tmp", path)
+            elif shard.stale and os.path.exists(path):
+                os.remove(path)
+
+    @property
+    def ntotal(self) -> int:
+        """Number of live (not deleted) vectors."""
+        return len(self.vectors) - self.tombstones
+
+    @property
+    def tombstones(self) -> int:
+        return int(self.deleted.sum())
+
+    @property
+    def is_trained(self) -> bool:
+        return bool(self.template.is_trained)
+
+    def live_ids(self) -> np.ndarray:
+        return np.flatnonzero(~self.deleted)
+
+    def _shard_rows(self, shard: int) -> np.ndarray:
+        return np.flatnonzero((self.assignment == shard) & ~self.deleted)
+
+    def _assign(self, ids: np.ndarray, shard_keys: Optional[List]) -> np.ndarray:
+        keys = ids if shard_keys is None else shard_keys
+        return np.fromiter(
+            (shard_for(key, self.n_shards) for key in keys), dtype=np.int32, count=len(ids)
+        )
+
+    def rebuild(self):
+        """Recreate every coarse index shard from the live vectors in the side file."""
+        self.template = create_index(self.storage, self.search_dim, self.pq_m)
+        self.shards = [
+            Shard(faiss.clone_index(self.template)) for _ in range(self.n_shards)
+        ]
+        self._train_if_ready()
+
+    def _build_shard(self, shard: int):
+        index = faiss.clone_index(self.template)
+        self._add_to_index(index, self._shard_rows(shard))
+        self.shards[shard].index = index
+        self.shards[shard].stale = False
+
+    @property
+    def reranks(self) -> bool:
+        """Whether coarse results are approximate and need exact re-ranking."""
+        return self.storage != "flat" or self.search_dim < self.dim
+
+    def _coarse(self, vectors: np.ndarray) -> np.ndarray:
+        """Project full vectors onto the coarse index: truncate and re-normalize."""
+        if self.search_dim == self.dim:
+            return np.ascontiguousarray(vectors)
+        return normalize(vectors[:, : self.search_dim])
+
+    def _train_if_ready(self):
+        """Train sq8/pq once enough vectors exist, then index everything seen so far."""
+        if not self.template.is_trained:
+            if self.ntotal < self.train_size:
+                return
+            ids = self.live_ids()
+            sample = ids
+            if len(ids) > 50_000:
+                rng = np.random.default_rng(0)
+                sample = np.sort(rng.choice(ids, 50_000, replace=False))
+            self.template.train(self._coarse(self.vectors.array()[sample]))
+
+        for s, shard in enumerate(self.shards):
+            if shard.loaded:
+                self._build_shard(s)
+            else:
+                shard.stale = True
+
+    def _add_to_index(self, index: faiss.Index, ids: np.ndarray, chunk_size: int = 65_536):
+        vectors = self.vectors.array()
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start : start + chunk_size]
+            index.add_with_ids(self._coarse(vectors[chunk]), chunk)
+
+    def add(self, vectors: np.ndarray, shard_keys: Optional[List] = None) -> np.ndarray:
+        """Normalize and add vectors. Returns their ids (row numbers).
+
+        Args:
+            vectors: Vectors to add, one per row
+            shard_keys: Shard key of each vector (default: its id)
+        """
+        vectors = normalize(vectors)
+        first_id = len(self.vectors)
+        ids = np.arange(first_id, first_id + len(vectors), dtype=np.int64)
+        assignment = self._assign(ids, shard_keys)
+        self.vectors.append(vectors)
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(ids), dtype=bool)])
+        self.assignment = np.concatenate([self.assignment, assignment])
+
+        if not self.template.is_trained:
+            self._train_if_ready()
+            return ids
+
+        coarse = self._coarse(vectors)
+        for s in np.unique(assignment):
+            shard = self.shards[s]
+            mask = assignment == s
+            if shard.loaded:
+                shard.index.add_with_ids(coarse[mask], ids[mask])
+            else:
+                shard.stale = True
+        return ids
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Tombstone rows and drop them from the coarse index. Returns how many were live."""
+        ids = np.fromiter(ids, dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < len(self.vectors))]
+        ids = np.unique(ids[~self.deleted[ids]])
+        if len(ids) == 0:
+            return 0
+        self.deleted[ids] = True
+        for s in np.unique(self.assignment[ids]):
+            shard = self.shards[s]
+            if not shard.loaded:
+                shard.stale = True
+            elif shard.index.ntotal > 0:
+                shard_ids = ids[self.assignment[ids] == s]
+                shard.index.remove_ids(faiss.IDSelectorBatch(shard_ids))
+        return len(ids)
+
+    def unload_shard(self, shard: int):
+        """Save one shard to disk and release its memory. It is skipped by searches."""
+        if self.index_path is None:
+            raise ValueError("Store has no index_path to unload shards to")
+        if self.shards[shard].loaded:
+            faiss.write_index(
+                self.shards[shard].index, shard_path(self.index_path, shard, self.n_shards)
+            )
+            self.shards[shard].index = None
+
+    def load_shard(self, shard: int):
+        """Bring an unloaded shard back, rebuilding it if it missed writes."""
+        if self.shards[shard].loaded:
+            return
+        path = shard_path(self.index_path, shard, self.n_shards)
+        if self.is_trained and not self.shards[shard].stale and os.path.exists(path):
+            index = faiss.read_index(path)
+            if index.ntotal == len(self._shard_rows(shard)):
+                self.shards[shard].index = index
+                return
+        if self.is_trained:
+            self._build_shard(shard)
+        else:
+            self.shards[shard].index = faiss.clone_index(self.template)
+            self.shards[shard].stale = False
+
+    def compacted(self, vectors_path: str) -> Tuple["VectorStore", np.ndarray]:
+        """Build a new store at `vectors_path` holding only the live rows.
+
+        The current store is left untouched so it can keep serving searches while
+        the new one is built. sq8/pq are retrained on the surviving vectors, and
+        shards that are unloaded here stay unloaded (and stale) in the new store.
+
+        Returns:
+            (new_store, kept_ids): row i of the new store is row kept_ids[i] here
+        """
+        if os.path.exists(vectors_path):
+            os.remove(vectors_path)
+        kept_ids = self.live_ids()
+        store = VectorStore(
+            self.dim,
+            vectors_path,
+            self.storage,
+            rerank_factor=self.rerank_factor,
+            train_size=self.train_size,
+            pq_m=self.pq_m,
+            search_dim=self.search_dim,
+            n_shards=self.n_shards,
+            index_path=self.index_path,
+        )
+        source = self.vectors.array()
+        for start in range(0, len(kept_ids), 65_536):
+            store.vectors.append(source[kept_ids[start : start + 65_536]])
+        store.deleted = np.zeros(len(store.vectors), dtype=bool)
+        store.assignment = self.assignment[kept_ids]
+        for s, shard in enumerate(self.shards):
+            if not shard.loaded:
+                store.shards[s].index = None
+                store.shards[s].stale = True
+        store._train_if_ready()
+        return store, kept_ids
+
+    def search(
+        self, query: np.ndarray, k: int, allowed: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Search for the k nearest vectors by cosine similarity.
+
+        Unloaded shards are skipped.
+
+        Args:
+            query: Query vectors, one per row
+            k: Number of results per query
+            allowed: Optional boolean mask over row ids. Only rows set in it can
+                be returned; FAISS skips the others while scanning (pq, which has
+                no selector support, scans the allowed rows in the side file).
+
+        Returns:
+            (similarities, ids), each of shape (n_queries, k). Missing results are
+            padded with id -1.
+        """
+        query = normalize(query)
+        live = ~self.deleted
+        if allowed is not None:
+            live = live & self._pad_mask(allowed)
+        k = min(k, int(live.sum()))
+        if k == 0:
+            return (
+                np.empty((len(query), 0), dtype=np.float32),
+                np.empty((len(query), 0), dtype=np.int64),
+            )
+
+        if not self.template.is_trained or (
+            allowed is not None and self.storage == "pq"
+        ):
+            return self._exact_scan(query, k, live)
+
+        n_candidates = k * self.rerank_factor if self.reranks else k
+        scores, candidates = self._search_shards(
+            self._coarse(query), n_candidates, None if allowed is None else live
+        )
+        if not self.reranks:
+            return scores[:, :k], candidates[:, :k]
+        return self._rerank(query, candidates, k)
+
+    def _pad_mask(self, mask: np.ndarray) -> np.ndarray:
+        """Fit a row mask to the current number of rows (newer rows are not allowed)."""
+        mask = np.asarray(mask, dtype=bool)[: len(self.vectors)]
+        if len(mask) < len(self.vectors):
+            mask = np.concatenate([mask, np.zeros(len(self.vectors) - len(mask), dtype=bool)])
+        return mask
+
+    def _search_shards(
+        self, query: np.ndarray, k: int, allowed: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Search every loaded shard in parallel and merge the sorted results by heap.
+
+        With an `allowed` mask, shards holding none of the allowed rows are
+        skipped and the others only score allowed ids (IDSelectorBitmap).
+        """
+        shards = [
+            s
+            for s, shard in enumerate(self.shards)
+            if shard.loaded and shard.index.ntotal > 0
+        ]
+        params = None
+        if allowed is not None:
+            counts = np.bincount(self.assignment[allowed], minlength=self.n_shards)
+            shards = [s for s in shards if counts[s] > 0]
+            # The selector keeps a raw pointer into bits, which must outlive the searches.
+            # Its n is the bitmap's length in bytes: ids past it (rows added on another
+            # thread since the mask was made) are rejected instead of read out of bounds
+            bits = np.packbits(allowed, bitorder="little")
+            params = faiss.SearchParameters(
+                sel=faiss.IDSelectorBitmap(len(bits), faiss.swig_ptr(bits))
+            )
+        else:
+            counts = None
+
+        def search_one(s):
+            index = self.shards[s].index
+            n = min(k, index.ntotal if counts is None else int(counts[s]))
+            return index.search(query, n, params=params)
+
+        if len(shards) <= 1:
+            results = [search_one(s) for s in shards]
+        else:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.n_shards, thread_name_prefix="faiss-shard"
+                )
+            results = list(self._pool.map(search_one, shards))
+
+        scores = np.full((len(query), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(query), k), -1, dtype=np.int64)
+        if len(results) == 1:
+            n = results[0][1].shape[1]
+            scores[:, :n], ids[:, :n] = results[0]
+            return scores, ids
+        for row in range(len(query)):
+            merged = heapq.merge(
+                *(zip(s[row], i[row]) for s, i in results),
+                key=lambda item: item[0],
+                reverse=True,
+            )
+            for col, (score, idx) in enumerate(
+                islice((item for item in merged if item[1] >= 0), k)
+            ):
+                scores[row, col] = score
+                ids[row, col] = idx
+        return scores, ids
+
+    def _exact_scan(
+        self, query: np.ndarray, k: int, live: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        loaded = np.array([shard.loaded for shard in self.shards])
+        ids = np.flatnonzero(live & loaded[self.assignment])
+        if len(ids) == 0:
+            return (
+                np.full((len(query), k), -np.inf, dtype=np.float32),
+                np.full((len(query), k), -1, dtype=np.int64),
+            )
+        scores = query @ self.vectors.take(ids).T
+        return self._top_k(scores, ids[None, :].repeat(len(query), 0), k)
+
+    def _rerank(
+        self, query: np.ndarray, candidates: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        similarities = np.full((len(query), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(query), k), -1, dtype=np.int64)
+        for row, (q, cand) in enumerate(zip(query, candidates)):
+            cand = cand[cand >= 0]
+            if len(cand) == 0:
+                continue
+            scores = self.vectors.take(cand) @ q
+            top_scores, top_ids = self._top_k(scores[None, :], cand[None, :], k)
+            similarities[row, : top_ids.shape[1]] = top_scores[0]
+            ids[row, : top_ids.shape[1]] = top_ids[0]
+        return similarities, ids
+
+    @staticmethod
+    def _top_k(
+        scores: np.ndarray, ids: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, scores.shape[1])
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_scores, axis=1)
+        top = np.take_along_axis(part, order, axis=1)
+        return (
+            np.take_along_axis(scores, top, axis=1).astype(np.float32),
+            np.take_along_axis(ids, top, axis=1).astype(np.int64),
+        )
+
+    def index_bytes(self) -> int:
+        """Approximate in-memory size of the loaded coarse index codes."""
+        code_size = base_index(self.template).code_size
+        return int(
+            sum(shard.index.ntotal for shard in self.shards if shard.loaded) * code_size
+        )
+
+    def stats(self) -> dict:
+        counts = np.bincount(self.assignment[~self.deleted], minlength=self.n_shards)
+        return {
+            "storage": self.storage,
+            "search_dimension": self.search_dim,
+            "trained": self.is_trained,
+            "rerank_factor": self.rerank_factor if self.reranks else 1,
+            "index_bytes": self.index_bytes(),
+            "bytes_per_vector": int(base_index(self.template).code_size),
+            "full_vector_bytes": len(self.vectors) * self.dim * 4,
+            "tombstones": self.tombstones,
+            "shards": [
+                {"shard": s, "loaded": shard.loaded, "vectors": int(counts[s])}
+                for s, shard in enumerate(self.shards)
+            ],
+        }
@@ -0,0 +1,159 @@
+"""
+Segment-parallel video annotation: split a video at keyframes, annotate the
+segments in a process pool and join the results.
+
+One process annotating a long video keeps only a few cores busy. ffmpeg cuts
+the input without re-encoding (-c copy), which it can only do at keyframes,
+so every segment starts on a keyframe and each frame lands in exactly one
+segment. Every worker process loads its own model and runs the script's usual
+per-video function on its segment, told the index of the segment's first
+frame so that anything derived from frame numbers (timestamps, seeded jitter)
+comes out as in a single pass. The annotated segments share codec settings
+and are joined in order with ffmpeg's concat demuxer, again without
+re-encoding.
+
+Needs ffmpeg on PATH.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+
+from video import check_ffmpeg
+
+
+def video_info(video_path: str) -> Tuple[int, float]:
+    """Frame count and frames per second of a video."""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise Exception(f"Error: Could not open video: {video_path}")
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return frames, fps
+
+
+def _ffmpeg(cmd: List[str]):
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg error: {result.stderr}")
+
+
+def split_at_keyframes(video_path: str, segments: int, directory: str) -> List[str]:
+    """Cut the video stream into about `segments` equal parts at keyframes, without re-encoding.
+
+    Each cut lands on the first keyframe at or after an even split point, so
+    a video with few keyframes gives fewer segments. Audio is dropped, as in
+    the annotated output.
+
+    Returns:
+        Segment files in order
+    """
+    frames, fps = video_info(video_path)
+    duration = frames / fps if fps > 0 else 0
+    cut_times = ",".join(f"{duration * i / segments:.3f}" for i in range(1, segments))
+    cmd = ["ffmpeg", "-v", "error", "-i", str(video_path), "-map", "0:v:0", "-c", "copy", "-f", "segment"]
+    if cut_times:
+        cmd += ["-segment_times", cut_times]
+    cmd += ["-reset_timestamps", "1", "-y", str(Path(directory) / "segment_%03d.mp4")]
+    _ffmpeg(cmd)
+    return [str(path) for path in sorted(Path(directory).glob("segment_*.mp4"))]
+
+
+def concat_segments(segment_paths: List[str], output_path: str):
+    """Join videos with identical codec settings in order, without re-encoding."""
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as listing:
+        for path in segment_paths:
+            quoted = str(Path(path).resolve()).replace("'", "'\\''")
+            listing.write(f"file '{quoted}'\n")
+        list_path = listing.name
+    try:
+        _ffmpeg(["ffmpeg", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", "-y", str(output_path)])
+    finally:
+        os.unlink(list_path)
+
+
+def limit_threads(threads: int):
+    """Cap OpenCV and PyTorch threads, so worker processes share the cores instead of each using all."""
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def run_segments(
+    process_segment: Callable[..., bool],
+    video_path: str,
+    output_path: str,
+    segments: int,
+    workers: Optional[int] = None,
+    **kwargs,
+) -> bool:
+    """Annotate a video as segments in parallel processes and join them.
+
+    Args:
+        process_segment: Module-level function (workers import it) called as
+            process_segment(segment_path, segment_output_path, first_frame=..., **kwargs)
+            and returning True on success; first_frame is the index of the
+            segment's first frame in the whole video
+        video_path: Input video
+        output_path: Annotated output video
+        segments: Number of segments to aim for
+        workers: Worker processes (default: one per segment, at most one per core)
+        kwargs: Passed to process_segment
+
+    Returns:
+        True if every segment succeeded and the output was written
+    """
+    if not check_ffmpeg():
+        print("❌ Error: ffmpeg is not installed or not in PATH (needed for --segments)")
+        return False
+
+    with tempfile.TemporaryDirectory(prefix="segments_") as directory:
+        parts = split_at_keyframes(video_path, segments, directory)
+        if not parts:
+            print(f"❌ Error: Could not split video: {video_path}")
+            return False
+
+        first_frames = []
+        total = 0
+        for part in parts:
+            first_frames.append(total)
+            total += video_info(part)[0]
+        outputs = [str(Path(directory) / f"annotated_{i:03d}.mp4") for i in range(len(parts))]
+
+        cores = os.cpu_count() or 1
+        workers = max(1, min(len(parts), workers or cores))
+        print(f"Split into {len(parts)} segment(s) at keyframes ({total} frames), {workers} worker(s)")
+        for part, first in zip(parts, first_frames):
+            print(f"  {Path(part).name}: from frame {first}")
+
+        # spawn: workers start clean instead of inheriting the parent's threads
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=limit_threads,
+            initargs=(max(1, cores // workers),),
+        ) as pool:
+            futures = [
+                pool.submit(process_segment, part, output, first_frame=first, **kwargs)
+                for part, output, first in zip(parts, outputs, first_frames)
+            ]
+            results = [future.result() for future in futures]
+
+        if not all(results):
+            print("❌ Error: Some segments failed, output not written")
+            return False
+        concat_segments(outputs, output_path)
+
+    print(f"✅ Joined {len(parts)} annotated segment(s) into: {output_path}")
+    return True
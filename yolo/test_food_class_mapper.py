@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Equivalence test: FoodClassMapper.map_detections / best_per_class against the
+per-box map_detection_to_food_class loop they replace.
+
+Boxes are random, plus boxes placed exactly on the region and size thresholds,
+over every class name the rules mention and some they don't.
+Usage: python -m pytest yolo/test_food_class_mapper.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from yolo_detection_script import FoodClassMapper  # noqa: E402
+
+CLASS_NAMES = [
+    "person", "Hand", "sandwich", "hot dog", "pizza", "food", "cup", "bottle",
+    "bowl", "container", "fork", "knife", "spoon", "carrot", "vegetable",
+    "onion", "lettuce", "dog", "car", "Cup",
+]
+
+
+def random_boxes(rng, n: int, width: int, height: int) -> np.ndarray:
+    x1 = rng.uniform(-20, width, n)
+    y1 = rng.uniform(-20, height, n)
+    w = rng.uniform(1, width * 0.8, n) * rng.choice([0.1, 1.0], n)
+    h = rng.uniform(1, height * 0.8, n) * rng.choice([0.1, 1.0], n)
+    return np.stack([x1, y1, x1 + w, y1 + h], axis=1).astype(np.float32)
+
+
+def threshold_boxes(width: int, height: int) -> np.ndarray:
+    """Boxes centred exactly on the region boundaries, with areas on the size boundaries."""
+    boxes = []
+    for cx in (0.25, 0.3, 0.65, 0.7, 0.75):
+        for cy in (0.25, 0.3, 0.5, 0.6, 0.75):
+            for area in (0.02, 0.04, 0.06, 0.1, 0.15, 0.3):
+                for aspect in (1.0, 1.2, 2.0):
+                    h = np.sqrt(area * width * height / aspect)
+                    w = h * aspect
+                    x, y = cx * width, cy * height
+                    boxes.append((x - w / 2, y - h / 2, x + w / 2, y + h / 2))
+    return np.array(boxes, dtype=np.float32)
+
+
+def scalar_mapping(mapper, names, confidences, boxes):
+    return [
+        mapper.map_detection_to_food_class(name, float(conf), tuple(box))
+        for name, conf, box in zip(names, confidences, boxes)
+    ]
+
+
+def scalar_best(food_classes, confidences):
+    """The per-box loop from process_video_with_yolo: best box index per class."""
+    best = {}
+    for i, (food_class, conf) in enumerate(zip(food_classes, confidences)):
+        if food_class and (food_class not in best or float(conf) > float(confidences[best[food_class]])):
+            best[food_class] = i
+    return best
+
+
+def check(mapper, names, confidences, boxes):
+    expected = scalar_mapping(mapper, names, confidences, boxes)
+    food_ids = mapper.map_detections(names, confidences, boxes)
+    got = [mapper.FOOD_CLASSES[i] if i >= 0 else None for i in food_ids]
+    assert got == expected
+
+    best = mapper.best_per_class(food_ids, confidences)
+    expected_best = scalar_best(expected, confidences)
+    assert best == expected_best
+    # Same order as the loop inserted them (it decides which box is drawn on top)
+    assert list(best) == list(expected_best)
+
+
+def test_random_frames_match_scalar_mapper():
+    rng = np.random.default_rng(0)
+    for width, height in ((576, 1024), (1920, 1080), (640, 640)):
+        mapper = FoodClassMapper(width, height)
+        for _ in range(200):
+            n = int(rng.integers(0, 40))
+            names = rng.choice(CLASS_NAMES, n)
+            # Coarse confidences so ties happen
+            confidences = np.round(rng.uniform(0.2, 1.0, n), 1).astype(np.float32)
+            check(mapper, names, confidences, random_boxes(rng, n, width, height))
+
+
+def test_threshold_boxes_match_scalar_mapper():
+    rng = np.random.default_rng(1)
+    for width, height in ((576, 1024), (1920, 1080)):
+        mapper = FoodClassMapper(width, height)
+        boxes = threshold_boxes(width, height)
+        for name in CLASS_NAMES:
+            names = np.array([name] * len(boxes))
+            for conf in (0.5, 0.51, 0.9):
+                confidences = np.full(len(boxes), conf, dtype=np.float32)
+                check(mapper, names, confidences, boxes)
+        names = rng.choice(CLASS_NAMES, len(boxes))
+        check(mapper, names, rng.uniform(0, 1, len(boxes)).astype(np.float32), boxes)
+
+
+def test_empty_frame():
+    mapper = FoodClassMapper(576, 1024)
+    food_ids = mapper.map_detections(np.array([], dtype=str), np.zeros(0), np.zeros((0, 4)))
+    assert food_ids.shape == (0,)
+    assert mapper.best_per_class(food_ids, np.zeros(0)) == {}
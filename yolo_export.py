@@ -0,0 +1,207 @@
+"""
+Export YOLO models to ONNX Runtime or OpenVINO for CPU inference, optionally INT8.
+
+load_model() in yolo_inference.py calls export_model() for --backend onnx or
+openvino. The export is cached in YOLO_EXPORT_DIR (default yolo_exports/)
+under a name that includes the input size and precision, and reused until the
+.pt weights are newer, so only the first run pays for it. ultralytics loads
+exported files itself (YOLO("yolo_exports/yolov8n_640.onnx")), so callers keep
+calling model(frames) and reading model.names as with PyTorch.
+
+INT8 is post-training static quantization, calibrated on frames of the
+burger clip (yolo/frames_all/images, skipping the *_detected copies):
+
+- onnx: onnxruntime's quantize_static in QDQ format with per-channel
+  weights. The detection head (the last /model.N/ block) stays in float;
+  quantizing its box regression costs most of the accuracy.
+- openvino: ultralytics' own INT8 export (NNCF), given the calibration
+  images as a dataset.
+
+Needs onnx and onnxruntime, or openvino (and nncf for INT8), besides
+ultralytics. benchmarks/bench_yolo_backends.py compares latency and mAP with
+the PyTorch model.
+"""
+
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import List
+
+import cv2
+import numpy as np
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+EXPORT_DIR = os.getenv("YOLO_EXPORT_DIR", "yolo_exports")
+CALIBRATION_DIR = Path(__file__).resolve().parent / "yolo" / "frames_all" / "images"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def calibration_images(directory=CALIBRATION_DIR, limit: int = 128) -> List[Path]:
+    """Up to `limit` images spread evenly over a directory, skipping annotated copies (*_detected.*)."""
+    images = sorted(
+        path
+        for path in Path(directory).iterdir()
+        if path.suffix.lower() in IMAGE_EXTENSIONS and not path.stem.endswith("_detected")
+    )
+    if not images:
+        raise Exception(f"Error: No calibration images in {directory}")
+    if len(images) > limit:
+        images = [images[i] for i in np.linspace(0, len(images) - 1, limit).round().astype(int)]
+    return images
+
+
+def letterbox_input(image: np.ndarray, imgsz: int = 640) -> np.ndarray:
+    """A BGR image as a 1x3ximgszximgsz float input, letterboxed like ultralytics (gray 114 padding)."""
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_width, new_height = round(width * scale), round(height * scale)
+    resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top = (imgsz - new_height) // 2
+    left = (imgsz - new_width) // 2
+    padded = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    padded[top:top + new_height, left:left + new_width] = resized
+    rgb = padded[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(rgb, dtype=np.float32)[None] / 255.0
+
+
+def export_path(model_name: str, backend: str, imgsz: int = 640, int8: bool = False, export_dir=EXPORT_DIR) -> Path:
+    """Where the export of model_name for a backend is cached."""
+    name = f"{Path(model_name).stem}_{imgsz}{'_int8' if int8 else ''}"
+    return Path(export_dir) / (f"{name}.onnx" if backend == "onnx" else f"{name}_openvino_model")
+
+
+def _is_fresh(path: Path, model_name: str) -> bool:
+    if not path.exists():
+        return False
+    weights = Path(model_name)
+    return not weights.exists() or path.stat().st_mtime >= weights.stat().st_mtime
+
+
+def _head_nodes(model) -> List[str]:
+    """Names of the ONNX nodes of the last /model.N/ block (the Detect head of YOLOv8 and later)."""
+    blocks = [int(match.group(1)) for node in model.graph.node if (match := re.match(r"/model\.(\d+)/", node.name))]
+    if not blocks:
+        return []
+    head = f"/model.{max(blocks)}/"
+    return [node.name for node in model.graph.node if node.name.startswith(head)]
+
+
+def quantize_onnx(fp32_path: Path, int8_path: Path, images: List[Path], imgsz: int = 640):
+    """Statically quantize an ONNX export to INT8, calibrated on images.
+
+    Args:
+        fp32_path: Float ONNX export
+        int8_path: Where to write the quantized model
+        images: Calibration images (BGR files)
+        imgsz: Input size of the export
+    """
+    try:
+        import onnx
+        from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    except ImportError as e:
+        raise Exception(f"Error loading ONNX Runtime quantization (pip install onnx onnxruntime): {str(e)}")
+
+    model = onnx.load(str(fp32_path))
+    input_name = model.graph.input[0].name
+
+    class Frames(CalibrationDataReader):
+        def __init__(self):
+            self.images = iter(images)
+
+        def get_next(self):
+            for path in self.images:
+                image = cv2.imread(str(path))
+                if image is not None:
+                    return {input_name: letterbox_input(image, imgsz)}
+            return None
+
+    quantize_static(
+        str(fp32_path),
+        str(int8_path),
+        Frames(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        nodes_to_exclude=_head_nodes(model),
+    )
+
+    # ultralytics reads class names, stride and input size from the metadata
+    quantized = onnx.load(str(int8_path))
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, str(int8_path))
+
+
+def _calibration_dataset(images: List[Path], names: dict, export_dir: Path) -> Path:
+    """A dataset file listing the calibration images, for ultralytics' INT8 export."""
+    image_list = export_dir / "calibration.txt"
+    image_list.write_text("".join(f"{path.resolve()}\n" for path in images), encoding="utf-8")
+    dataset = export_dir / "calibration.yaml"
+    # JSON is valid YAML
+    dataset.write_text(
+        json.dumps({"path": str(export_dir.resolve()), "train": image_list.name, "val": image_list.name, "names": names}),
+        encoding="utf-8",
+    )
+    return dataset
+
+
+def export_model(
+    model_name: str = "yolov8n.pt",
+    backend: str = "onnx",
+    int8: bool = False,
+    imgsz: int = 640,
+    calibration_dir=CALIBRATION_DIR,
+    calibration_frames: int = 128,
+    export_dir=EXPORT_DIR,
+) -> str:
+    """Export a YOLO model for ONNX Runtime or OpenVINO, or reuse the cached export.
+
+    Args:
+        model_name: PyTorch weights (downloaded by ultralytics on first use)
+        backend: "onnx" or "openvino"
+        int8: Quantize to INT8, calibrated on images from calibration_dir
+        imgsz: Input size; exports take square inputs with a dynamic batch size
+        calibration_dir: Images to calibrate INT8 on
+        calibration_frames: Calibration images used at most
+        export_dir: Cache directory
+
+    Returns:
+        Path of the exported model, to load with YOLO(path)
+    """
+    if backend not in ("onnx", "openvino"):
+        raise ValueError(f"backend must be onnx or openvino, got {backend!r}")
+    target = export_path(model_name, backend, imgsz, int8, export_dir)
+    if _is_fresh(target, model_name):
+        return str(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"Exporting {model_name} to {backend}{' INT8' if int8 else ''} (cached in {target})...")
+    try:
+        if backend == "onnx" and int8:
+            fp32 = export_model(model_name, "onnx", False, imgsz, export_dir=export_dir)
+            quantize_onnx(Path(fp32), target, calibration_images(calibration_dir, calibration_frames), imgsz)
+            return str(target)
+
+        from ultralytics import YOLO
+
+        model = YOLO(model_name)
+        if backend == "onnx":
+            exported = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+        else:
+            options = {}
+            if int8:
+                images = calibration_images(calibration_dir, calibration_frames)
+                options = {"int8": True, "data": str(_calibration_dataset(images, model.names, target.parent))}
+            exported = model.export(format="openvino", imgsz=imgsz, dynamic=True, **options)
+
+        if target.is_dir():
+            shutil.rmtree(target)
+        shutil.move(str(exported), str(target))
+    except Exception as e:
+        raise Exception(f"Error exporting {model_name} to {backend}: {str(e)}")
+
+    print(f"✅ Exported to {target}")
+    return str(target)
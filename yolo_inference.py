@@ -0,0 +1,346 @@
+"""
+YOLO video inference shared by to_gif.py and yolo/yolo_detection_script.py.
+
+Ultralytics runs a list of frames as one batch. On CPU with a small model like
+yolov8n, the fixed cost of each call (pre/post-processing setup and Python
+dispatch) is a large part of the time per frame, so feeding frames in groups
+raises throughput. detect_batches() yields results in frame order, so callers
+write their output exactly as with one call per frame.
+
+run_pipeline() overlaps the stages of annotating a video: decoding,
+inference, drawing and encoding each run on their own thread, connected by
+bounded queues. OpenCV and PyTorch release the GIL in their heavy calls, so the
+stages use separate cores. Each stage handles batches in the order it receives
+them, so frames are written in order, and its busy and waiting time is
+reported to show which stage is the bottleneck.
+
+With every > 1 the inference stage runs the model on keyframes only and fills
+in the boxes of the frames in between (see keyframes.py); those frames get a
+result of the same type as the model's, so annotate() handles both alike.
+
+load_model() can run the model through ONNX Runtime or OpenVINO instead of
+PyTorch, optionally INT8-quantized (see yolo_export.py).
+
+ultralytics is imported on first use, so modules using these helpers (and
+their --help) load without it.
+"""
+
+import queue
+import threading
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from keyframes import Detections, KeyframeDetector, no_detections
+from yolo_export import export_model
+
+
+def load_model(model_name: str = "yolov8n.pt", backend: str = "pytorch", int8: bool = False):
+    """Load a YOLO model (downloaded by ultralytics on first use).
+
+    Args:
+        model_name: Weights, e.g. yolov8n.pt
+        backend: "pytorch", or "onnx" / "openvino" to run an export of the
+            weights (made on first use and cached, see yolo_export.py)
+        int8: With onnx or openvino, run the INT8-quantized export
+
+    Returns:
+        ultralytics YOLO model; called the same way whatever the backend
+    """
+    from ultralytics import YOLO
+
+    if backend == "pytorch":
+        if int8:
+            raise ValueError("INT8 needs the onnx or openvino backend")
+        return YOLO(model_name)
+    return YOLO(export_model(model_name, backend, int8), task="detect")
+
+
+def result_detections(result) -> Detections:
+    """Boxes of an ultralytics result as arrays; the result is kept as their source."""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return no_detections(result)
+    return Detections(
+        boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy(), result
+    )
+
+
+def result_from_detections(frame: np.ndarray, detections: Detections):
+    """An ultralytics result for `frame` holding filled-in boxes.
+
+    Built like the keyframe result they come from (same class, names and
+    tensor type), so plot() and boxes.xyxy.cpu().numpy() work as usual.
+    """
+    keyframe = detections.source
+    rows = np.column_stack([detections.xyxy, detections.conf, detections.cls])
+    return type(keyframe)(
+        frame, path=keyframe.path, names=keyframe.names, boxes=keyframe.boxes.data.new_tensor(rows)
+    )
+
+
+def read_frames(cap) -> Iterator[np.ndarray]:
+    """Decode frames from a cv2.VideoCapture until the end of the video."""
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            return
+        yield frame
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """Group items into lists of `size` (the last one may be shorter)."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def detect_batches(
+    model, frames: Iterable[np.ndarray], batch_size: int = 1, **predict_kwargs
+) -> Iterator[Tuple[np.ndarray, object]]:
+    """Run the model on frames in groups of batch_size.
+
+    Args:
+        model: YOLO model
+        frames: BGR frames, e.g. read_frames(cap)
+        batch_size: Frames per inference call; 1 calls the model per frame
+        predict_kwargs: Passed to the model call (e.g. conf=0.25)
+
+    Returns:
+        Iterator of (frame, result) in frame order
+    """
+    for batch in batched(frames, max(1, batch_size)):
+        results = model(batch, verbose=False, **predict_kwargs)
+        yield from zip(batch, results)
+
+
+_DONE = object()
+
+
+class Stage(threading.Thread):
+    """One pipeline stage: takes batches from `inbox`, applies `fn`, puts the result in `outbox`.
+
+    A stage without an inbox is the source: it puts the batches `fn()` yields.
+    `flush`, if given, is called once the inbox is drained and its batch put
+    last. busy_seconds is time spent in `fn`; starved_seconds waiting for input and
+    blocked_seconds waiting for room downstream.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        inbox: Optional[queue.Queue],
+        outbox: Optional[queue.Queue],
+        stop: threading.Event,
+        flush: Optional[Callable] = None,
+    ):
+        super().__init__(name=name, daemon=True)
+        self.fn = fn
+        self.flush = flush
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop = stop
+        self.frames = 0
+        self.busy_seconds = 0.0
+        self.starved_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.error = None
+
+    def _get(self):
+        start = time.perf_counter()
+        while True:
+            try:
+                item = self.inbox.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self.stop.is_set():
+                    item = _DONE
+                    break
+        self.starved_seconds += time.perf_counter() - start
+        return item
+
+    def _put(self, item) -> bool:
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    self.outbox.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    if self.stop.is_set():
+                        return False
+        finally:
+            self.blocked_seconds += time.perf_counter() - start
+
+    def _batches(self) -> Iterator:
+        if self.inbox is None:
+            batches = self.fn()
+            while True:
+                start = time.perf_counter()
+                batch = next(batches, _DONE)
+                self.busy_seconds += time.perf_counter() - start
+                if batch is _DONE:
+                    return
+                yield batch
+        else:
+            while True:
+                batch = self._get()
+                if batch is _DONE:
+                    break
+                start = time.perf_counter()
+                batch = self.fn(batch)
+                self.busy_seconds += time.perf_counter() - start
+                yield batch
+            if self.flush is not None and not self.stop.is_set():
+                start = time.perf_counter()
+                batch = self.flush()
+                self.busy_seconds += time.perf_counter() - start
+                yield batch
+
+    def run(self):
+        try:
+            for batch in self._batches():
+                self.frames += len(batch)
+                if self.outbox is not None and not self._put(batch):
+                    return
+                if self.stop.is_set():
+                    return
+        except BaseException as e:
+            self.error = e
+            self.stop.set()
+        finally:
+            if self.outbox is not None:
+                self._put(_DONE)
+
+
+def run_pipeline(
+    model,
+    frames: Iterable[np.ndarray],
+    annotate: Callable[[np.ndarray, object], np.ndarray],
+    write: Callable[[np.ndarray], None],
+    batch_size: int = 1,
+    queue_size: int = 4,
+    every: int = 1,
+    motion_threshold: Optional[float] = None,
+    fill: str = "interpolate",
+    **predict_kwargs,
+) -> Dict:
+    """Decode, detect, annotate and write frames on four threads.
+
+    Args:
+        model: YOLO model (only the inference thread calls it)
+        frames: BGR frames, e.g. read_frames(cap); iterated on the decode thread
+        annotate: (frame, result) -> annotated frame, called in frame order
+        write: Called with each annotated frame in order, e.g. VideoWriter.write
+        batch_size: Frames per inference call
+        queue_size: Batches each queue holds before the stage feeding it waits
+        every: Run the model on every `every`-th frame and fill in the others (1: every frame)
+        motion_threshold: With every > 1, also run it when the frame changed
+            more than this since the last keyframe (None: off)
+        fill: How boxes are filled in: "interpolate", "track" or "hold"
+        predict_kwargs: Passed to the model call (e.g. conf=0.25)
+
+    Returns:
+        Report with frames, seconds, fps and per-stage utilization (see print_report)
+    """
+    def detect(batch):
+        return [result_detections(result) for result in model(batch, verbose=False, **predict_kwargs)]
+
+    keyframes = KeyframeDetector(detect, every, motion_threshold, fill) if every > 1 else None
+
+    def with_results(ready):
+        return [
+            (frame, detections.source if is_key else result_from_detections(frame, detections))
+            for frame, detections, is_key in ready
+        ]
+
+    def infer(batch):
+        if keyframes is None:
+            return list(zip(batch, model(batch, verbose=False, **predict_kwargs)))
+        return with_results(keyframes.push(batch))
+
+    def draw(batch):
+        return [annotate(frame, result) for frame, result in batch]
+
+    def encode(batch):
+        for frame in batch:
+            write(frame)
+        return batch
+
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(3)]
+    stages = [
+        Stage("decode", lambda: batched(frames, max(1, batch_size)), None, queues[0], stop),
+        Stage(
+            "infer",
+            infer,
+            queues[0],
+            queues[1],
+            stop,
+            flush=(lambda: with_results(keyframes.flush())) if keyframes is not None else None,
+        ),
+        Stage("annotate", draw, queues[1], queues[2], stop),
+        Stage("encode", encode, queues[2], None, stop),
+    ]
+
+    start = time.perf_counter()
+    for stage in stages:
+        stage.start()
+    try:
+        for stage in stages:
+            while stage.is_alive():
+                stage.join(timeout=0.1)
+    except BaseException:
+        # e.g. Ctrl-C: let the threads wind down before re-raising
+        stop.set()
+        for stage in stages:
+            stage.join()
+        raise
+    elapsed = time.perf_counter() - start
+
+    for stage in stages:
+        if stage.error is not None:
+            raise stage.error
+
+    frames_done = stages[-1].frames
+    return {
+        "frames": frames_done,
+        "seconds": elapsed,
+        "fps": frames_done / elapsed if elapsed > 0 else 0.0,
+        "keyframes": keyframes.keyframes if keyframes is not None else frames_done,
+        "motion_keyframes": keyframes.motion_keyframes if keyframes is not None else 0,
+        "stages": [
+            {
+                "stage": stage.name,
+                "busy_seconds": stage.busy_seconds,
+                "utilization": stage.busy_seconds / elapsed if elapsed > 0 else 0.0,
+                "starved_seconds": stage.starved_seconds,
+                "blocked_seconds": stage.blocked_seconds,
+            }
+            for stage in stages
+        ],
+    }
+
+
+def print_report(report: Dict):
+    """Print per-stage utilization; the busiest stage bounds throughput."""
+    bottleneck = max(report["stages"], key=lambda stage: stage["busy_seconds"])
+    print(f"\nPipeline: {report['frames']} frames in {report['seconds']:.1f}s ({report['fps']:.1f} fps)")
+    if report["keyframes"] < report["frames"]:
+        print(
+            f"  Detected {report['keyframes']} keyframes "
+            f"({report['motion_keyframes']} on motion), boxes filled in on the rest"
+        )
+    print(f"  {'stage':<9} {'busy s':>7} {'util':>6} {'starved s':>9} {'blocked s':>9}")
+    for stage in report["stages"]:
+        marker = "  <- bottleneck" if stage is bottleneck else ""
+        print(
+            f"  {stage['stage']:<9} {stage['busy_seconds']:>7.2f} {stage['utilization']:>6.1%} "
+            f"{stage['starved_seconds']:>9.2f} {stage['blocked_seconds']:>9.2f}{marker}"
+        )